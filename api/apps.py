@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_save
+
+        from .authentication import revoke_on_change
+
+        # Un usuario modificado o borrado invalida los tokens ya emitidos
+        User = get_user_model()
+        post_save.connect(revoke_on_change, sender=User, dispatch_uid='api.revoke_tokens_on_save')
+        post_delete.connect(revoke_on_change, sender=User, dispatch_uid='api.revoke_tokens_on_delete')
@@ -0,0 +1,148 @@
+"""
+Autenticación JWT sin consultar la tabla de usuarios en cada petición.
+
+``JWTAuthentication`` de simplejwt valida la firma del token y después hace
+``User.objects.get(id=...)`` sólo para llenar ``request.user``. Aquí el token
+de acceso lleva, firmados desde que se emite en ``/api/token/``, los datos que
+la API usa del usuario (id, username, email, is_staff, is_superuser) y
+``ClaimsJWTAuthentication`` arma el usuario con ellos: una consulta menos por
+petición. Los demás campos (nombre, last_login, ...) se cargan de la base
+sólo si alguna vista los lee.
+
+Revocación: cualquier cambio guardado del usuario (contraseña, email,
+desactivación, permisos) o su borrado marca en el caché de Django el momento
+del cambio; los tokens emitidos antes (``auth_time``) dejan de valer, tanto
+los de acceso como los de refresco. Igual que la fijación al primario de
+``backend.db_routers``, el caché debe ser compartido entre workers
+(``CACHE_URL``) para que la revocación valga en todos: con el caché local por
+defecto (o ``JWT_CLAIMS_AUTH=false``) se consulta el usuario en cada petición
+como antes, y ``is_active`` se comprueba en la base. Los cambios que no pasan
+por ``save()``/``delete()`` (``QuerySet.update``, SQL a mano) no revocan nada:
+llamar a ``revoke_tokens`` después.
+
+Los tokens sin estos claims (emitidos antes del cambio) siguen funcionando
+por el camino de simplejwt, con su consulta.
+"""
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+# Campos del usuario copiados al token, en el orden de los argumentos de claims_user
+USER_CLAIMS = ('username', 'email', 'is_staff', 'is_superuser')
+AUTH_TIME_CLAIM = 'auth_time'
+
+
+def add_claims(token, user):
+    for name in USER_CLAIMS:
+        token[name] = getattr(user, name)
+    token[AUTH_TIME_CLAIM] = time.time()
+    return token
+
+
+def _revocation_key(user_id):
+    return f"jwt-revoked:{user_id}"
+
+
+def revoke_tokens(user_id):
+    """Invalidate every token issued to this user until now"""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    cache.set(_revocation_key(user_id), time.time(), int(lifetime.total_seconds()) + 1)
+
+
+def check_not_revoked(token):
+    revoked_at = cache.get(_revocation_key(token.get(api_settings.USER_ID_CLAIM)))
+    if revoked_at is not None and token.get(AUTH_TIME_CLAIM, 0) <= revoked_at:
+        raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+
+def claims_enabled():
+    """Whether users come from token claims (needs a cache shared by every worker for revocation)"""
+    return getattr(settings, 'JWT_CLAIMS_AUTH', False)
+
+
+@lru_cache(maxsize=getattr(settings, 'JWT_USER_CACHE_SIZE', 1024))
+def claims_row(user_id, username, email, is_staff, is_superuser):
+    """
+    ``(field names, values)`` of the user row known from the token claims,
+    in model field order (what ``from_db()`` takes), cached per process.
+    """
+    User = get_user_model()
+    id_field = User._meta.get_field(api_settings.USER_ID_FIELD)
+    known = {
+        id_field.attname: id_field.to_python(user_id),
+        'username': username, 'email': email, 'is_staff': is_staff, 'is_superuser': is_superuser,
+        'is_active': True,
+    }
+    names = tuple(field.attname for field in User._meta.concrete_fields if field.attname in known)
+    return names, tuple(known[name] for name in names)
+
+
+def claims_user(user_id, username, email, is_staff, is_superuser):
+    """
+    New User instance built from token claims, without a query.
+
+    Fields not in the token are deferred: reading them loads them from the
+    database into this request's instance only.
+    """
+    names, values = claims_row(user_id, username, email, is_staff, is_superuser)
+    return get_user_model().from_db(DEFAULT_DB_ALIAS, list(names), list(values))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that trusts the user claims of the token instead of
+    loading the user from the database.
+    """
+
+    def get_user(self, validated_token):
+        if AUTH_TIME_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        if not claims_enabled():
+            # Sin caché compartido la revocación no llega a los demás workers:
+            # el usuario (e is_active) se lee de la base, como simplejwt
+            check_not_revoked(validated_token)
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+            claims = [validated_token[name] for name in USER_CLAIMS]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        check_not_revoked(validated_token)
+        return claims_user(user_id, *claims)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """``/api/token/``: refresh and access tokens carrying the user claims"""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """``/api/token/refresh/``: rejects refresh tokens revoked since issue"""
+
+    def validate(self, attrs):
+        check_not_revoked(self.token_class(attrs['refresh']))
+        return super().validate(attrs)
+
+
+def revoke_on_change(sender, instance, update_fields=None, **kwargs):
+    # El login del admin sólo actualiza last_login: no cambia ningún claim
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    # Recalcular el hash en el login (otro hasher u otro costo) guarda sólo
+    # ``password`` sin contraseña nueva en ``_password``: es la misma contraseña
+    if update_fields is not None and set(update_fields) == {'password'} and getattr(instance, '_password', None) is None:
+        return
+    if instance.pk is not None:
+        revoke_tokens(instance.pk)
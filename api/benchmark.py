@@ -0,0 +1,278 @@
+"""
+Benchmark de endpoints: número de consultas y latencia por ruta.
+
+Siembra un conjunto de datos sintético (propietarios, casas e imágenes con un
+storage en memoria, sin S3), recorre todas las rutas GET registradas en el
+``DefaultRouter`` de ``backend/urls.py`` y mide por endpoint el número de
+consultas SQL y la latencia (p50/p95). Lo usan los tests de presupuesto en
+``api/tests.py`` y el comando ``manage.py benchmark_endpoints``.
+"""
+import json
+import math
+import random
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import InMemoryStorage
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.authentication import ClaimsTokenObtainPairSerializer
+from owner.models import Owner
+from property import fixtures
+from property.models import HouseForSale, HouseForRent, PropertyImage
+
+BUDGETS_PATH = Path(__file__).resolve().parent / 'benchmark_budgets.json'
+BASELINE_PATH = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+
+DEFAULT_SCALE = {
+    'owners': 5,
+    'houses_per_owner': 4,
+    'images_per_house': 3,
+}
+
+
+class FakeImageService:
+    """Offline stand-in for S3ImageService: URLs are built without signing"""
+
+    def __init__(self):
+        self.bucket_name = 'benchmark'
+
+    def generate_presigned_url(self, object_key, expiration=3600, cache=True):
+        return f"/media/{object_key}?expires={expiration}"
+
+    def generate_presigned_urls(self, object_keys, expiration=3600, cache=True):
+        return {key: self.generate_presigned_url(key, expiration) for key in object_keys}
+
+    def upload_file(self, file_obj, object_key, content_type=None):
+        return True
+
+    def delete_file(self, object_key):
+        return True
+
+    def file_exists(self, object_key):
+        return True
+
+
+@contextmanager
+def fake_image_storage(real_signing=False):
+    """
+    Swap the S3 storage of PropertyImage.image for an in-memory one.
+
+    Args:
+        real_signing (bool): Keep S3ImageService so presigned URLs are still
+            signed with boto3 (offline, but includes its CPU cost)
+    """
+    field = PropertyImage._meta.get_field('image')
+    original = field.storage
+    field.storage = InMemoryStorage(base_url='/media/')
+    try:
+        if real_signing:
+            yield field.storage
+        else:
+            with mock.patch('backend.storage_backends.S3ImageService', FakeImageService):
+                yield field.storage
+    finally:
+        field.storage = original
+
+
+def seed_dataset(owners=None, houses_per_owner=None, images_per_house=None, seed=0):
+    """
+    Create a deterministic synthetic dataset with the same row factories as
+    ``manage.py generate_fixtures``. Images only get a file name: serving them
+    goes through the (fake) storage, nothing is uploaded.
+
+    Returns:
+        dict: Number of rows created per model
+    """
+    owners = owners or DEFAULT_SCALE['owners']
+    houses_per_owner = houses_per_owner or DEFAULT_SCALE['houses_per_owner']
+    images_per_house = images_per_house if images_per_house is not None else DEFAULT_SCALE['images_per_house']
+    rng = random.Random(seed)
+
+    owner_objs = Owner.objects.bulk_create([Owner(**fixtures.owner_fields(rng, i)) for i in range(owners)])
+
+    sales, rents = [], []
+    for owner in owner_objs:
+        for _ in range(houses_per_owner):
+            sales.append(HouseForSale(**fixtures.house_for_sale_fields(rng, owner.pk)))
+            rents.append(HouseForRent(**fixtures.house_for_rent_fields(rng, owner.pk)))
+    sales = HouseForSale.objects.bulk_create(sales)
+    rents = HouseForRent.objects.bulk_create(rents)
+
+    images = []
+    for model, houses in ((HouseForSale, sales), (HouseForRent, rents)):
+        content_type = ContentType.objects.get_for_model(model)
+        for house in houses:
+            for order in range(images_per_house):
+                images.append(PropertyImage(
+                    image=f"properties/{model._meta.model_name}/{house.pk}/{order}.jpg",
+                    caption=f"Foto {order}", is_main=order == 0, order=order,
+                    content_type=content_type, object_id=house.pk,
+                ))
+    PropertyImage.objects.bulk_create(images)
+
+    return {
+        'owners': len(owner_objs),
+        'houses_for_sale': len(sales),
+        'houses_for_rent': len(rents),
+        'images': len(images),
+    }
+
+
+def iter_routes():
+    """
+    Every GET route registered on the project's DefaultRouter.
+
+    Yields:
+        tuple: (endpoint name, url)
+    """
+    from backend.urls import router
+
+    for prefix, viewset, basename in router.registry:
+        model = viewset.queryset.model
+        instance = model.objects.order_by('pk').first()
+
+        yield f"{basename}-list", f"/api/{prefix}/"
+        if instance is not None:
+            yield f"{basename}-detail", f"/api/{prefix}/{instance.pk}/"
+
+        for extra in viewset.get_extra_actions():
+            if 'get' not in extra.mapping:
+                continue
+            name = f"{basename}-{extra.url_name}"
+            if extra.detail:
+                if instance is not None:
+                    yield name, f"/api/{prefix}/{instance.pk}/{extra.url_path}/"
+            else:
+                yield name, f"/api/{prefix}/{extra.url_path}/"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def authenticated_client(username='benchmark'):
+    """APIClient sending a real JWT, so authentication cost is measured too"""
+    user, _ = User.objects.get_or_create(username=username)
+    client = APIClient()
+    token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+def measure(client, url, repeat=10):
+    """
+    Request ``url`` ``repeat`` times (after one warm-up request)
+
+    Returns:
+        dict: status, queries per request, p50/p95/max latency in ms
+    """
+    client.get(url)  # warm-up: ContentType cache, URL resolver, etc.
+    latencies = []
+    queries = 0
+    status_code = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+        queries = max(queries, len(captured))
+        status_code = response.status_code
+    return {
+        'status': status_code,
+        'queries': queries,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'max_ms': round(max(latencies), 2),
+    }
+
+
+def run_benchmark(repeat=10, client=None, real_signing=False):
+    """
+    Measure every router GET route against the current database, with the
+    settings as they are: by default (no ``CACHE_URL``) ``JWT_CLAIMS_AUTH``
+    is off and every request also loads the user.
+    """
+    client = client or authenticated_client()
+    results = {}
+    with fake_image_storage(real_signing):
+        for name, url in iter_routes():
+            results[name] = dict(url=url, **measure(client, url, repeat))
+    return results
+
+
+def load_json(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def check_budgets(results, budgets, latency_factor=1.0):
+    """
+    Args:
+        latency_factor (float): Multiplies the p95 budgets; None checks
+            only status and query counts
+
+    Returns:
+        list: Human readable budget violations
+    """
+    violations = []
+    for name, result in results.items():
+        budget = budgets.get(name)
+        if budget is None:
+            violations.append(f"{name}: no budget defined in {BUDGETS_PATH.name}")
+            continue
+        if result['status'] >= 400:
+            violations.append(f"{name}: HTTP {result['status']}")
+        if result['queries'] > budget['max_queries']:
+            violations.append(f"{name}: {result['queries']} queries > budget {budget['max_queries']}")
+        if latency_factor is None:
+            continue
+        p95_budget = budget['p95_ms'] * latency_factor
+        if result['p95_ms'] > p95_budget:
+            violations.append(f"{name}: p95 {result['p95_ms']}ms > budget {p95_budget:g}ms")
+    return violations
+
+
+def comparison_table(results, baseline, budgets):
+    """Plain-text table comparing a run with the stored baseline"""
+    header = f"{'endpoint':<45} {'queries':>14} {'p95 ms':>22} {'budget':>10}"
+    lines = [header, '-' * len(header)]
+    for name in sorted(results):
+        result = results[name]
+        base = baseline.get(name, {})
+        budget = budgets.get(name)
+
+        queries = f"{result['queries']}"
+        if 'queries' in base:
+            queries = f"{base['queries']} -> {result['queries']}"
+        p95 = f"{result['p95_ms']:.1f}"
+        if base.get('p95_ms'):
+            change = (result['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100
+            p95 = f"{base['p95_ms']:.1f} -> {result['p95_ms']:.1f} ({change:+.0f}%)"
+        if budget is None:
+            status = 'missing'
+        elif result['queries'] > budget['max_queries'] or result['p95_ms'] > budget['p95_ms']:
+            status = 'OVER'
+        else:
+            status = 'ok'
+        lines.append(f"{name:<45} {queries:>14} {p95:>22} {status:>10}")
+    return '\n'.join(lines)
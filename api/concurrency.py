@@ -0,0 +1,114 @@
+"""
+Límite de peticiones simultáneas a los endpoints que calculan hashes de
+contraseña (``/api/token/`` y ``/api/user/register/``).
+
+Cada hash (PBKDF2 con el número de iteraciones de Django, o Argon2) ocupa un
+núcleo varios cientos de milisegundos. Sin límite, una ráfaga de logins ocupa
+todos los hilos del worker y los listados esperan detrás. Con
+``AUTH_MAX_CONCURRENCY`` sólo esa cantidad de hilos por worker calcula hashes a
+la vez. Como mucho ``AUTH_MAX_WAITING`` peticiones más esperan su turno (hasta
+``AUTH_QUEUE_TIMEOUT`` segundos): una petición que espera también ocupa un
+hilo, así que la cola debe dejar libres hilos para el resto del tráfico. Las
+que no caben en la cola, o no consiguen turno a tiempo, reciben 503 con
+``Retry-After`` enseguida. ``AUTH_MAX_CONCURRENCY = 0`` desactiva el límite.
+
+Con ``METRICS_ENABLED`` se registran la espera en la cola, las peticiones
+rechazadas y las que están calculando hashes (ver ``backend.metrics``).
+"""
+import math
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from backend import metrics
+
+
+class AuthBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many authentication requests in progress, try again shortly.'
+    default_code = 'auth_busy'
+
+    def __init__(self, wait):
+        super().__init__()
+        # DRF lo envía como Retry-After
+        self.wait = wait
+
+
+class AuthSlots:
+    """
+    ``limit`` password hashing slots of this process and a queue of at most
+    ``max_waiting`` requests waiting for one.
+    """
+
+    def __init__(self, limit, max_waiting):
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """
+        Returns:
+            bool: Whether a slot was obtained; False at once when the queue is full
+        """
+        if self.semaphore.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self.waiting >= self.max_waiting:
+                return False
+            self.waiting += 1
+        try:
+            return self.semaphore.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def release(self):
+        self.semaphore.release()
+
+
+@lru_cache(maxsize=None)
+def _slots(limit, max_waiting):
+    return AuthSlots(limit, max_waiting)
+
+
+def auth_slots():
+    """Slots shared by the auth endpoints of this process, or None without limit"""
+    limit = getattr(settings, 'AUTH_MAX_CONCURRENCY', 0)
+    if limit <= 0:
+        return None
+    return _slots(limit, max(0, getattr(settings, 'AUTH_MAX_WAITING', 0)))
+
+
+class AuthConcurrencyMixin:
+    """
+    Run the view only while holding one of the ``AUTH_MAX_CONCURRENCY`` slots,
+    waiting up to ``AUTH_QUEUE_TIMEOUT`` seconds for it if there is room in
+    the queue (``AUTH_MAX_WAITING``).
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        self._auth_slot = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._auth_slot is not None:
+                self._auth_slot.release()
+                metrics.auth_finished()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        slots = auth_slots()
+        if slots is None:
+            return
+        timeout = getattr(settings, 'AUTH_QUEUE_TIMEOUT', 5)
+        start = time.perf_counter()
+        admitted = slots.acquire(timeout=timeout)
+        metrics.auth_queued(time.perf_counter() - start, admitted)
+        if not admitted:
+            raise AuthBusy(wait=max(1, math.ceil(timeout)))
+        self._auth_slot = slots
@@ -0,0 +1,26 @@
+"""
+Argon2 con costo configurable desde settings.
+
+Django guarda los parámetros dentro de cada hash y, al iniciar sesión, vuelve
+a calcular y guardar el hash si el hasher preferido o sus parámetros cambiaron
+(``must_update``). Así, cambiar ``PASSWORD_HASHER`` o los ``ARGON2_*`` migra
+las contraseñas poco a poco, en el siguiente login de cada usuario.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with ``ARGON2_TIME_COST``, ``ARGON2_MEMORY_COST`` (KiB) and ``ARGON2_PARALLELISM``"""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
@@ -0,0 +1,157 @@
+"""
+Auditoría del tiempo de importación al arrancar el proyecto.
+
+Corre el arranque de un worker (``backend.wsgi`` + todas las URLs, que a su
+vez importan vistas, serializers y modelos) en un proceso nuevo con
+``python -X importtime`` y reparte el tiempo de cada módulo entre las apps
+del proyecto: un módulo de terceros se cobra a la app que lo importó
+primero. Lo usan ``manage.py audit_imports`` y los tests de arranque en
+``api/tests.py``.
+"""
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+PROJECT_APPS = ('api', 'backend', 'owner', 'property')
+
+# Puntos de entrada: lo que importan (Django entero vía django.setup()) no se
+# cobra a la app ``backend``
+ENTRY_MODULES = ('backend.wsgi', 'backend.asgi')
+
+# Módulos que no deben cargarse sólo por arrancar un worker o un comando
+HEAVY_MODULES = ('boto3', 'botocore', 'storages', 'pandas', 'numpy', 'openpyxl', 'PIL')
+
+# Lo que hace un worker antes de atender la primera petición
+STARTUP_CODE = "import backend.wsgi\nfrom django.urls import get_resolver; get_resolver().url_patterns"
+
+
+@dataclass
+class ImportEntry:
+    name: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+    children: list = field(default_factory=list)
+
+    @property
+    def package(self):
+        return self.name.split('.')[0]
+
+
+def parse_importtime(output):
+    """
+    Parse the stderr of ``python -X importtime`` into a tree.
+
+    Returns:
+        list: Top-level ImportEntry objects, in import order
+    """
+    stack = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        name = name.rstrip()
+        entry = ImportEntry(
+            name=name.strip(),
+            depth=(len(name) - len(name.lstrip())) // 2,
+            self_us=int(self_us),
+            cumulative_us=int(cumulative_us),
+        )
+        # importtime lista cada módulo después de los que él importó
+        while stack and stack[-1].depth > entry.depth:
+            entry.children.insert(0, stack.pop())
+        stack.append(entry)
+    return stack
+
+
+def iter_entries(entries):
+    for entry in entries:
+        yield entry
+        yield from iter_entries(entry.children)
+
+
+def run_startup(code=STARTUP_CODE, env=None):
+    """
+    Run ``code`` in a fresh interpreter under ``-X importtime``.
+
+    Returns:
+        tuple: (seconds the code took in the child, list of top-level ImportEntry)
+    """
+    timed = (
+        "import os, time\n"
+        "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')\n"
+        "_start = time.perf_counter()\n"
+        f"{code}\n"
+        "print(time.perf_counter() - _start)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', timed],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup failed:\n{result.stderr[-2000:]}")
+    lines = result.stdout.strip().splitlines()
+    seconds = float(lines[-1]) if lines else 0.0
+    return seconds, parse_importtime(result.stderr)
+
+
+def attribute(entries, apps=PROJECT_APPS):
+    """
+    Charge each module's own import time to the nearest project app above it
+    in the import tree, or else to the package that started that import chain.
+
+    Returns:
+        dict: owner -> {'self_us': int, 'modules': int, 'packages': {package: self_us}}
+    """
+    owners = defaultdict(lambda: {'self_us': 0, 'modules': 0, 'packages': defaultdict(int)})
+
+    def walk(entry, owner):
+        if entry.package in apps:
+            owner = entry.package
+        elif owner is None:
+            owner = entry.package  # p. ej. rest_framework se cobra lo que importa
+        summary = owners[owner]
+        summary['self_us'] += entry.self_us
+        summary['modules'] += 1
+        summary['packages'][entry.package] += entry.self_us
+        for child in entry.children:
+            walk(child, None if entry.name in ENTRY_MODULES else owner)
+
+    for entry in entries:
+        walk(entry, None)
+    return owners
+
+
+def imported_modules(entries):
+    return {entry.name for entry in iter_entries(entries)}
+
+
+def heavy_modules_loaded(entries, heavy=HEAVY_MODULES):
+    return sorted({entry.package for entry in iter_entries(entries) if entry.package in heavy})
+
+
+def report(seconds, entries, top=10):
+    """Plain-text summary: time per owner, heaviest packages and project modules"""
+    owners = attribute(entries)
+    total_us = sum(summary['self_us'] for summary in owners.values())
+    lines = [f"Arranque: {seconds * 1000:.0f} ms ({total_us / 1000:.0f} ms importando {sum(s['modules'] for s in owners.values())} módulos)", '']
+
+    lines.append(f"{'importado por':<24} {'ms':>8} {'módulos':>8}  paquetes más pesados")
+    for owner, summary in sorted(owners.items(), key=lambda item: -item[1]['self_us'])[:top]:
+        heaviest = sorted(summary['packages'].items(), key=lambda item: -item[1])[:4]
+        packages = ', '.join(f"{package} {us / 1000:.1f}" for package, us in heaviest)
+        marker = '*' if owner in PROJECT_APPS else ' '
+        lines.append(f"{marker}{owner:<23} {summary['self_us'] / 1000:>8.1f} {summary['modules']:>8}  {packages}")
+
+    project = [entry for entry in iter_entries(entries) if entry.package in PROJECT_APPS]
+    lines += ['', f"{'módulo del proyecto':<40} {'acumulado ms':>12}"]
+    for entry in sorted(project, key=lambda e: -e.cumulative_us)[:top]:
+        lines.append(f"{entry.name:<40} {entry.cumulative_us / 1000:>12.1f}")
+
+    heavy = heavy_modules_loaded(entries)
+    lines += ['', f"Módulos pesados cargados al arrancar: {', '.join(heavy) if heavy else 'ninguno'}"]
+    return '\n'.join(lines)
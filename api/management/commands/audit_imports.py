@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import import_audit
+
+
+class Command(BaseCommand):
+    """
+    Resume ``python -X importtime`` del arranque de un worker por app del
+    proyecto y señala módulos pesados (boto3, pandas, ...) que se cargan sin
+    necesidad.
+
+    Uso:
+        python manage.py audit_imports
+        python manage.py audit_imports --top 20 --fail-on-heavy
+        python manage.py audit_imports --code "import django; django.setup()"
+    """
+    help = "Summarize import time at startup per project app"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--code', default=import_audit.STARTUP_CODE,
+                            help="Python code to time (default: WSGI app + URLconf)")
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--fail-on-heavy', action='store_true',
+                            help=f"Exit with an error if any of {', '.join(import_audit.HEAVY_MODULES)} is imported")
+
+    def handle(self, *args, **options):
+        try:
+            seconds, entries = import_audit.run_startup(options['code'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(import_audit.report(seconds, entries, options['top']))
+        heavy = import_audit.heavy_modules_loaded(entries)
+        if heavy and options['fail_on_heavy']:
+            raise CommandError(f"Heavy modules imported at startup: {', '.join(heavy)}")
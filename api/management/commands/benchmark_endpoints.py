@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Mide consultas SQL y latencia p95 de cada ruta GET del router sobre una
+    base de datos de prueba sembrada con datos sintéticos, y la compara contra
+    la línea base guardada en ``api/benchmark_baseline.json``.
+
+    Uso:
+        python manage.py benchmark_endpoints
+        python manage.py benchmark_endpoints --owners 50 --houses-per-owner 10
+        python manage.py benchmark_endpoints --save-baseline
+    """
+    help = "Benchmark every router endpoint (query count and p95 latency) against a stored baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owners', type=int, default=benchmark.DEFAULT_SCALE['owners'])
+        parser.add_argument('--houses-per-owner', type=int, default=benchmark.DEFAULT_SCALE['houses_per_owner'])
+        parser.add_argument('--images-per-house', type=int, default=benchmark.DEFAULT_SCALE['images_per_house'])
+        parser.add_argument('--repeat', type=int, default=20, help="Requests per endpoint")
+        parser.add_argument('--baseline', default=str(benchmark.BASELINE_PATH))
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Store this run as the new baseline")
+        parser.add_argument('--fail-over-budget', action='store_true',
+                            help="Exit with an error if any endpoint exceeds its budget")
+        parser.add_argument('--keepdb', action='store_true', help="Reuse the test database")
+        parser.add_argument('--real-signing', action='store_true',
+                            help="Sign image URLs with boto3 instead of the fake image service")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            counts = benchmark.seed_dataset(
+                owners=options['owners'],
+                houses_per_owner=options['houses_per_owner'],
+                images_per_house=options['images_per_house'],
+            )
+            self.stdout.write(f"Datos sembrados: {counts}")
+            results = benchmark.run_benchmark(repeat=options['repeat'], real_signing=options['real_signing'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        baseline = benchmark.load_json(options['baseline'])
+        budgets = benchmark.load_json(benchmark.BUDGETS_PATH)
+        self.stdout.write(benchmark.comparison_table(results, baseline, budgets))
+
+        if options['save_baseline']:
+            benchmark.save_json(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {options['baseline']}"))
+
+        violations = benchmark.check_budgets(results, budgets)
+        for violation in violations:
+            self.stdout.write(self.style.WARNING(violation))
+        if violations and options['fail_over_budget']:
+            raise CommandError(f"{len(violations)} endpoints over budget")
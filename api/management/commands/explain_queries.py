@@ -0,0 +1,167 @@
+import json
+import re
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DatabaseError
+
+SQLITE_INDEX_RE = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+SQLITE_SCAN_RE = re.compile(r'^SCAN (\w+)')
+
+
+class Command(BaseCommand):
+    """
+    Reproduce un log de consultas capturado con ``QUERY_LOG_PATH`` y muestra
+    el plan de ejecución (EXPLAIN) de cada forma de consulta distinta, qué
+    índices usa cada una y cuántas veces se usaría cada índice del esquema.
+
+    Uso: python manage.py explain_queries /tmp/queries.jsonl --top 20
+    """
+    help = "Replay a captured query log and report EXPLAIN plans and per-index usage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSONL file written by backend.query_log")
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--top', type=int, default=20,
+                            help="Number of query shapes to report (by total time)")
+        parser.add_argument('--analyze', action='store_true',
+                            help="Use EXPLAIN ANALYZE on PostgreSQL (executes the queries)")
+        parser.add_argument('--show-plans', action='store_true', help="Print the full plan of each shape")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        shapes = self.load_shapes(options['path'])
+        if not shapes:
+            raise CommandError("No SELECT statements found in the log")
+
+        ranked = sorted(shapes.values(), key=lambda s: s['total_ms'], reverse=True)
+        index_hits = Counter()
+        seq_scans = Counter()
+
+        self.stdout.write(f"{len(shapes)} formas de consulta, {sum(s['count'] for s in ranked)} ejecuciones\n")
+        for position, shape in enumerate(ranked, start=1):
+            try:
+                plan, indexes, scans = self.explain(connection, shape, options['analyze'])
+            except DatabaseError as e:
+                self.stderr.write(f"#{position}: EXPLAIN failed: {e}")
+                continue
+            for index in indexes:
+                index_hits[index] += shape['count']
+            for table in scans:
+                seq_scans[table] += shape['count']
+
+            if position > options['top']:
+                continue
+            self.stdout.write(
+                f"#{position}  x{shape['count']}  total={shape['total_ms']:.1f}ms  "
+                f"avg={shape['total_ms'] / shape['count']:.2f}ms"
+            )
+            self.stdout.write(f"    {shape['sql'][:200]}")
+            self.stdout.write(f"    paths: {', '.join(sorted(shape['paths'])[:5]) or '-'}")
+            self.stdout.write(f"    indexes: {', '.join(sorted(indexes)) or '-'}")
+            if scans:
+                self.stdout.write(self.style.WARNING(f"    full scans: {', '.join(sorted(scans))}"))
+            if options['show_plans']:
+                for line in plan:
+                    self.stdout.write(f"      {line}")
+            self.stdout.write('')
+
+        self.report_indexes(connection, index_hits, seq_scans)
+
+    def load_shapes(self, path):
+        shapes = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    sql = entry.get('sql', '')
+                    if not sql.lstrip().upper().startswith('SELECT'):
+                        continue
+                    shape = shapes.setdefault(sql, {
+                        'sql': sql, 'params': entry.get('params') or [],
+                        'count': 0, 'total_ms': 0.0, 'paths': set(),
+                    })
+                    shape['count'] += 1
+                    shape['total_ms'] += entry.get('duration_ms') or 0.0
+                    if entry.get('path'):
+                        shape['paths'].add(entry['path'])
+        except OSError as e:
+            raise CommandError(str(e))
+        return shapes
+
+    def explain(self, connection, shape, analyze):
+        """
+        Returns:
+            tuple: (plan lines, set of index names used, set of fully scanned tables)
+        """
+        vendor = connection.vendor
+        with connection.cursor() as cursor:
+            if vendor == 'postgresql':
+                prefix = 'EXPLAIN (ANALYZE, FORMAT JSON) ' if analyze else 'EXPLAIN (FORMAT JSON) '
+                cursor.execute(prefix + shape['sql'], shape['params'])
+                raw = cursor.fetchone()[0]
+                plan = json.loads(raw) if isinstance(raw, str) else raw
+                indexes, scans, lines = set(), set(), []
+                self.walk_pg_plan(plan[0]['Plan'], indexes, scans, lines, 0)
+                return lines, indexes, scans
+
+            if vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + shape['sql'], shape['params'])
+                details = [row[-1] for row in cursor.fetchall()]
+                indexes, scans = set(), set()
+                for detail in details:
+                    match = SQLITE_INDEX_RE.search(detail)
+                    if match:
+                        indexes.add(match.group(1))
+                    scan = SQLITE_SCAN_RE.match(detail)
+                    if scan and not match:
+                        scans.add(scan.group(1))
+                return details, indexes, scans
+
+            cursor.execute('EXPLAIN ' + shape['sql'], shape['params'])
+            return [str(row) for row in cursor.fetchall()], set(), set()
+
+    def walk_pg_plan(self, node, indexes, scans, lines, depth):
+        label = node.get('Node Type', '?')
+        if node.get('Index Name'):
+            indexes.add(node['Index Name'])
+            label += f" using {node['Index Name']}"
+        if node.get('Relation Name'):
+            label += f" on {node['Relation Name']}"
+            if node.get('Node Type') == 'Seq Scan':
+                scans.add(node['Relation Name'])
+        label += f"  (cost={node.get('Total Cost')} rows={node.get('Plan Rows')})"
+        if 'Actual Total Time' in node:
+            label += f" actual={node['Actual Total Time']}ms"
+        lines.append('  ' * depth + label)
+        for child in node.get('Plans', []):
+            self.walk_pg_plan(child, indexes, scans, lines, depth + 1)
+
+    def report_indexes(self, connection, index_hits, seq_scans):
+        """Every index of the project tables with how many replayed executions used it"""
+        all_indexes = defaultdict(list)
+        with connection.cursor() as cursor:
+            for table in connection.introspection.table_names(cursor):
+                if not table.startswith(('property_', 'owner_')):
+                    continue
+                constraints = connection.introspection.get_constraints(cursor, table)
+                for name, info in constraints.items():
+                    if (info.get('index') or info.get('unique')) and not info.get('primary_key'):
+                        all_indexes[table].append((name, info.get('columns') or []))
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Uso de índices"))
+        for table in sorted(all_indexes):
+            self.stdout.write(f"{table}")
+            for name, columns in sorted(all_indexes[table], key=lambda i: -index_hits[i[0]]):
+                hits = index_hits.get(name, 0)
+                # Los índices de expresión (Upper('city')) no tienen nombre de columna
+                line = f"    {hits:>8}  {name} ({', '.join(c or 'expr' for c in columns)})"
+                self.stdout.write(line if hits else self.style.WARNING(line + "  <- sin uso"))
+            if seq_scans.get(table):
+                self.stdout.write(self.style.WARNING(f"    {seq_scans[table]:>8}  full table scans"))
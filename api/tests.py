@@ -1,3 +1,538 @@
-from django.test import TestCase
+import concurrent.futures
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from prometheus_client.parser import text_string_to_metric_families
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from api import benchmark, import_audit
+from api.authentication import claims_user
+from api.concurrency import auth_slots
+from backend import storage_backends, throttling
+from owner.models import Owner
+from property.models import HouseForSale
+
+
+class EndpointBudgetTests(TestCase):
+    """
+    Query-count budgets for every route of the router, with the default
+    settings. Budgets live in api/benchmark_budgets.json. The p95 latency
+    budgets are checked by ``manage.py benchmark_endpoints``; here only when
+    BENCHMARK_LATENCY_FACTOR is set (e.g. 1, or 3 on a slow machine).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset()
+
+    def setUp(self):
+        self.budgets = benchmark.load_json(benchmark.BUDGETS_PATH)
+
+    def test_every_router_route_has_a_budget(self):
+        names = [name for name, _ in benchmark.iter_routes()]
+        missing = [name for name in names if name not in self.budgets]
+        self.assertEqual(missing, [])
+
+    def test_endpoints_within_budget(self):
+        results = benchmark.run_benchmark(repeat=5)
+        # El tiempo de reloj depende de la máquina: sin la variable no se mide
+        factor = os.environ.get('BENCHMARK_LATENCY_FACTOR')
+        factor = float(factor) if factor else None
+        self.assertEqual(benchmark.check_budgets(results, self.budgets, latency_factor=factor), [])
+
+
+class StartupTests(SimpleTestCase):
+    """
+    Cold start of a worker (WSGI app + URLconf) in a fresh interpreter:
+    heavy optional modules must load on first use, not at import time.
+    """
+    # Segundos; se multiplica por BENCHMARK_LATENCY_FACTOR en máquinas lentas
+    STARTUP_BUDGET = 1.5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.seconds, cls.entries = import_audit.run_startup()
+
+    def test_heavy_modules_are_not_imported_at_startup(self):
+        self.assertEqual(import_audit.heavy_modules_loaded(self.entries), [])
+
+    def test_startup_within_budget(self):
+        factor = float(os.environ.get('BENCHMARK_LATENCY_FACTOR', 1))
+        self.assertLess(self.seconds, self.STARTUP_BUDGET * factor, import_audit.report(self.seconds, self.entries))
+
+
+
+@override_settings(DATABASE_REPLICAS=['replica_test'], REPLICA_PIN_SECONDS=30)
+class ReplicaRoutingTests(TestCase):
+    """
+    Reads of the API viewsets go to a replica, writes to the primary, and a
+    client that just wrote reads from the primary for a while. The replica is
+    a second SQLite database with different rows, so each response shows
+    which database answered.
+    """
+    REPLICA = 'replica_test'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        # Se registra después de setUpClass: TestCase valida ``databases``
+        # contra settings.DATABASES antes de que exista
+        connections.settings[cls.REPLICA] = connections.configure_settings({
+            'default': connections.settings['default'],
+            cls.REPLICA: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.replica_dir.name, 'replica.sqlite3')},
+        })[cls.REPLICA]
+        cls.databases = cls.databases | {cls.REPLICA}
+        with connections[cls.REPLICA].schema_editor() as editor:
+            editor.create_model(Owner)
+        Owner.objects.using(cls.REPLICA).create(name='Replica')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.databases = cls.databases - {cls.REPLICA}
+        connections[cls.REPLICA].close()
+        del connections[cls.REPLICA]
+        del connections.settings[cls.REPLICA]
+        cls.replica_dir.cleanup()
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        Owner.objects.create(name='Primary')
+        cls.writer = User.objects.create_user('writer', password='pass-1234')
+        cls.reader = User.objects.create_user('reader', password='pass-1234')
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def owner_names(self, user):
+        response = self.client_for(user).get('/api/owners/')
+        self.assertEqual(response.status_code, 200)
+        return sorted(owner['name'] for owner in response.json()['results'])
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.owner_names(self.reader), ['Replica'])
+
+    def test_writes_go_to_primary_and_pin_the_writer(self):
+        response = self.client_for(self.writer).post('/api/owners/', {'name': 'Nuevo'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Owner.objects.using('default').filter(name='Nuevo').exists())
+        self.assertFalse(Owner.objects.using(self.REPLICA).filter(name='Nuevo').exists())
+
+        self.assertEqual(self.owner_names(self.writer), ['Nuevo', 'Primary'])
+        self.assertEqual(self.owner_names(self.reader), ['Replica'])
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_no_pin_without_window(self):
+        self.client_for(self.writer).post('/api/owners/', {'name': 'Nuevo'}, format='json')
+        self.assertEqual(self.owner_names(self.writer), ['Replica'])
+
+    def test_failed_writes_do_not_pin(self):
+        response = self.client_for(self.writer).post('/api/owners/', {'phone': 'x' * 20}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.owner_names(self.writer), ['Replica'])
+
+    def test_reads_outside_replica_views_use_primary(self):
+        self.assertEqual(HouseForSale.objects.all().db, 'default')
+        self.assertEqual(list(Owner.objects.values_list('name', flat=True)), ['Primary'])
+
+
+@override_settings(JWT_CLAIMS_AUTH=True)
+class ClaimsAuthenticationTests(TestCase):
+    """Tokens from /api/token/ authenticate without loading the user"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('claims', email='claims@example.com', password='pass-1234')
+
+    def obtain(self):
+        response = self.client.post('/api/token/', {'username': 'claims', 'password': 'pass-1234'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def me(self, access):
+        return self.client.get('/api/me/', HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_me_without_queries(self):
+        access = self.obtain()['access']
+        with self.assertNumQueries(0):
+            response = self.me(access)
+        self.assertEqual(response.json(), {'id': self.user.id, 'username': 'claims', 'email': 'claims@example.com'})
+
+    def test_saving_the_user_revokes_access_and_refresh(self):
+        tokens = self.obtain()
+        self.user.set_password('otra-clave-5678')
+        self.user.save()
+        self.assertEqual(self.me(tokens['access']).status_code, 401)
+        response = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+        fresh = self.client.post('/api/token/', {'username': 'claims', 'password': 'otra-clave-5678'}).json()
+        self.assertEqual(self.me(fresh['access']).status_code, 200)
+
+    def test_refreshed_token_keeps_claims(self):
+        access = self.client.post('/api/token/refresh/', {'refresh': self.obtain()['refresh']}).json()['access']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.me(access).json()['username'], 'claims')
+
+    def test_tokens_without_claims_load_the_user(self):
+        with self.assertNumQueries(1):
+            response = self.me(AccessToken.for_user(self.user))
+        self.assertEqual(response.json()['username'], 'claims')
+
+    def test_each_request_gets_its_own_user(self):
+        args = (self.user.pk, 'claims', 'claims@example.com', False, False)
+        first, second = claims_user(*args), claims_user(*args)
+        self.assertIsNot(first, second)
+        User.objects.filter(pk=self.user.pk).update(first_name='Ana')
+        self.assertEqual(first.first_name, 'Ana')
+        first.first_name = 'modificado'
+        User.objects.filter(pk=self.user.pk).update(first_name='Bea')
+        self.assertEqual(claims_user(*args).first_name, 'Bea')
+
+    @override_settings(JWT_CLAIMS_AUTH=False)
+    def test_without_shared_cache_the_user_is_loaded(self):
+        access = self.obtain()['access']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.me(access).status_code, 200)
+        # Sin señales (otro proceso, QuerySet.update): no hay revocación en el caché
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.me(access).status_code, 401)
+
+
+@override_settings(AUTH_MAX_CONCURRENCY=1, AUTH_MAX_WAITING=1, AUTH_QUEUE_TIMEOUT=0.05)
+class PasswordHashingTests(TestCase):
+    """Bounded auth endpoints and transparent password hash upgrades"""
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, username='hash', password='pass-1234'):
+        return self.client.post('/api/token/', {'username': username, 'password': password})
+
+    def test_busy_auth_endpoints_answer_503(self):
+        User.objects.create_user('hash', password='pass-1234')
+        slots = auth_slots()
+        slots.acquire()
+        try:
+            response = self.login()
+            register = self.client.post('/api/user/register/', {'username': 'otro', 'password': 'pass-1234'})
+        finally:
+            slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(register.status_code, 503)
+        self.assertEqual(self.login().status_code, 200)
+
+    @override_settings(AUTH_QUEUE_TIMEOUT=5, JWT_CLAIMS_AUTH=True)
+    def test_login_burst_leaves_threads_for_listings(self):
+        # 4 hilos como un worker gthread; cada login tarda hasta que se suelte `release`
+        release = threading.Event()
+        started = []
+
+        def slow_login(view, request, *args, **kwargs):
+            started.append(1)
+            release.wait(5)
+            return Response({})
+
+        listing = benchmark.authenticated_client()
+        try:
+            with mock.patch.object(TokenObtainPairView, 'post', slow_login), \
+                    concurrent.futures.ThreadPoolExecutor(4) as pool:
+                logins = [pool.submit(self.login) for _ in range(6)]
+                time.sleep(0.2)
+                houses = pool.submit(listing.get, '/api/houses-for-sale/')
+                # Un login calcula, otro espera turno y el resto recibe 503 sin esperar
+                self.assertEqual(houses.result(timeout=2).status_code, 200)
+                self.assertEqual(len(started), 1)
+                rejected = [future for future in logins if future.done()]
+                self.assertEqual(len(rejected), 4)
+                self.assertTrue(all(future.result().status_code == 503 for future in rejected))
+                release.set()
+                self.assertEqual(sorted(future.result().status_code for future in logins), [200, 200, 503, 503, 503, 503])
+        finally:
+            release.set()
+
+    @override_settings(ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=1024, ARGON2_PARALLELISM=1)
+    def test_login_upgrades_hash_without_revoking_tokens(self):
+        user = User.objects.create_user('hash', password='pass-1234')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        access = self.login().json()['access']
+
+        hashers = ['api.hashers.TunableArgon2PasswordHasher', 'django.contrib.auth.hashers.PBKDF2PasswordHasher']
+        with override_settings(PASSWORD_HASHERS=hashers):
+            self.assertEqual(self.login().status_code, 200)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('argon2$argon2id$v=19$m=1024,t=1,p=1$'))
+            self.assertEqual(self.login().status_code, 200)
+        me = self.client.get('/api/me/', HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(me.status_code, 200)
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+class ThrottleTests(TestCase):
+    """Token bucket per client, charged per route and per returned row"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('limited')
+        owner = Owner.objects.create(name='Owner')
+        HouseForSale.objects.bulk_create(
+            HouseForSale(title=f"Casa {i}", owner=owner, selling_cost=1000 + i) for i in range(30)
+        )
+
+    def setUp(self):
+        cache.clear()
+        throttling._store.cache_clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @throttle_rates(user='10/min')
+    def test_bucket_capacity_per_user(self):
+        for store in ('memory', 'cache'):
+            with self.subTest(store=store), self.settings(THROTTLE_STORE=store):
+                for _ in range(10):
+                    self.assertEqual(self.client.get('/api/owners/0/').status_code, 404)
+                response = self.client.get('/api/owners/0/')
+                self.assertEqual(response.status_code, 429)
+                self.assertEqual(response['Retry-After'], '6')
+
+    @throttle_rates(user='20/min')
+    @override_settings(THROTTLE_COST_PER_ROW=1)
+    def test_rows_returned_are_charged(self):
+        response = self.client.get('/api/houses-for-sale/price_range/')
+        self.assertEqual(len(response.json()['results']), 30)
+        # 20 - 5 (ruta) - 30 (filas) = -15: faltan 16 fichas a 1 cada 3 segundos
+        response = self.client.get('/api/owners/0/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '48')
+
+    @throttle_rates(user=None)
+    def test_scope_without_rate_is_not_limited(self):
+        for _ in range(20):
+            self.assertEqual(self.client.get('/api/owners/0/').status_code, 404)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_THRESHOLD_MS=0, PROFILING_SAMPLE_RATE=0)
+class ProfilingMiddlewareTests(TestCase):
+    """Server-Timing breakdown per request (``backend.profiling``)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=1, houses_per_owner=3, images_per_house=1)
+
+    def setUp(self):
+        # El middleware se carga con el primer request de cada cliente
+        self.client = benchmark.authenticated_client()
+        storage = benchmark.fake_image_storage()
+        storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+
+    def test_sections_are_timed(self):
+        with self.assertLogs('backend.profiling', 'WARNING') as logs:
+            response = self.client.get('/api/houses-for-sale/')
+        timing = dict(
+            (metric.split(';')[0], metric) for metric in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(list(timing), ['db', 'serialize', 'total'])
+        self.assertRegex(timing['db'], r'^db;dur=\d+\.\d{2};desc="\d+ queries"$')
+        self.assertRegex(timing['total'], r'^total;dur=\d+\.\d{2}$')
+        self.assertIn('Slow request GET /api/houses-for-sale/', logs.output[0])
+        self.assertIn('slowest queries', logs.output[0])
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_middleware_adds_nothing(self):
+        response = self.client.get('/api/houses-for-sale/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class PresignedURLCacheTests(SimpleTestCase):
+    """In-process reuse of presigned URLs (``backend.storage_backends``)"""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('backend.storage_backends.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_urls_are_reused_for_half_their_validity_at_most(self):
+        cache = storage_backends.PresignedURLCache(max_age=300)
+        cache.set('short', 'url-short', expiration=120)
+        cache.set('long', 'url-long', expiration=3600)
+        self.now += 59
+        self.assertEqual(cache.get('short'), 'url-short')
+        self.now += 1
+        self.assertIsNone(cache.get('short'))
+        self.assertEqual(cache.get('long'), 'url-long')
+        self.now += 240
+        self.assertIsNone(cache.get('long'))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = storage_backends.PresignedURLCache(max_age=300, max_entries=2)
+        cache.set('a', 'url-a', 3600)
+        cache.set('b', 'url-b', 3600)
+        cache.get('a')
+        cache.set('c', 'url-c', 3600)
+        self.assertEqual([cache.get(key) for key in 'abc'], ['url-a', None, 'url-c'])
+
+    def test_service_signs_again_without_cache(self):
+        client = mock.Mock()
+        client.generate_presigned_url.side_effect = (f'signed-{i}' for i in range(100))
+        storage_backends.presigned_url_cache.clear()
+        self.addCleanup(storage_backends.presigned_url_cache.clear)
+        with mock.patch('backend.storage_backends.get_s3_client', return_value=client):
+            service = storage_backends.S3ImageService()
+            first = service.generate_presigned_url('a.jpg', 600)
+            self.assertEqual(service.generate_presigned_url('a.jpg', 600), first)
+            self.assertEqual(service.generate_presigned_urls(['a.jpg', 'b.jpg'], 600),
+                             {'a.jpg': first, 'b.jpg': 'signed-1'})
+            self.assertEqual(service.generate_presigned_url('a.jpg', 600, cache=False), 'signed-2')
+            self.assertEqual(service.generate_presigned_urls(['b.jpg'], 600, cache=False), {'b.jpg': 'signed-3'})
+            # Otra expiración es otra URL
+            self.assertEqual(service.generate_presigned_url('a.jpg', 60), 'signed-4')
+
+
+class QueryLogTests(TestCase):
+    """SQL capture (``backend.query_log``) and its replay with ``explain_queries``"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=2, houses_per_owner=3, images_per_house=1)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_path = os.path.join(directory.name, 'queries.jsonl')
+        storage = benchmark.fake_image_storage()
+        storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+
+    def record(self, url):
+        # El middleware lee QUERY_LOG_PATH al cargarse con el primer request del cliente
+        with override_settings(QUERY_LOG_PATH=self.log_path):
+            response = benchmark.authenticated_client().get(url)
+        self.assertEqual(response.status_code, 200)
+        with open(self.log_path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_requests_are_logged_with_their_path(self):
+        owner_id = Owner.objects.order_by('pk').values_list('pk', flat=True).first()
+        entries = self.record(f'/api/houses-for-sale/?owner_id={owner_id}')
+        self.assertEqual({entry['path'] for entry in entries}, {'/api/houses-for-sale/'})
+        listing = [e for e in entries if 'FROM "property_houseforsale"' in e['sql']]
+        self.assertTrue(listing)
+        self.assertIn(owner_id, listing[-1]['params'])
+        self.assertTrue(all(entry['duration_ms'] >= 0 for entry in entries))
+
+    def test_middleware_is_removed_without_a_path(self):
+        benchmark.authenticated_client().get('/api/houses-for-sale/')
+        self.assertFalse(os.path.exists(self.log_path))
+
+    def test_explain_reports_index_usage(self):
+        owner_id = Owner.objects.order_by('pk').values_list('pk', flat=True).first()
+        self.record(f'/api/houses-for-sale/?owner_id={owner_id}')
+        out = io.StringIO()
+        call_command('explain_queries', self.log_path, stdout=out)
+        report = out.getvalue()
+        self.assertIn('formas de consulta', report)
+        self.assertIn('paths: /api/houses-for-sale/', report)
+        self.assertRegex(report, r'\n\s+[1-9]\d*  sale_owner_created_idx \(owner_id, created_at\)\n')
+        self.assertRegex(report, r'sale_city_price_idx .*<- sin uso')
+
+    def test_log_without_selects_is_an_error(self):
+        with open(self.log_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'sql': 'UPDATE "owner_owner" SET "name" = %s', 'params': ['x'],
+                                'alias': 'default', 'path': '/', 'duration_ms': 0.1}) + '\n')
+        with self.assertRaisesMessage(CommandError, 'No SELECT statements found in the log'):
+            call_command('explain_queries', self.log_path, stdout=io.StringIO())
+
+
+METRICS_WORKER = """
+import django
+django.setup()
+from django.test import Client
+from backend import metrics
+print(Client().get('/api/images/token/').status_code)
+metrics.throttle_charged('HouseForSaleViewSet.list', 3, True)
+"""
+
+METRICS_ASYNC_WORKER = """
+import asyncio
+import django
+django.setup()
+from asgiref.sync import iscoroutinefunction
+from django.test import AsyncClient
+from backend.metrics import MetricsMiddleware
+
+async def view(request):
+    pass
+
+assert iscoroutinefunction(MetricsMiddleware(view))
+print(asyncio.run(AsyncClient().get('/api/images/token/')).status_code)
+"""
+
+METRICS_SCRAPE = """
+import django
+django.setup()
+from django.test import Client
+print(Client().get('/metrics').content.decode())
+"""
+
+
+class MetricsMiddlewareTests(SimpleTestCase):
+    """
+    With ``PROMETHEUS_MULTIPROC_DIR`` every worker process writes its own
+    counters and ``/metrics`` adds them up. Metrics are configured at import
+    time, so each worker is a fresh interpreter.
+    """
+
+    def run_process(self, directory, code):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'backend.settings', 'METRICS_ENABLED': 'true',
+               'PROMETHEUS_MULTIPROC_DIR': directory, 'IMAGE_PROXY_ENABLED': 'false'}
+        env.pop('METRICS_TOKEN', None)
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout
+
+    def test_counters_of_every_worker_add_up(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for code in (METRICS_WORKER, METRICS_WORKER, METRICS_ASYNC_WORKER):
+                self.assertEqual(self.run_process(directory, code).strip(), '404')
+            scraped = self.run_process(directory, METRICS_SCRAPE)
+
+        samples = {
+            (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+            for family in text_string_to_metric_families(scraped) for sample in family.samples
+        }
+        request = (('method', 'GET'), ('status', '404'), ('view', 'serve_image'))
+        self.assertEqual(samples[('http_request_duration_seconds_count', request)], 3)
+        self.assertEqual(samples[('db_queries_per_request_count', (('view', 'serve_image'),))], 3)
+        self.assertEqual(samples[('throttle_cost_total', (('route', 'HouseForSaleViewSet.list'),))], 6)
+        # La petición a /metrics no se cuenta a sí misma
+        self.assertNotIn('metrics_view', scraped)
@@ -4,14 +4,26 @@ from .serializers import UserSerializer
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework_simplejwt.views import TokenObtainPairView
 
+from .concurrency import AuthConcurrencyMixin
 
-class CreateUserView(generics.CreateAPIView):
+
+class CreateUserView(AuthConcurrencyMixin, generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
 
 
+class TokenObtainView(AuthConcurrencyMixin, TokenObtainPairView):
+    """
+    Endpoint: POST /api/token/
+
+    ``TokenObtainPairView`` limited to ``AUTH_MAX_CONCURRENCY`` concurrent
+    password checks per worker.
+    """
+
+
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -19,6 +31,7 @@ from rest_framework.response import Response
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def me(request):
+    # Con ClaimsJWTAuthentication estos campos vienen del token: sin consultas
     user = request.user
     return Response({
         "id": user.id,
@@ -0,0 +1,145 @@
+"""
+Compresión de respuestas negociada con ``Accept-Encoding``.
+
+Sólo se comprimen respuestas JSON (``application/json``, ``...+json``) de al
+menos ``COMPRESSION_MIN_BYTES``: una página de 100 casas baja a una fracción
+de su tamaño, mientras que comprimir un token o un error de 60 bytes sólo
+gasta CPU.
+
+Codificaciones, en orden de preferencia del servidor (``COMPRESSION_ENCODINGS``):
+
+- ``zstd``: requiere el paquete ``zstandard``
+- ``br``: requiere ``brotli``
+- ``gzip``: biblioteca estándar, siempre disponible
+
+Las que no estén instaladas se ignoran. El cliente puede excluir o preferir
+codificaciones con valores ``q`` (``Accept-Encoding: br;q=1.0, gzip;q=0.5``).
+"""
+import gzip
+import importlib
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from backend import profiling
+
+_COMPRESSIBLE = _lazy_re_compile(r'^application/(?:[\w.+-]+\+)?json\b')
+
+DEFAULT_ENCODINGS = ('zstd', 'br', 'gzip')
+DEFAULT_MIN_BYTES = 1024
+
+# Niveles pensados para respuestas dinámicas: buena compresión sin que
+# comprimir cueste más que enviar los bytes
+LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+
+
+@lru_cache(maxsize=None)
+def compressor(encoding):
+    """
+    Returns:
+        callable: bytes -> compressed bytes, or None if the library is missing
+    """
+    level = LEVELS[encoding]
+    if encoding == 'gzip':
+        return lambda data: gzip.compress(data, compresslevel=level, mtime=0)
+    try:
+        module = importlib.import_module({'br': 'brotli', 'zstd': 'zstandard'}[encoding])
+    except ImportError:
+        return None
+    if encoding == 'br':
+        return lambda data: module.compress(data, quality=level)
+    return module.ZstdCompressor(level=level).compress
+
+
+def parse_accept_encoding(header):
+    """
+    Returns:
+        dict: encoding -> q value (``identity`` and ``*`` included as sent)
+    """
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def choose_encoding(header, encodings=DEFAULT_ENCODINGS):
+    """
+    Best available encoding for an ``Accept-Encoding`` header: highest q
+    from the client, ties broken by the server order. None if nothing fits.
+    """
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q and compressor(encoding) is not None:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON responses above ``COMPRESSION_MIN_BYTES`` with the best
+    encoding both sides support (zstd, br or gzip).
+
+    Sync and async capable, like Django's own middleware: under ASGI the
+    async views are not pushed to a thread just to pass through here.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.encodings = tuple(getattr(settings, 'COMPRESSION_ENCODINGS', DEFAULT_ENCODINGS))
+        self.min_bytes = getattr(settings, 'COMPRESSION_MIN_BYTES', DEFAULT_MIN_BYTES)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.streaming or not _COMPRESSIBLE.match(response.get('Content-Type', '')):
+            return response
+        # La respuesta varía según Accept-Encoding aunque esta vez no se comprima
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.has_header('Content-Encoding') or len(response.content) < self.min_bytes:
+            return response
+
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.encodings)
+        if encoding is None:
+            return response
+        with profiling.section('compress'):
+            compressed = compressor(encoding)(response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # Un ETag fuerte identifica los bytes sin comprimir
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,126 @@
+"""
+Lecturas de la API en réplicas de solo lectura.
+
+Las réplicas se configuran con ``DATABASE_REPLICA_URLS`` (alias
+``replica_1``, ``replica_2``, ...). ``ReplicaReadMixin`` marca las peticiones
+GET/HEAD/OPTIONS de un viewset para que ``ReplicaRouter`` mande sus lecturas a
+una réplica al azar; todo lo demás (escrituras, autenticación, comandos,
+peticiones a otras vistas) sigue en ``default``.
+
+Leer lo que uno acaba de escribir: tras una escritura exitosa el cliente
+(usuario autenticado o, si no, su IP) queda fijado al primario durante
+``REPLICA_PIN_SECONDS`` para no ver datos que la réplica aún no recibió. La
+marca se guarda en el caché de Django, que debe ser compartido entre workers
+(``CACHE_URL``, p. ej. Redis) para que la fijación valga en todos.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+# Alias de la réplica elegida para la petición en curso (None = primario)
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def _target(alias):
+    settings_dict = connections[alias].settings_dict
+    return tuple(settings_dict.get(key) for key in ('ENGINE', 'HOST', 'PORT', 'NAME'))
+
+
+def replicas():
+    primary = _target(DEFAULT_DB_ALIAS)
+    # Una réplica que apunta a la misma base que el primario es el primario:
+    # así quedan los espejos (TEST MIRROR) durante los tests
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if _target(alias) != primary]
+
+
+def current_read_alias():
+    """Replica chosen for the current request, or None for the primary"""
+    return _read_alias.get()
+
+
+@contextmanager
+def routing_scope(alias=None):
+    """
+    Start a request on the primary (or on ``alias``) and forget the chosen
+    replica when it ends.
+    """
+    # Los hilos de gunicorn reutilizan su contexto entre peticiones
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def _pin_key(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"replica-pin:user:{user.pk}"
+    return f"replica-pin:ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def pin_to_primary(request):
+    """Send this client's reads to the primary for ``REPLICA_PIN_SECONDS``"""
+    seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    if seconds > 0:
+        cache.set(_pin_key(request), True, seconds)
+
+
+def is_pinned(request):
+    return bool(cache.get(_pin_key(request)))
+
+
+class ReplicaRouter:
+    """
+    Reads go to the replica chosen for the current request, if any; writes
+    always go to the primary. Replicas are never migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Un objeto leído de una réplica también se guarda en el primario
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Route safe-method requests of a DRF view to a read replica.
+
+    Authentication and permissions run on the primary; only what the view
+    reads afterwards (queryset, pagination count, serializers) goes to the
+    replica. Unsafe requests that succeed pin the client to the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with routing_scope():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        available = replicas()
+        if available and request.method in SAFE_METHODS and not is_pinned(request):
+            _read_alias.set(random.choice(available))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replicas():
+            pin_to_primary(request)
+        return response
@@ -0,0 +1,258 @@
+"""
+Métricas en formato Prometheus expuestas en ``/metrics``.
+
+Con ``METRICS_ENABLED`` activo se registran:
+
+- ``http_request_duration_seconds``: latencia por vista/acción de DRF
+  (p. ej. ``HouseForSaleViewSet.list``), método y código de respuesta.
+- ``db_queries_per_request``: consultas SQL por petición y vista.
+- ``s3_call_duration_seconds``: llamadas a S3 por operación (su ``_count`` es
+  el número de llamadas).
+- ``presigned_url_cache_total``: aciertos/fallos del caché de URLs firmadas.
+- ``image_proxy_cache_total``: aciertos/fallos del caché en disco del proxy
+  de imágenes (``property.image_proxy``).
+- ``image_upload_bytes``: tamaño de las imágenes subidas.
+- ``auth_queue_wait_seconds``, ``auth_rejected_total`` y ``auth_in_progress``:
+  cola de los endpoints que calculan hashes de contraseña (``api.concurrency``).
+- ``throttle_cost_total`` y ``throttle_rejected_total``: fichas cobradas y
+  peticiones rechazadas por ruta (``backend.throttling``).
+
+Con gunicorn cada worker es un proceso distinto: con
+``PROMETHEUS_MULTIPROC_DIR`` definido, cada proceso escribe sus contadores en
+archivos mmap de ese directorio y ``/metrics`` los suma todos (ver
+``gunicorn.conf.py``, que limpia el directorio al arrancar y marca los
+workers que terminan).
+"""
+import os
+import time
+from contextlib import ExitStack, nullcontext
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+ENABLED = getattr(settings, 'METRICS_ENABLED', False)
+MULTIPROC_DIR = getattr(settings, 'PROMETHEUS_MULTIPROC_DIR', None)
+
+# Desactivadas, prometheus_client ni siquiera se importa (arranque más rápido)
+if ENABLED:
+    # prometheus_client decide al importarse si usa valores en memoria o
+    # archivos mmap, así que la variable de entorno debe existir antes del import
+    if MULTIPROC_DIR:
+        os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', MULTIPROC_DIR)
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+        multiprocess,
+    )
+
+    REQUEST_DURATION = Histogram(
+        'http_request_duration_seconds', 'Request latency by DRF view/action',
+        ['view', 'method', 'status'],
+    )
+    DB_QUERIES = Histogram(
+        'db_queries_per_request', 'SQL statements executed per request',
+        ['view'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, float('inf')),
+    )
+    S3_CALL_DURATION = Histogram(
+        's3_call_duration_seconds', 'S3 calls by operation',
+        ['operation'], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, float('inf')),
+    )
+    PRESIGNED_URL_CACHE = Counter(
+        'presigned_url_cache', 'Presigned URL cache lookups', ['result'],
+    )
+    IMAGE_PROXY_CACHE = Counter(
+        'image_proxy_cache', 'Image proxy disk cache lookups', ['result'],
+    )
+    UPLOAD_BYTES = Histogram(
+        'image_upload_bytes', 'Size of uploaded images',
+        buckets=(50e3, 100e3, 250e3, 500e3, 1e6, 2.5e6, 5e6, 10e6, float('inf')),
+    )
+    AUTH_QUEUE_WAIT = Histogram(
+        'auth_queue_wait_seconds', 'Time auth requests waited for a password hashing slot',
+        buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf')),
+    )
+    AUTH_REJECTED = Counter(
+        'auth_rejected', 'Auth requests rejected after waiting AUTH_QUEUE_TIMEOUT',
+    )
+    AUTH_IN_PROGRESS = Gauge(
+        'auth_in_progress', 'Auth requests holding a password hashing slot',
+        multiprocess_mode='livesum',
+    )
+    THROTTLE_COST = Counter(
+        'throttle_cost', 'Rate limit tokens charged by route', ['route'],
+    )
+    THROTTLE_REJECTED = Counter(
+        'throttle_rejected', 'Requests rejected by the rate limit by route', ['route'],
+    )
+
+
+_NO_METRIC = nullcontext()
+
+
+class _S3Call:
+    __slots__ = ('operation', 'start')
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        S3_CALL_DURATION.labels(self.operation).observe(time.perf_counter() - self.start)
+        return False
+
+
+def s3_call(operation):
+    """
+    Time an S3 operation.
+
+    Uso:
+        with metrics.s3_call('generate_presigned_url'):
+            ...
+    """
+    if not ENABLED:
+        return _NO_METRIC
+    return _S3Call(operation)
+
+
+def presigned_url_cache(hit):
+    if ENABLED:
+        PRESIGNED_URL_CACHE.labels('hit' if hit else 'miss').inc()
+
+
+def image_proxy_cache(hit):
+    if ENABLED:
+        IMAGE_PROXY_CACHE.labels('hit' if hit else 'miss').inc()
+
+
+def image_uploaded(size):
+    if ENABLED and size is not None:
+        UPLOAD_BYTES.observe(size)
+
+
+def auth_queued(wait, admitted):
+    if ENABLED:
+        AUTH_QUEUE_WAIT.observe(wait)
+        if admitted:
+            AUTH_IN_PROGRESS.inc()
+        else:
+            AUTH_REJECTED.inc()
+
+
+def auth_finished():
+    if ENABLED:
+        AUTH_IN_PROGRESS.dec()
+
+
+def throttle_charged(route, cost, allowed):
+    if ENABLED:
+        if allowed:
+            THROTTLE_COST.labels(route).inc(cost)
+        else:
+            THROTTLE_REJECTED.labels(route).inc()
+
+
+def view_name(view_func, method):
+    """
+    ``HouseForSaleViewSet.list`` for viewsets, ``PropertySearchView.get`` for
+    APIViews, ``me.get`` for ``@api_view`` functions and the function name
+    for plain Django views.
+    """
+    cls = getattr(view_func, 'cls', None)
+    method = method.lower()
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None) or {}
+    return f"{cls.__name__}.{actions.get(method, method)}"
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Records latency and SQL query count per view; removed unless ``METRICS_ENABLED``.
+    Sync and async capable, so async views stay on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request._metrics_view = 'unmatched'
+        counter = _QueryCounter()
+        start = time.perf_counter()
+        with self.count_queries(counter):
+            response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start, counter)
+        return response
+
+    async def __acall__(self, request):
+        request._metrics_view = 'unmatched'
+        counter = _QueryCounter()
+        start = time.perf_counter()
+        # Las conexiones son por hilo: el ORM de la petición corre en su hilo de
+        # sync_to_async (thread_sensitive), así que el contador se instala ahí
+        stack = await sync_to_async(self.count_queries)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.observe(request, response, time.perf_counter() - start, counter)
+        return response
+
+    def count_queries(self, counter):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        return stack
+
+    def observe(self, request, response, duration, counter):
+        view = request._metrics_view
+        if view != 'metrics_view':
+            REQUEST_DURATION.labels(view, request.method, str(response.status_code)).observe(duration)
+            DB_QUERIES.labels(view).observe(counter.count)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = view_name(view_func, request.method)
+
+
+def metrics_view(request):
+    """
+    Endpoint: GET /metrics
+
+    Requires ``Authorization: Bearer <METRICS_TOKEN>`` when ``METRICS_TOKEN`` is set.
+    """
+    if not ENABLED:
+        raise Http404("Metrics are disabled")
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return HttpResponse(status=401)
+
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
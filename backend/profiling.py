@@ -0,0 +1,235 @@
+"""
+Perfilado por petición: dónde se va el tiempo de cada respuesta.
+
+Con ``PROFILING_ENABLED`` activo, cada petición mide por separado el tiempo
+en SQL (número de consultas, tiempo total y las más lentas), en llamadas a
+S3 (``S3ImageService``) y en serialización, y lo devuelve en el encabezado
+``Server-Timing`` (visible en la pestaña Network del navegador).
+
+Con ``PROFILING_SAMPLE_RATE`` > 0, una fracción de las peticiones corre además
+bajo cProfile (o pyinstrument si está instalado y se pide) y, si tardan más de
+``PROFILING_THRESHOLD_MS``, el perfil se guarda en ``PROFILING_DUMP_DIR``.
+
+Desactivado, el middleware se quita de la cadena y los puntos de medición
+(``section``) sólo consultan una ``ContextVar`` vacía.
+"""
+import cProfile
+import heapq
+import logging
+import random
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack, nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_active_profile = ContextVar('request_profile', default=None)
+_NO_SECTION = nullcontext()
+
+
+class _Section:
+    """Adds the elapsed time to ``profile.timings[name]``; nested sections of the same name count once"""
+
+    __slots__ = ('profile', 'name', 'start')
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        depth = self.profile.depth
+        depth[self.name] += 1
+        if depth[self.name] == 1:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        depth = self.profile.depth
+        depth[self.name] -= 1
+        if depth[self.name] == 0:
+            self.profile.timings[self.name] += time.perf_counter() - self.start
+        return False
+
+
+class RequestProfile:
+    """Timings collected while a single request is being handled"""
+
+    def __init__(self, slow_query_count=5):
+        self.timings = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.depth = defaultdict(int)
+        self.slow_query_count = slow_query_count
+        self.slow_queries = []  # heap de (duración, sql)
+
+    def section(self, name):
+        self.counts[name] += 1
+        return _Section(self, name)
+
+    def record_query(self, sql, duration):
+        self.timings['db'] += duration
+        self.counts['db'] += 1
+        entry = (duration, sql)
+        if len(self.slow_queries) < self.slow_query_count:
+            heapq.heappush(self.slow_queries, entry)
+        elif duration > self.slow_queries[0][0]:
+            heapq.heapreplace(self.slow_queries, entry)
+
+    def slowest_queries(self):
+        return sorted(self.slow_queries, reverse=True)
+
+    def server_timing(self, total):
+        """
+        Returns:
+            str: ``Server-Timing`` header value (durations in ms)
+        """
+        metrics = []
+        descriptions = {'db': 'queries', 'storage': 'calls'}
+        for name in ('db', 'storage', 'serialize'):
+            if name not in self.counts:
+                continue
+            metric = f"{name};dur={self.timings[name] * 1000:.2f}"
+            if name in descriptions:
+                metric += f';desc="{self.counts[name]} {descriptions[name]}"'
+            metrics.append(metric)
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ', '.join(metrics)
+
+
+def section(name):
+    """
+    Time a block of code under ``name`` for the current request.
+
+    Uso:
+        with profiling.section('storage'):
+            client.generate_presigned_url(...)
+    """
+    profile = _active_profile.get()
+    if profile is None:
+        return _NO_SECTION
+    return profile.section(name)
+
+
+class ProfiledSerializerMixin:
+    """Counts ``to_representation`` as serializer time (nested serializers count once)"""
+
+    def to_representation(self, instance):
+        profile = _active_profile.get()
+        if profile is None:
+            return super().to_representation(instance)
+        with profile.section('serialize'):
+            return super().to_representation(instance)
+
+
+class _QueryTimer:
+    """``connection.execute_wrapper`` feeding a RequestProfile"""
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.profile.record_query(sql, time.perf_counter() - start)
+
+
+def _start_profiler(kind):
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument no está instalado; usando cProfile")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+
+def _dump_profile(profiler, directory, request, total):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+    stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug[:60]}-{total * 1000:.0f}ms"
+    if isinstance(profiler, cProfile.Profile):
+        path = directory / f"{stem}.prof"
+        profiler.dump_stats(path)
+    else:
+        path = directory / f"{stem}.html"
+        path.write_text(profiler.output_html(), encoding='utf-8')
+    return path
+
+
+class ProfilingMiddleware:
+    """
+    Adds a ``Server-Timing`` breakdown (db, storage, serialize, total) to every
+    response and logs requests slower than ``PROFILING_THRESHOLD_MS`` with
+    their slowest SQL statements. Removed from the chain unless
+    ``PROFILING_ENABLED`` is set.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.threshold = getattr(settings, 'PROFILING_THRESHOLD_MS', 500) / 1000
+        self.profiler_kind = getattr(settings, 'PROFILING_PROFILER', 'cprofile')
+        self.dump_dir = getattr(settings, 'PROFILING_DUMP_DIR', None)
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _active_profile.set(profile)
+        profiler = None
+        if self.sample_rate and self.dump_dir and random.random() < self.sample_rate:
+            profiler = _start_profiler(self.profiler_kind)
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                timer = _QueryTimer(profile)
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - start
+            if profiler is not None:
+                _stop_profiler(profiler)
+            _active_profile.reset(token)
+
+        response['Server-Timing'] = profile.server_timing(total)
+        if total >= self.threshold:
+            self.report_slow_request(request, profile, total, profiler)
+        return response
+
+    def report_slow_request(self, request, profile, total, profiler):
+        dump = None
+        if profiler is not None:
+            try:
+                dump = _dump_profile(profiler, self.dump_dir, request, total)
+            except OSError as e:
+                logger.error(f"Error saving profile for {request.path}: {e}")
+        slowest = '\n'.join(f"  {duration * 1000:.1f}ms {sql[:300]}" for duration, sql in profile.slowest_queries())
+        logger.warning(
+            f"Slow request {request.method} {request.path}: {total * 1000:.0f}ms "
+            f"({profile.server_timing(total)})"
+            + (f"\nprofile: {dump}" if dump else '')
+            + (f"\nslowest queries:\n{slowest}" if slowest else '')
+        )
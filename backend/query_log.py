@@ -0,0 +1,82 @@
+"""
+Captura de consultas SQL reales para elegir índices con evidencia.
+
+Con ``QUERY_LOG_PATH`` definido, cada consulta ejecutada durante una petición
+se agrega como una línea JSON al archivo. El log se reproduce después con
+``python manage.py explain_queries <archivo>``.
+"""
+import json
+import threading
+import time
+from contextlib import ExitStack
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+_write_lock = threading.Lock()
+
+
+def _jsonable(value):
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, bytes):
+        return None
+    return value
+
+
+class QueryLogRecorder:
+    """``connection.execute_wrapper`` that appends every statement to a JSONL file"""
+
+    def __init__(self, path, alias, request_path=None):
+        self.path = path
+        self.alias = alias
+        self.request_path = request_path
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if not many:
+                self.write({
+                    'sql': sql,
+                    'params': _jsonable(list(params or [])),
+                    'alias': self.alias,
+                    'path': self.request_path,
+                    'duration_ms': round(duration_ms, 3),
+                })
+
+    def write(self, entry):
+        line = json.dumps(entry, default=str)
+        with _write_lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+class QueryLogMiddleware:
+    """
+    Records the SQL of every request when ``QUERY_LOG_PATH`` is set.
+    Removed from the middleware chain otherwise, so it costs nothing.
+    """
+
+    def __init__(self, get_response):
+        self.path = getattr(settings, 'QUERY_LOG_PATH', None)
+        if not self.path:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ExitStack() as stack:
+            for alias in connections:
+                recorder = QueryLogRecorder(self.path, alias, request.path)
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            return self.get_response(request)
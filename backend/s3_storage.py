@@ -0,0 +1,32 @@
+"""
+Storage de S3 para archivos privados. Importa django-storages y boto3, por
+eso sólo se carga a través de ``storage_backends.LazyPrivateMediaStorage``
+cuando de verdad se usa S3.
+"""
+from django.conf import settings
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from . import metrics, profiling
+
+
+class PrivateMediaStorage(S3Boto3Storage):
+    """
+    Custom S3 storage backend for private media files.
+    Files uploaded with this storage will be private and require signed URLs to access.
+    """
+    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+    default_acl = 'private'
+    file_overwrite = False
+    custom_domain = False  # Don't use custom domain for private files
+    querystring_auth = True  # Enable query string authentication
+    querystring_expire = 3600  # URLs expire in 1 hour
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ensure files are private by default
+        self.default_acl = 'private'
+
+    def _save(self, name, content):
+        metrics.image_uploaded(getattr(content, 'size', None))
+        with profiling.section('storage'), metrics.s3_call('put_object'):
+            return super()._save(name, content)
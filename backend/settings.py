@@ -13,6 +13,7 @@ from datetime import timedelta
 from pathlib import Path
 import environ
 import os
+import tempfile
 
 
 
@@ -36,7 +37,7 @@ ALLOWED_HOSTS = ["*"]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -46,16 +47,73 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # Mismos bytes que JSONRenderer, codificados con orjson si está instalado
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.FastJSONRenderer',
+        'backend.renderers.CompactJSONRenderer',  # ?format=compact
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 100  # Aumentar el tamaño de página por defecto
+    'PAGE_SIZE': 100,  # Aumentar el tamaño de página por defecto
+    # Token bucket por usuario (o IP sin autenticar), ver backend/throttling.py
+    'DEFAULT_THROTTLE_CLASSES': (
+        ['backend.throttling.TokenBucketThrottle'] if env.bool("THROTTLE_ENABLED", default=True) else []
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'user': env.str("THROTTLE_USER_RATE", default="3000/min") or None,
+        'anon': env.str("THROTTLE_ANON_RATE", default="300/min") or None,
+    },
 }
 
+# Dónde se guardan los buckets: "memory" (por proceso) o "cache" (el caché de
+# Django; compartido entre workers si CACHE_URL lo es)
+THROTTLE_STORE = env.str("THROTTLE_STORE", default="memory")
+# Fichas que cuesta cada ruta antes de ejecutarse (las demás cuestan 1)
+THROTTLE_ROUTE_COSTS = {
+    'HouseForSaleViewSet.search_by_location': 5,
+    'HouseForSaleViewSet.price_range': 5,
+    'HouseForRentViewSet.search_by_location': 5,
+    'HouseForRentViewSet.rent_range': 5,
+    'PropertyImageViewSet.bulk_upload': 10,
+    'HouseForSaleViewSet.upload_images': 10,
+    'HouseForRentViewSet.upload_images': 10,
+    'HouseForSaleViewSet.bulk': 5,
+    'HouseForRentViewSet.bulk': 5,
+    'TokenObtainView.post': 10,
+    'CreateUserView.post': 10,
+}
+# Y después: por fila devuelta y por MB subido
+THROTTLE_COST_PER_ROW = env.float("THROTTLE_COST_PER_ROW", default=0.02)
+THROTTLE_COST_PER_MB = env.float("THROTTLE_COST_PER_MB", default=5)
+
+# Filas como máximo en las respuestas ?format=ndjson (search_by_location, price_range, rent_range)
+STREAM_MAX_ROWS = env.int("STREAM_MAX_ROWS", default=10000)
+
+# POST /houses-for-*/bulk/: elementos como máximo por petición y filas por INSERT/UPDATE
+BULK_MAX_ITEMS = env.int("BULK_MAX_ITEMS", default=500)
+BULK_BATCH_SIZE = env.int("BULK_BATCH_SIZE", default=200)
+
+# Autocompletado de propietarios (owner/search.py): auto, trigram (PostgreSQL) o prefix (en memoria)
+OWNER_SEARCH_BACKEND = env("OWNER_SEARCH_BACKEND", default="auto")
+# Índice en memoria (backend prefix): uno por worker, unos 290 MB y 11 s de
+# construcción con 1M de propietarios (el doble de memoria mientras se
+# reconstruye). Se reconstruye en un hilo aparte al cambiar un propietario o
+# tras OWNER_SEARCH_INDEX_TTL segundos, sirviendo el anterior mientras tanto
+OWNER_SEARCH_INDEX_TTL = env.int("OWNER_SEARCH_INDEX_TTL", default=300)
+OWNER_SEARCH_INDEX_BACKGROUND = env.bool("OWNER_SEARCH_INDEX_BACKGROUND", default=True)
+
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
-    'REFRESH_TOKEN_LIFETIME': timedelta(days=1)
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Los tokens llevan id, username, email y permisos: la API no consulta el usuario
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.ClaimsTokenRefreshSerializer',
 }
 
+# Datos de usuario armados desde los claims del token que se guardan por proceso
+JWT_USER_CACHE_SIZE = env.int("JWT_USER_CACHE_SIZE", default=1024)
+
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -96,6 +154,9 @@ DEFAULT_FILE_STORAGE = "backend.storage_backends.PrivateMediaStorage"
 MEDIA_URL = None
 
 MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',
+    'backend.profiling.ProfilingMiddleware',
+    'backend.compression.CompressionMiddleware',
 'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -104,7 +165,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-
+    'backend.query_log.QueryLogMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -152,6 +213,133 @@ DATABASES = {
     "default": env.db("DATABASE_URL")
 }
 
+# Réplicas de solo lectura (URLs separadas por comas). Las peticiones GET de
+# los viewsets de casas, imágenes y propietarios leen de ellas (ver
+# backend/db_routers.py); en los tests apuntan a la base de pruebas de default.
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), start=1):
+    DATABASES[f"replica_{_index}"] = {**env.db_url_config(_url), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(f"replica_{_index}")
+DATABASE_ROUTERS = ["backend.db_routers.ReplicaRouter"]
+
+# Segundos que un cliente lee del primario tras escribir (leer lo propio)
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=5)
+
+for _database in DATABASES.values():
+    # Conexiones persistentes: cada hilo reutiliza su conexión (y el handshake
+    # TLS) durante DB_CONN_MAX_AGE segundos en vez de abrir una por petición.
+    # CONN_HEALTH_CHECKS comprueba la conexión antes de reutilizarla, así un
+    # reinicio de la base no termina en errores 500.
+    _database["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=60)
+    _database["CONN_HEALTH_CHECKS"] = env.bool("DB_CONN_HEALTH_CHECKS", default=True)
+
+    if _database["ENGINE"] != "django.db.backends.postgresql":
+        continue
+    _db_options = _database.setdefault("OPTIONS", {})
+
+    # Pool nativo de psycopg 3, compartido por los hilos de cada worker. Sustituye
+    # a CONN_MAX_AGE (Django exige 0): la conexión vuelve al pool al terminar la
+    # petición. DB_POOL_MAX_SIZE debe cubrir GUNICORN_THREADS.
+    if env.bool("DB_POOL", default=False):
+        _database["CONN_MAX_AGE"] = 0
+        _db_options["pool"] = {
+            "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+            "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+            "timeout": env.float("DB_POOL_TIMEOUT", default=10),
+        }
+
+    # Sentencias preparadas en el servidor: psycopg 3 prepara cada consulta que
+    # se repite DB_PREPARE_THRESHOLD veces en la misma conexión. Requiere
+    # binding en el servidor y no es compatible con PgBouncer en modo transacción.
+    _prepare_threshold = env.int("DB_PREPARE_THRESHOLD", default=None)
+    if _prepare_threshold is not None:
+        _db_options["server_side_binding"] = True
+        _db_options["prepare_threshold"] = _prepare_threshold
+
+# Caché compartido entre workers (p. ej. redis://localhost:6379/1); lo usa la
+# fijación al primario tras una escritura. Por defecto, memoria local.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
+# Usuario armado desde los claims del token, sin consultarlo (api.authentication).
+# La revocación de tokens pasa por el caché: por defecto sólo si es compartido
+# entre workers (CACHE_URL), si no se lee el usuario de la base en cada petición
+JWT_CLAIMS_AUTH = env.bool(
+    "JWT_CLAIMS_AUTH",
+    default=not CACHES["default"]["BACKEND"].endswith(("LocMemCache", "DummyCache")),
+)
+
+# Captura de SQL por petición (JSONL) para `manage.py explain_queries`.
+# Vacío = desactivado.
+QUERY_LOG_PATH = env("QUERY_LOG_PATH", default=None)
+
+# Perfilado por petición (encabezado Server-Timing: db, storage, serialize).
+# Con PROFILING_SAMPLE_RATE > 0 se guarda un perfil cProfile/pyinstrument de
+# las peticiones muestreadas que pasen de PROFILING_THRESHOLD_MS.
+PROFILING_ENABLED = env.bool("PROFILING_ENABLED", default=False)
+PROFILING_SAMPLE_RATE = env.float("PROFILING_SAMPLE_RATE", default=0.0)
+PROFILING_THRESHOLD_MS = env.float("PROFILING_THRESHOLD_MS", default=500)
+PROFILING_PROFILER = env("PROFILING_PROFILER", default="cprofile")  # o "pyinstrument"
+PROFILING_DUMP_DIR = env("PROFILING_DUMP_DIR", default=str(BASE_DIR / "profiles"))
+
+# Métricas Prometheus en /metrics. Con gunicorn, PROMETHEUS_MULTIPROC_DIR debe
+# apuntar a un directorio compartido por todos los workers (p. ej. /tmp/prometheus).
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=False)
+METRICS_TOKEN = env("METRICS_TOKEN", default=None)
+PROMETHEUS_MULTIPROC_DIR = env("PROMETHEUS_MULTIPROC_DIR", default=None)
+
+# Compresión de respuestas JSON (zstd/br si están instalados, gzip siempre)
+COMPRESSION_MIN_BYTES = env.int("COMPRESSION_MIN_BYTES", default=1024)
+COMPRESSION_ENCODINGS = env.list("COMPRESSION_ENCODINGS", default=["zstd", "br", "gzip"])
+
+# Segundos que se reutiliza una URL firmada de S3 en los listados (0 = sin caché).
+# secure_url y secure_urls informan expires_in y siempre firman de nuevo
+PRESIGNED_URL_CACHE_SECONDS = env.int("PRESIGNED_URL_CACHE_SECONDS", default=300)
+
+# Dónde están los archivos de las imágenes: "s3" o "local" (disco, para
+# desarrollo y pruebas sin red; se sirven con el proxy de imágenes)
+IMAGE_STORAGE = env("IMAGE_STORAGE", default="s3")
+IMAGE_STORAGE_LOCAL_ROOT = env("IMAGE_STORAGE_LOCAL_ROOT", default=str(BASE_DIR / "media"))
+
+# Proxy de imágenes (property/image_proxy.py): URLs propias firmadas con
+# HMAC en vez de redirigir a S3, servidas desde un caché LRU en disco
+IMAGE_PROXY_ENABLED = env.bool("IMAGE_PROXY_ENABLED", default=False)
+IMAGE_PROXY_URL_TTL = env.int("IMAGE_PROXY_URL_TTL", default=30 * 24 * 3600)
+# Prefijo de las URLs del proxy (p. ej. https://api.alca.mx o un CDN); vacío = rutas relativas
+IMAGE_PROXY_BASE_URL = env("IMAGE_PROXY_BASE_URL", default="")
+IMAGE_PROXY_CACHE_DIR = env("IMAGE_PROXY_CACHE_DIR", default=os.path.join(tempfile.gettempdir(), "alca-image-cache"))
+IMAGE_PROXY_CACHE_BYTES = env.int("IMAGE_PROXY_CACHE_BYTES", default=1024 ** 3)
+
+
+# Hasher de contraseñas preferido: "pbkdf2" (default de Django) o "argon2"
+# (requiere argon2-cffi). Los hashes existentes con el otro algoritmo o con
+# otro costo se recalculan en el siguiente login de cada usuario.
+PASSWORD_HASHER = env.str("PASSWORD_HASHER", default="pbkdf2")
+_PASSWORD_HASHERS = {
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "argon2": "api.hashers.TunableArgon2PasswordHasher",
+}
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHERS[PASSWORD_HASHER],
+    *(hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER),
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+ARGON2_TIME_COST = env.int("ARGON2_TIME_COST", default=2)
+ARGON2_MEMORY_COST = env.int("ARGON2_MEMORY_COST", default=102400)  # KiB
+ARGON2_PARALLELISM = env.int("ARGON2_PARALLELISM", default=8)
+
+# Hilos por worker que pueden calcular hashes a la vez en /api/token/ y
+# /api/user/register/ (0 = sin límite). Como mucho AUTH_MAX_WAITING peticiones
+# más esperan turno hasta AUTH_QUEUE_TIMEOUT segundos; las demás reciben 503 al
+# momento. Quien espera también ocupa un hilo: por defecto la cola deja al
+# menos un hilo de GUNICORN_THREADS libre para el resto de las peticiones
+AUTH_MAX_CONCURRENCY = env.int("AUTH_MAX_CONCURRENCY", default=2)
+AUTH_MAX_WAITING = env.int(
+    "AUTH_MAX_WAITING", default=max(0, env.int("GUNICORN_THREADS", default=4) - AUTH_MAX_CONCURRENCY - 1)
+)
+AUTH_QUEUE_TIMEOUT = env.float("AUTH_QUEUE_TIMEOUT", default=5)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -1,28 +1,170 @@
-import boto3
 from django.conf import settings
-from storages.backends.s3boto3 import S3Boto3Storage
-from botocore.exceptions import ClientError
+from django.core.files.storage import FileSystemStorage, Storage
+from django.utils.deconstruct import deconstructible
 import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics, profiling
 
 logger = logging.getLogger(__name__)
 
 
-class PrivateMediaStorage(S3Boto3Storage):
+@deconstructible(path='backend.storage_backends.LazyPrivateMediaStorage')
+class LazyPrivateMediaStorage(Storage):
     """
-    Custom S3 storage backend for private media files.
-    Files uploaded with this storage will be private and require signed URLs to access.
+    Stand-in for PrivateMediaStorage that only imports django-storages (and
+    with it boto3/botocore) the first time a file is actually read, written
+    or signed. Importing the models no longer pays for boto3.
     """
-    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
-    default_acl = 'private'
-    file_overwrite = False
-    custom_domain = False  # Don't use custom domain for private files
-    querystring_auth = True  # Enable query string authentication
-    querystring_expire = 3600  # URLs expire in 1 hour
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Ensure files are private by default
-        self.default_acl = 'private'
+
+    def __init__(self):
+        self._wrapped = None
+
+    @property
+    def wrapped(self):
+        if self._wrapped is None:
+            if getattr(settings, 'IMAGE_STORAGE', 's3') == 'local':
+                self._wrapped = LocalMediaStorage()
+            else:
+                from .s3_storage import PrivateMediaStorage
+                self._wrapped = PrivateMediaStorage()
+        return self._wrapped
+
+    def __getattr__(self, name):
+        # Atributos propios de S3Storage (bucket_name, querystring_expire, ...)
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.wrapped, name)
+
+
+class LocalMediaStorage(FileSystemStorage):
+    """
+    Image files on local disk (``IMAGE_STORAGE=local``), to run without S3.
+    There are no public URLs: images are served by the image proxy.
+    """
+
+    def __init__(self):
+        super().__init__(location=settings.IMAGE_STORAGE_LOCAL_ROOT, base_url=None)
+
+    def url(self, name):
+        from property.image_proxy import proxy_url
+        return proxy_url(name)
+
+
+def _delegate(name):
+    def method(self, *args, **kwargs):
+        return getattr(self.wrapped, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+for _name in ('open', 'save', 'get_valid_name', 'get_alternative_name', 'get_available_name',
+              'generate_filename', 'path', 'delete', 'exists', 'listdir', 'size', 'url',
+              'get_accessed_time', 'get_created_time', 'get_modified_time', 'is_name_available'):
+    setattr(LazyPrivateMediaStorage, _name, _delegate(_name))
+del _name
+
+
+def __getattr__(name):
+    # Las migraciones antiguas referencian backend.storage_backends.PrivateMediaStorage
+    if name == 'PrivateMediaStorage':
+        from .s3_storage import PrivateMediaStorage
+        return PrivateMediaStorage
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class PresignedURLCache:
+    """
+    In-process LRU of presigned URLs, so listing the same images again does not
+    sign them again. A URL is reused for at most ``max_age`` seconds and never
+    past half of its validity, so callers always get a URL valid for at least
+    half the expiration they asked for.
+    """
+
+    def __init__(self, max_age=300, max_entries=10_000):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            url, reuse_until = entry
+            if reuse_until <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return url
+
+    def set(self, key, url, expiration):
+        reuse_until = time.monotonic() + min(self.max_age, expiration / 2)
+        with self._lock:
+            self._entries[key] = (url, reuse_until)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+presigned_url_cache = PresignedURLCache(max_age=getattr(settings, 'PRESIGNED_URL_CACHE_SECONDS', 300))
+
+# Un cliente de boto3 por proceso (son thread-safe y crearlos cuesta decenas de ms)
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Process-wide boto3 S3 client, created on first use"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                import boto3
+
+                with profiling.section('storage'), metrics.s3_call('create_client'):
+                    _shared_client = boto3.client(
+                        's3',
+                        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                        region_name=settings.AWS_S3_REGION_NAME
+                    )
+    return _shared_client
+
+
+def reset_clients():
+    """
+    Drop every S3 client/connection pool inherited from a parent process.
+    Called from gunicorn's ``post_fork``: sockets and locks must not be
+    shared between workers.
+    """
+    global _shared_client, _shared_client_lock
+    _shared_client = None
+    _shared_client_lock = threading.Lock()
+    presigned_url_cache._lock = threading.Lock()
+    presigned_url_cache.clear()
+    if 'boto3' not in sys.modules:
+        return  # nada de S3 se ha usado todavía en este proceso
+
+    sys.modules['boto3'].DEFAULT_SESSION = None
+    from property.models import PropertyImage
+    storage = PropertyImage._meta.get_field('image').storage
+    if isinstance(storage, LazyPrivateMediaStorage):
+        storage._wrapped = None
+
+
+def image_proxy_enabled():
+    """Whether image URLs are signed app URLs of the image proxy instead of S3 presigned URLs"""
+    return getattr(settings, 'IMAGE_PROXY_ENABLED', False) or getattr(settings, 'IMAGE_STORAGE', 's3') == 'local'
 
 
 class S3ImageService:
@@ -31,36 +173,107 @@ class S3ImageService:
     """
     
     def __init__(self):
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_S3_REGION_NAME
-        )
         self.bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+
+    @property
+    def s3_client(self):
+        # Se pide al primer uso: una URL que ya está en caché no necesita cliente
+        return get_s3_client()
     
-    def generate_presigned_url(self, object_key, expiration=3600):
+    def generate_presigned_url(self, object_key, expiration=3600, cache=True):
         """
         Generate a presigned URL for a private S3 object
         
         Args:
             object_key (str): The S3 object key (file path)
             expiration (int): Time in seconds for the URL to remain valid (default: 1 hour)
+            cache (bool): Reuse a URL signed recently, which may expire up to
+                ``expiration / 2`` seconds sooner. Pass False when the caller
+                reports the expiration to the client.
         
         Returns:
             str: Presigned URL or None if error
         """
+        if image_proxy_enabled():
+            from property.image_proxy import proxy_url
+            return proxy_url(object_key, expiration)
+
+        cache = cache and presigned_url_cache.max_age
+        cache_key = (self.bucket_name, object_key, expiration)
+        if cache:
+            cached = presigned_url_cache.get(cache_key)
+            metrics.presigned_url_cache(hit=cached is not None)
+            if cached is not None:
+                return cached
+
+        from botocore.exceptions import ClientError
+
         try:
-            response = self.s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': self.bucket_name, 'Key': object_key},
-                ExpiresIn=expiration
-            )
+            with profiling.section('storage'), metrics.s3_call('generate_presigned_url'):
+                response = self.s3_client.generate_presigned_url(
+                    'get_object',
+                    Params={'Bucket': self.bucket_name, 'Key': object_key},
+                    ExpiresIn=expiration
+                )
+            if cache:
+                presigned_url_cache.set(cache_key, response, expiration)
             return response
         except ClientError as e:
             logger.error(f"Error generating presigned URL for {object_key}: {e}")
             return None
     
+    def generate_presigned_urls(self, object_keys, expiration=3600, cache=True):
+        """
+        Presigned URLs for many private S3 objects in one pass: cached URLs
+        are reused and the rest are signed with the shared client.
+
+        Args:
+            object_keys (iterable): S3 object keys
+            expiration (int): Time in seconds for the URLs to remain valid
+            cache (bool): Reuse recently signed URLs (see ``generate_presigned_url``)
+
+        Returns:
+            dict: Object key -> presigned URL (None for the ones that failed)
+        """
+        if image_proxy_enabled():
+            from property.image_proxy import proxy_url
+            return {object_key: proxy_url(object_key, expiration) for object_key in object_keys}
+
+        cache = cache and presigned_url_cache.max_age
+        urls = {}
+        missing = []
+        for object_key in dict.fromkeys(object_keys):
+            cached = None
+            if cache:
+                cached = presigned_url_cache.get((self.bucket_name, object_key, expiration))
+                metrics.presigned_url_cache(hit=cached is not None)
+            if cached is not None:
+                urls[object_key] = cached
+            else:
+                missing.append(object_key)
+        if not missing:
+            return urls
+
+        from botocore.exceptions import ClientError
+
+        # Firmar es sólo CPU (HMAC local, sin red): un único bucle con el mismo cliente
+        client = self.s3_client
+        with profiling.section('storage'), metrics.s3_call('generate_presigned_urls'):
+            for object_key in missing:
+                try:
+                    urls[object_key] = client.generate_presigned_url(
+                        'get_object',
+                        Params={'Bucket': self.bucket_name, 'Key': object_key},
+                        ExpiresIn=expiration
+                    )
+                except ClientError as e:
+                    logger.error(f"Error generating presigned URL for {object_key}: {e}")
+                    urls[object_key] = None
+                    continue
+                if cache:
+                    presigned_url_cache.set((self.bucket_name, object_key, expiration), urls[object_key], expiration)
+        return urls
+
     def upload_file(self, file_obj, object_key, content_type=None):
         """
         Upload a file to S3 with private ACL
@@ -73,17 +286,21 @@ class S3ImageService:
         Returns:
             bool: True if successful, False otherwise
         """
+        from botocore.exceptions import ClientError
+
         try:
+            metrics.image_uploaded(getattr(file_obj, 'size', None))
             extra_args = {'ACL': 'private'}
             if content_type:
                 extra_args['ContentType'] = content_type
             
-            self.s3_client.upload_fileobj(
-                file_obj,
-                self.bucket_name,
-                object_key,
-                ExtraArgs=extra_args
-            )
+            with profiling.section('storage'), metrics.s3_call('upload_fileobj'):
+                self.s3_client.upload_fileobj(
+                    file_obj,
+                    self.bucket_name,
+                    object_key,
+                    ExtraArgs=extra_args
+                )
             return True
         except ClientError as e:
             logger.error(f"Error uploading file {object_key}: {e}")
@@ -99,8 +316,11 @@ class S3ImageService:
         Returns:
             bool: True if successful, False otherwise
         """
+        from botocore.exceptions import ClientError
+
         try:
-            self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_key)
+            with profiling.section('storage'), metrics.s3_call('delete_object'):
+                self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_key)
             return True
         except ClientError as e:
             logger.error(f"Error deleting file {object_key}: {e}")
@@ -116,8 +336,11 @@ class S3ImageService:
         Returns:
             bool: True if file exists, False otherwise
         """
+        from botocore.exceptions import ClientError
+
         try:
-            self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+            with profiling.section('storage'), metrics.s3_call('head_object'):
+                self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
             return True
         except ClientError:
             return False
\ No newline at end of file
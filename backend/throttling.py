@@ -0,0 +1,203 @@
+"""
+Límite de peticiones por cliente con token bucket y costo por ruta.
+
+Cada cliente (usuario autenticado o, si no, su IP) tiene un bucket con la
+capacidad de su tasa en ``DEFAULT_THROTTLE_RATES`` (``'user': '3000/min'`` =
+hasta 3000 fichas de ráfaga que se recargan a 50 por segundo). Cada petición
+cuesta fichas:
+
+- antes de ejecutarse: el peso de la ruta (``THROTTLE_ROUTE_COSTS``, 1 por
+  defecto) más lo que sube (``THROTTLE_COST_PER_MB``)
+- después, en las vistas con ``CostThrottleMixin``: las filas que devolvió
+  (``THROTTLE_COST_PER_ROW``). Un ``price_range`` sin filtros que devuelve
+  miles de casas deja el bucket en negativo y las siguientes peticiones de
+  ese cliente esperan a que se recargue.
+
+Sin fichas suficientes la respuesta es 429 con ``Retry-After``.
+
+Almacenamiento (``THROTTLE_STORE``):
+
+- ``memory``: un diccionario por proceso (rápido, pero con N workers de
+  gunicorn cada uno lleva su propia cuenta)
+- ``cache``: el caché de Django; con un caché compartido (``CACHE_URL``, p. ej.
+  Redis) el límite vale para todos los workers. La lectura y escritura del
+  bucket no son atómicas: con peticiones simultáneas del mismo cliente el
+  límite es aproximado.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from backend import metrics
+
+DEFAULT_COST_PER_ROW = 0.02
+DEFAULT_COST_PER_MB = 5
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``'3000/min'`` -> (3000, 60): same format as DRF's throttle rates"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def _refill(state, capacity, refill, now):
+    """Tokens available now for a ``(tokens, updated)`` state (a full bucket if None)"""
+    if state is None:
+        return capacity
+    tokens, updated = state
+    return min(capacity, tokens + (now - updated) * refill)
+
+
+class MemoryBucketStore:
+    """Buckets of this process, least recently used dropped beyond ``max_keys``"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, cost, capacity, refill, now):
+        with self.lock:
+            tokens = _refill(self.buckets.get(key), capacity, refill, now)
+            needed = min(cost, capacity)
+            if tokens < needed:
+                return False, (needed - tokens) / refill
+            self._store(key, tokens - cost, now)
+            return True, 0.0
+
+    def charge(self, key, cost, capacity, refill, now):
+        with self.lock:
+            self._store(key, _refill(self.buckets.get(key), capacity, refill, now) - cost, now)
+
+    def _store(self, key, tokens, now):
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+
+
+class CacheBucketStore:
+    """Buckets in the Django cache, shared by every worker using the same cache"""
+
+    def take(self, key, cost, capacity, refill, now):
+        tokens = _refill(cache.get(key), capacity, refill, now)
+        needed = min(cost, capacity)
+        if tokens < needed:
+            return False, (needed - tokens) / refill
+        self._store(key, tokens - cost, capacity, refill, now)
+        return True, 0.0
+
+    def charge(self, key, cost, capacity, refill, now):
+        self._store(key, _refill(cache.get(key), capacity, refill, now) - cost, capacity, refill, now)
+
+    @staticmethod
+    def _store(key, tokens, capacity, refill, now):
+        # Un bucket que ya se habría llenado de nuevo no hace falta guardarlo
+        timeout = max(1, int((capacity - tokens) / refill) + 1)
+        cache.set(key, (tokens, now), timeout)
+
+
+@lru_cache(maxsize=None)
+def _store(kind):
+    if kind == 'cache':
+        return CacheBucketStore()
+    return MemoryBucketStore(getattr(settings, 'THROTTLE_MEMORY_KEYS', 10000))
+
+
+def bucket_store():
+    return _store(getattr(settings, 'THROTTLE_STORE', 'memory'))
+
+
+def route_name(view):
+    """``HouseForSaleViewSet.price_range`` for viewset actions, ``PropertySearchView.get`` otherwise"""
+    action = getattr(view, 'action', None) or view.request.method.lower()
+    return f"{view.__class__.__name__}.{action}"
+
+
+def rows_in(response):
+    """Rows in a response: ``row_count`` of a stream, list length, or ``results`` of a page"""
+    if getattr(response, 'row_count', None) is not None:
+        return response.row_count
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict):
+        data = data.get('results')
+    return len(data) if isinstance(data, list) else 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per user (scope ``user``) or IP (scope ``anon``), with the
+    rates of ``DEFAULT_THROTTLE_RATES`` and the route costs of
+    ``THROTTLE_ROUTE_COSTS``. A scope without rate is not limited.
+    """
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_bucket(self, request):
+        """
+        Returns:
+            tuple: (key, capacity, refill per second), or None if not limited
+        """
+        if request.user is not None and request.user.is_authenticated:
+            scope, ident = 'user', request.user.pk
+        else:
+            scope, ident = 'anon', self.get_ident(request)
+        # Se lee en cada petición: api_settings se recarga con override_settings
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if not rate:
+            return None
+        capacity, period = parse_rate(rate)
+        return f"throttle:{scope}:{ident}", capacity, capacity / period
+
+    def request_cost(self, request, view):
+        cost = getattr(settings, 'THROTTLE_ROUTE_COSTS', {}).get(route_name(view), 1)
+        try:
+            size = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            size = 0
+        return cost + size / 1e6 * getattr(settings, 'THROTTLE_COST_PER_MB', DEFAULT_COST_PER_MB)
+
+    def allow_request(self, request, view):
+        bucket = self.get_bucket(request)
+        if bucket is None:
+            return True
+        cost = self.request_cost(request, view)
+        allowed, wait = bucket_store().take(bucket[0], cost, *bucket[1:], time.time())
+        metrics.throttle_charged(route_name(view), cost, allowed)
+        if not allowed:
+            self.retry_after = wait
+            return False
+        # Para que CostThrottleMixin cobre las filas al mismo bucket
+        view.throttle_bucket = bucket
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class CostThrottleMixin:
+    """
+    Charge the rows a DRF view returned to the client's bucket, at
+    ``THROTTLE_COST_PER_ROW`` tokens per row, after the response is built.
+    """
+    throttle_bucket = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.throttle_bucket is not None and response.status_code < 400:
+            rows = rows_in(response)
+            cost = rows * getattr(settings, 'THROTTLE_COST_PER_ROW', DEFAULT_COST_PER_ROW)
+            if cost:
+                key, capacity, refill = self.throttle_bucket
+                bucket_store().charge(key, cost, capacity, refill, time.time())
+                metrics.throttle_charged(route_name(self), cost, True)
+        return response
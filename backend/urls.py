@@ -2,10 +2,11 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from django.conf import settings
-from api.views import CreateUserView, me
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from api.views import CreateUserView, TokenObtainView, me
+from backend.metrics import metrics_view
+from rest_framework_simplejwt.views import TokenRefreshView
 from owner.views import OwnerViewSet
-from property import views
+from property import views, async_views, image_proxy
 from django.conf.urls.static import static
 
 
@@ -18,11 +19,18 @@ router.register(r'owners', OwnerViewSet)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path("api/user/register/", CreateUserView.as_view(), name="register"),
     path("api/me/", me, name="me"),
-    path("api/token/", TokenObtainPairView.as_view(), name="get_token"),
+    path("api/token/", TokenObtainView.as_view(), name="get_token"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="refresh"),
     path("api-auth/", include("rest_framework.urls")),
+    path("api/properties/search/", views.PropertySearchView.as_view(), name="property-search"),
+    path("api/async/houses-for-sale/", async_views.AsyncHouseForSaleView.as_view(), name="async-houseforsale-list"),
+    path("api/async/houses-for-sale/<int:pk>/", async_views.AsyncHouseForSaleView.as_view(), name="async-houseforsale-detail"),
+    path("api/async/houses-for-rent/", async_views.AsyncHouseForRentView.as_view(), name="async-houseforrent-list"),
+    path("api/async/houses-for-rent/<int:pk>/", async_views.AsyncHouseForRentView.as_view(), name="async-houseforrent-detail"),
+    path("api/images/<str:token>/", image_proxy.serve_image, name="image-proxy"),
     path('api/', include(router.urls)),
 ]
 
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Compara el despliegue síncrono (gunicorn + WSGI) contra el async (gunicorn
+con workers de uvicorn + vistas ``/api/async/...``) bajo la misma carga mixta
+de listados y detalles de casas.
+
+Arranca cada servidor con el mismo número de workers sobre la misma base de
+datos (la de ``DATABASE_URL``), corre ``benchmarks.load_test`` contra él y
+muestra req/s y latencias p50/p95/p99 lado a lado.
+
+La clase de worker se fija con ``GUNICORN_WORKER_CLASS`` (ver
+``gunicorn.conf.py``): el lado síncrono usa workers ``sync`` (un request por
+proceso) salvo que se pida ``--sync-worker-class gthread``, el default de
+producción. El reporte indica cuál se midió.
+
+Uso:
+    python -m benchmarks.bench_async --username admin --password secret \\
+        --workers 2 --concurrency 32 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks import load_test
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# variante -> (GUNICORN_WORKER_CLASS, app, prefijo de las rutas)
+SERVERS = {
+    'sync': ('sync', 'backend.wsgi:application', '/api/'),
+    'async': ('uvicorn', 'backend.asgi:application', '/api/async/'),
+}
+
+# Mezcla de lectura: listados paginados, filtrados y detalles
+MIX = [
+    {'name': 'sale list', 'weight': 35, 'path': '{prefix}houses-for-sale/?page={{page}}'},
+    {'name': 'sale filtered', 'weight': 15,
+     'path': '{prefix}houses-for-sale/?city={{city}}&min_price={{min_price}}&ordering=selling_cost'},
+    {'name': 'rent list', 'weight': 25, 'path': '{prefix}houses-for-rent/?page={{page}}'},
+    {'name': 'sale detail', 'weight': 15, 'path': '{prefix}houses-for-sale/{{id}}/'},
+    {'name': 'rent detail', 'weight': 10, 'path': '{prefix}houses-for-rent/{{id}}/'},
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"Server did not start listening on port {port}")
+
+
+def start_server(app, worker_class, workers, port):
+    command = [
+        sys.executable, '-m', 'gunicorn', app,
+        '--workers', str(workers), '--bind', f"127.0.0.1:{port}", '--log-level', 'warning',
+    ]
+    # Un solo usuario genera toda la carga: sin límite por cliente.
+    # gunicorn.conf.py elige la clase de worker (y los hilos) con esta variable
+    env = {**os.environ, 'THROTTLE_ENABLED': 'false', 'GUNICORN_WORKER_CLASS': worker_class}
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+    wait_for_port(port, process)
+    return process
+
+
+def write_mix(prefix, directory):
+    path = Path(directory) / f"mix{prefix.replace('/', '-')}.json"
+    entries = [
+        {'name': entry['name'], 'weight': entry['weight'], 'method': 'GET',
+         'path': entry['path'].format(prefix=prefix)}
+        for entry in MIX
+    ]
+    path.write_text(json.dumps(entries), encoding='utf-8')
+    return str(path)
+
+
+def worker_class(kind, options):
+    return options.sync_worker_class if kind == 'sync' else SERVERS[kind][0]
+
+
+def run_against(kind, options, directory):
+    port = free_port()
+    _, app, _ = SERVERS[kind]
+    process = start_server(app, worker_class(kind, options), options.workers, port)
+    try:
+        argv = [
+            '--base-url', f"http://127.0.0.1:{port}",
+            '--concurrency', str(options.concurrency),
+            '--duration', str(options.duration),
+            '--warmup', str(options.warmup),
+            '--mix', write_mix(SERVERS[kind][2], directory),
+            '--seed', str(options.seed),
+        ]
+        if options.token:
+            argv += ['--token', options.token]
+        else:
+            argv += ['--username', options.username, '--password', options.password]
+        report = asyncio.run(load_test.run(load_test.parse_args(argv)))
+        report['config']['worker_class'] = worker_class(kind, options)
+        return report
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def comparison(reports):
+    header = f"{'endpoint':<16}" + ''.join(
+        f" {kind + ' ' + column:>13}" for column in ('rps', 'p50', 'p95', 'p99') for kind in reports
+    )
+    lines = [header, '-' * len(header)]
+    names = [entry['name'] for entry in MIX] + ['TOTAL']
+    for name in names:
+        row = f"{name:<16}"
+        for column in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            for report in reports.values():
+                stats = report['total'] if name == 'TOTAL' else report['endpoints'].get(name, {})
+                row += f" {stats.get(column, '-'):>13}"
+        lines.append(row)
+    errors = ', '.join(f"{kind}: {report['total']['errors']}" for kind, report in reports.items())
+    lines.append(f"errores -> {errors}")
+    classes = ', '.join(f"{kind}: {report['config']['worker_class']}" for kind, report in reports.items())
+    lines.append(f"workers -> {classes}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync (WSGI) vs async (uvicorn) throughput and tail latency")
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--token')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sync-worker-class', choices=['sync', 'gthread'], default='sync',
+                        help="gunicorn worker class of the WSGI side (GUNICORN_WORKER_CLASS)")
+    parser.add_argument('--only', choices=sorted(SERVERS), action='append', help="Run only this variant")
+    parser.add_argument('--json', help="Write both reports here")
+    options = parser.parse_args(argv)
+    if not options.token and not (options.username and options.password):
+        parser.error("use --token or --username/--password")
+
+    reports = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in options.only or list(SERVERS):
+            print(f"== {kind} ({options.workers} workers {worker_class(kind, options)}, "
+                  f"concurrency {options.concurrency})", flush=True)
+            reports[kind] = run_against(kind, options, directory)
+
+    print(comparison(reports))
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Latencia del autocompletado de propietarios (``owner.search``) con cada
+implementación disponible en la base de ``DATABASE_URL``:
+
+- ``trigram``: sólo en PostgreSQL con el índice ``owner_search_trgm_idx``
+- ``prefix``: índice en memoria; se informa aparte lo que tarda en construirse
+
+Las consultas son prefijos de nombres, apellidos y teléfonos reales de la
+base (1 a 6 letras, una o dos palabras), elegidos con ``--seed``. Para 1M de
+propietarios:
+
+    python manage.py generate_fixtures --owners 1000000 --houses-for-sale 0 --houses-for-rent 0
+
+Uso:
+    python -m benchmarks.bench_autocomplete --queries 500 --limit 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+
+def setup_django():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+
+
+def sample_queries(count, seed):
+    from owner.models import Owner
+
+    rng = random.Random(seed)
+    total = Owner.objects.count()
+    queries = []
+    for _ in range(count):
+        key = Owner.objects.order_by('pk').values_list('search_key', flat=True)[rng.randrange(total)]
+        words = key.split()
+        picked = rng.sample(words, k=min(len(words), rng.choice([1, 1, 2])))
+        queries.append(' '.join(word[:rng.randint(1, 6)] for word in picked))
+    return queries
+
+
+def run(backend, queries, limit):
+    from django.test import override_settings
+
+    from owner import search
+
+    timings = []
+    # Reconstrucción dentro de la llamada, para medirla
+    with override_settings(OWNER_SEARCH_BACKEND=backend, OWNER_SEARCH_INDEX_BACKGROUND=False):
+        build_ms = None
+        if backend == 'prefix':
+            search.invalidate()
+            start = time.perf_counter()
+            search.prefix_index()
+            build_ms = round((time.perf_counter() - start) * 1000)
+        search.autocomplete(queries[0], limit)  # calentamiento
+        for query in queries:
+            start = time.perf_counter()
+            search.autocomplete(query, limit)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'backend': backend,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+        'max_ms': round(timings[-1], 2),
+        'build_ms': build_ms if build_ms is not None else '-',
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Owner autocomplete latency per search backend")
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    from django.db import DEFAULT_DB_ALIAS
+    from owner.models import Owner
+    from owner.search import has_trigram_index
+
+    backends = ['prefix']
+    if has_trigram_index(DEFAULT_DB_ALIAS):
+        backends.insert(0, 'trigram')
+    else:
+        print("Sin owner_search_trgm_idx (no es PostgreSQL o falta pg_trgm): sólo prefix")
+    queries = sample_queries(options.queries, options.seed)
+
+    print(f"{Owner.objects.count()} propietarios, {len(queries)} consultas, limit={options.limit}")
+    columns = ['backend', 'p50_ms', 'p95_ms', 'max_ms', 'build_ms']
+    print(''.join(f"{column:>12}" for column in columns))
+    for backend in backends:
+        result = run(backend, queries, options.limit)
+        print(''.join(f"{result[column]!s:>12}" for column in columns))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
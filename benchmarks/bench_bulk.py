@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+Escribir N casas con una petición por casa frente a ``POST .../bulk/``
+(``property.bulk``):
+
+- ``por-casa``: N ``POST`` para crearlas, N ``PATCH`` para cambiar precio y
+  ``estatus`` y N ``DELETE`` para borrarlas (lo que hacen hoy las
+  herramientas internas)
+- ``bulk``: lo mismo con tres peticiones a ``bulk/`` (una por operación)
+
+Corre dentro del proceso (``APIClient`` autenticado) contra la base de
+``DATABASE_URL``, que necesita al menos un propietario. Cada variante deja
+la base como estaba: borra lo que crea. Se informa el tiempo total y por
+casa de cada operación y las consultas SQL.
+
+Uso:
+    python -m benchmarks.bench_bulk --items 200
+    python -m benchmarks.bench_bulk --model rent --items 500
+"""
+import argparse
+import os
+import sys
+import time
+
+
+def setup_django():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+
+
+def timed(function):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as captured:
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+    return result, elapsed, len(captured)
+
+
+def house_data(model_name, owner_id, index):
+    price_field = 'selling_cost' if model_name == 'sale' else 'rent_cost'
+    return {'title': f"Casa bulk {index}", 'owner': owner_id, price_field: 1_000_000 + index,
+            'city': 'MONCLOVA', 'latitude': 26.9, 'longitude': -101.42}
+
+
+def check(response, expected):
+    if response.status_code != expected:
+        raise SystemExit(f"HTTP {response.status_code}: {response.content[:300]!r}")
+    return response
+
+
+def per_item(client, url, model_name, owner_id, items):
+    def create():
+        return [check(client.post(url, house_data(model_name, owner_id, i), format='json'), 201).data['id']
+                for i in range(items)]
+
+    ids, create_s, create_q = timed(create)
+
+    def update():
+        for pk in ids:
+            check(client.patch(f"{url}{pk}/", {'estatus': 'VENDIDA', 'title': f"Casa bulk {pk}"}, format='json'), 200)
+
+    _, update_s, update_q = timed(update)
+
+    def delete():
+        for pk in ids:
+            check(client.delete(f"{url}{pk}/"), 204)
+
+    _, delete_s, delete_q = timed(delete)
+    return {'create': (create_s, create_q), 'update': (update_s, update_q), 'delete': (delete_s, delete_q)}
+
+
+def bulk(client, url, model_name, owner_id, items):
+    bulk_url = f"{url}bulk/"
+
+    def create():
+        body = {'create': [house_data(model_name, owner_id, i) for i in range(items)]}
+        return [result['id'] for result in check(client.post(bulk_url, body, format='json'), 200).data['results']]
+
+    ids, create_s, create_q = timed(create)
+
+    def update():
+        body = {'update': [{'id': pk, 'estatus': 'VENDIDA', 'title': f"Casa bulk {pk}"} for pk in ids]}
+        check(client.post(bulk_url, body, format='json'), 200)
+
+    _, update_s, update_q = timed(update)
+
+    def delete():
+        check(client.post(bulk_url, {'delete': ids}, format='json'), 200)
+
+    _, delete_s, delete_q = timed(delete)
+    return {'create': (create_s, create_q), 'update': (update_s, update_q), 'delete': (delete_s, delete_q)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-item requests vs the bulk endpoint for N houses")
+    parser.add_argument('--model', choices=['sale', 'rent'], default='sale')
+    parser.add_argument('--items', type=int, default=200)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    from django.test import override_settings
+
+    from api.benchmark import authenticated_client
+    from owner.models import Owner
+
+    owner_id = Owner.objects.order_by('pk').values_list('pk', flat=True).first()
+    if owner_id is None:
+        raise SystemExit("No hay propietarios: correr manage.py generate_fixtures")
+    client = authenticated_client()
+    url = f"/api/houses-for-{options.model}/"
+
+    # Un solo cliente hace todas las escrituras: sin límite de peticiones
+    with override_settings(BULK_MAX_ITEMS=max(options.items, 500)):
+        from rest_framework.settings import api_settings
+        throttles = api_settings.DEFAULT_THROTTLE_CLASSES
+        api_settings.DEFAULT_THROTTLE_CLASSES = []
+        try:
+            reports = {
+                'por-casa': per_item(client, url, options.model, owner_id, options.items),
+                'bulk': bulk(client, url, options.model, owner_id, options.items),
+            }
+        finally:
+            api_settings.DEFAULT_THROTTLE_CLASSES = throttles
+
+    print(f"{options.items} casas ({options.model})")
+    header = f"{'variante':<10}{'operación':>10}{'total ms':>11}{'ms/casa':>10}{'consultas':>11}"
+    print(header)
+    print('-' * len(header))
+    for name, report in reports.items():
+        for operation, (seconds, queries) in report.items():
+            print(f"{name:<10}{operation:>10}{seconds * 1000:>11.1f}{seconds * 1000 / options.items:>10.2f}{queries:>11}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Proxy de imágenes (``property.image_proxy``) sin S3: ``IMAGE_STORAGE=local``
+con archivos de prueba en un directorio temporal y el caché en otro.
+
+Mide dentro del proceso (cliente de pruebas de Django, sin red):
+
+- ``fallo``: primera petición de cada imagen (copia del storage al caché)
+- ``acierto``: la imagen entera desde el caché en disco
+- ``rango``: ``Range: bytes=0-65535`` (lo primero que piden los navegadores
+  para imágenes grandes)
+- ``304``: ``If-None-Match`` con el ETag (navegador con la imagen guardada)
+
+Y ``--threads`` peticiones simultáneas a una imagen que no está en caché,
+para comprobar que el storage se lee una sola vez.
+
+Uso:
+    python -m benchmarks.bench_image_proxy --images 50 --size-kb 300
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def setup_django(storage_root, cache_dir):
+    os.environ['IMAGE_STORAGE'] = 'local'
+    os.environ['IMAGE_STORAGE_LOCAL_ROOT'] = storage_root
+    os.environ['IMAGE_PROXY_CACHE_DIR'] = cache_dir
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+
+    django.setup()
+
+
+def timed(function):
+    start = time.perf_counter()
+    response = function()
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    return (time.perf_counter() - start) * 1000, response.status_code, len(body)
+
+
+def summary(name, samples):
+    latencies = sorted(ms for ms, _, _ in samples)
+    statuses = sorted({status for _, status, _ in samples})
+    size = samples[0][2]
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name:<10}{'/'.join(map(str, statuses)):>8}{size:>10}{statistics.median(latencies):>10.2f}{p95:>10.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Image proxy latency with local storage and the disk cache")
+    parser.add_argument('--images', type=int, default=50)
+    parser.add_argument('--size-kb', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=16)
+    options = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as storage_root, tempfile.TemporaryDirectory() as cache_dir:
+        setup_django(storage_root, cache_dir)
+        from django.core.files.base import ContentFile
+        from django.test import Client
+
+        from property import image_proxy
+
+        storage = image_proxy.image_storage()
+        payload = os.urandom(options.size_kb * 1024)
+        names = [storage.save(f"bench/{i}.jpg", ContentFile(payload)) for i in range(options.images)]
+        urls = [image_proxy.proxy_url(name) for name in names]
+        client = Client()
+
+        samples = {'fallo': [timed(lambda: client.get(url)) for url in urls]}
+        samples['acierto'] = [timed(lambda: client.get(url)) for url in urls]
+        samples['rango'] = [timed(lambda: client.get(url, HTTP_RANGE='bytes=0-65535')) for url in urls]
+        etags = {url: client.get(url)['ETag'] for url in urls}
+        samples['304'] = [timed(lambda: client.get(url, HTTP_IF_NONE_MATCH=etags[url])) for url in urls]
+
+        print(f"{options.images} imágenes de {options.size_kb} KB")
+        header = f"{'petición':<10}{'HTTP':>8}{'bytes':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        print(header)
+        print('-' * len(header))
+        for name, values in samples.items():
+            summary(name, values)
+
+        # Peticiones simultáneas a una imagen fría: una sola lectura del storage
+        name = storage.save("bench/fria.jpg", ContentFile(payload))
+        url = image_proxy.proxy_url(name)
+        reads = []
+        original_open = storage.open
+
+        def counting_open(*args, **kwargs):
+            reads.append(args[0])
+            time.sleep(0.05)  # storage remoto: la copia tarda
+            return original_open(*args, **kwargs)
+
+        storage.open = counting_open
+        try:
+            with ThreadPoolExecutor(options.threads) as pool:
+                statuses = list(pool.map(lambda _: Client().get(url).status_code, range(options.threads)))
+        finally:
+            storage.open = original_open
+        print(f"{options.threads} peticiones simultáneas en frío: HTTP {sorted(set(statuses))}, "
+              f"{len(reads)} lectura(s) del storage")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
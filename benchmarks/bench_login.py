@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+Logins por segundo por worker y su efecto sobre el resto del tráfico, según el
+hasher de contraseñas y el límite de ``api.concurrency``:
+
+- ``pbkdf2-sin-límite``: PBKDF2 de Django, cualquier hilo calcula hashes
+  (AUTH_MAX_CONCURRENCY=0, el comportamiento anterior)
+- ``pbkdf2``: PBKDF2 con AUTH_MAX_CONCURRENCY=2 por worker
+- ``argon2``: Argon2id con el costo por defecto de Django (t=2, m=100 MiB, p=8)
+- ``argon2-ligero``: Argon2id con el mínimo recomendado por OWASP
+  (t=2, m=19 MiB, p=1)
+
+Arranca gunicorn (``gunicorn.conf.py``, gthread) con cada variante contra la
+misma base de datos y corre ``benchmarks.load_test`` con una mezcla de
+``POST /api/token/`` y listados de propietarios. El primer login de cada
+variante recalcula el hash del usuario al algoritmo/costo de esa variante (ver
+``api.hashers``); ocurre durante el calentamiento.
+
+Uso:
+    python -m benchmarks.bench_login --username load --password secret \\
+        --workers 2 --concurrency 16 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import load_test
+from benchmarks.bench_async import BASE_DIR, free_port, wait_for_port
+
+VARIANTS = {
+    'pbkdf2-sin-límite': {'PASSWORD_HASHER': 'pbkdf2', 'AUTH_MAX_CONCURRENCY': '0'},
+    'pbkdf2': {'PASSWORD_HASHER': 'pbkdf2', 'AUTH_MAX_CONCURRENCY': '2'},
+    'argon2': {'PASSWORD_HASHER': 'argon2', 'AUTH_MAX_CONCURRENCY': '2'},
+    'argon2-ligero': {
+        'PASSWORD_HASHER': 'argon2', 'AUTH_MAX_CONCURRENCY': '2',
+        'ARGON2_TIME_COST': '2', 'ARGON2_MEMORY_COST': '19456', 'ARGON2_PARALLELISM': '1',
+    },
+}
+
+AUTH_VARIABLES = (
+    'PASSWORD_HASHER', 'AUTH_MAX_CONCURRENCY', 'AUTH_QUEUE_TIMEOUT',
+    'ARGON2_TIME_COST', 'ARGON2_MEMORY_COST', 'ARGON2_PARALLELISM',
+)
+
+
+def mix(username, password, login_weight):
+    return [
+        {'name': 'login', 'weight': login_weight, 'method': 'POST', 'path': '/api/token/',
+         'body': {'username': username, 'password': password}},
+        {'name': 'owners list', 'weight': 100 - login_weight, 'method': 'GET', 'path': '/api/owners/'},
+    ]
+
+
+def run_variant(name, options, mix_path):
+    env = {key: value for key, value in os.environ.items() if key not in AUTH_VARIABLES}
+    env.update(
+        VARIANTS[name],
+        WEB_CONCURRENCY=str(options.workers),
+        GUNICORN_WORKER_CLASS='gthread',
+        GUNICORN_MAX_REQUESTS='0',
+        # Un solo usuario genera toda la carga: sin límite por cliente
+        THROTTLE_ENABLED='false',
+    )
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f"127.0.0.1:{port}", '--log-level', 'warning'],
+        cwd=BASE_DIR, env=env,
+    )
+    try:
+        wait_for_port(port, process)
+        argv = [
+            '--base-url', f"http://127.0.0.1:{port}",
+            '--concurrency', str(options.concurrency),
+            '--duration', str(options.duration),
+            '--warmup', str(options.warmup),
+            '--mix', mix_path,
+            '--seed', str(options.seed),
+            '--username', options.username, '--password', options.password,
+        ]
+        return asyncio.run(load_test.run(load_test.parse_args(argv)))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def comparison(reports, workers):
+    header = (f"{'variante':<18}{'logins/s':>10}{'por worker':>12}{'login p50':>11}{'login p95':>11}"
+              f"{'503':>7}{'owners rps':>12}{'owners p95':>12}")
+    lines = [header, '-' * len(header)]
+    for name, report in reports.items():
+        login = report['endpoints'].get('login', {})
+        owners = report['endpoints'].get('owners list', {})
+        ok = login.get('statuses', {}).get('200', 0)
+        rate = ok / report['duration_s'] if report['duration_s'] else 0
+        lines.append(
+            f"{name:<18}{rate:>10.1f}{rate / workers:>12.1f}{login.get('p50_ms', '-'):>11}"
+            f"{login.get('p95_ms', '-'):>11}{login.get('statuses', {}).get('503', 0):>7}"
+            f"{owners.get('rps', '-'):>12}{owners.get('p95_ms', '-'):>12}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Logins/sec per worker by password hasher and auth concurrency limit")
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--login-weight', type=int, default=20, help="Percentage of requests that are logins")
+    parser.add_argument('--variant', choices=list(VARIANTS), action='append',
+                        help="Configurations to compare (default: all)")
+    options = parser.parse_args(argv)
+
+    reports = {}
+    with tempfile.TemporaryDirectory() as directory:
+        mix_path = os.path.join(directory, 'mix.json')
+        with open(mix_path, 'w', encoding='utf-8') as f:
+            json.dump(mix(options.username, options.password, options.login_weight), f)
+        for name in options.variant or list(VARIANTS):
+            print(f"== {name} ({options.workers} workers, concurrency {options.concurrency})", flush=True)
+            reports[name] = run_variant(name, options, mix_path)
+
+    print(comparison(reports, options.workers))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Tamaño y tiempo de codificación de una página del listado de casas, en JSON
+normal y en ``?format=compact``, sin comprimir y con cada codificación de
+``backend.compression`` (gzip, br, zstd; las que estén instaladas).
+
+Los datos salen de una petición real al listado (``APIClient`` autenticado,
+página de ``PAGE_SIZE`` = 100 casas); después se mide por separado
+``render_ms`` (sólo el renderer) y ``compress_ms`` (sólo la compresión de los
+bytes ya renderizados).
+
+Corre dentro del proceso contra la base de ``DATABASE_URL`` (necesita casas
+con imágenes, p. ej. de ``manage.py generate_fixtures``). El almacenamiento y
+la firma de URLs de S3 se sustituyen por versiones en memoria.
+
+Uso:
+    python -m benchmarks.bench_payload --repeat 20
+    python -m benchmarks.bench_payload --model rent
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+
+def setup_django():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+
+
+def timed(function, repeat):
+    function()  # calentamiento
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return result, round(statistics.median(timings) * 1000, 2)
+
+
+def measure(model_name, repeat):
+    from api.benchmark import authenticated_client
+    from backend.compression import LEVELS, compressor
+    from backend.renderers import CompactJSONRenderer, FastJSONRenderer
+
+    client = authenticated_client()
+    url = f"/api/houses-for-{model_name}/"
+    response = client.get(url)
+    if response.status_code != 200:
+        raise SystemExit(f"{url}: HTTP {response.status_code}")
+    data = response.data
+    rows = len(data['results'])
+
+    results = []
+    for name, renderer in (('json', FastJSONRenderer()), ('compact', CompactJSONRenderer())):
+        context = {'response': response}
+        body, render_ms = timed(lambda: renderer.render(data, renderer.media_type, context), repeat)
+        results.append({'format': name, 'encoding': 'identity', 'bytes': len(body),
+                        'render_ms': render_ms, 'compress_ms': 0.0})
+        for encoding in LEVELS:
+            compress = compressor(encoding)
+            if compress is None:
+                continue
+            compressed, compress_ms = timed(lambda: compress(body), repeat)
+            results.append({'format': name, 'encoding': encoding, 'bytes': len(compressed),
+                            'render_ms': render_ms, 'compress_ms': compress_ms})
+    return rows, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Payload size and encode time of a house list page")
+    parser.add_argument('--model', choices=['sale', 'rent'], default='sale')
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    from api.benchmark import fake_image_storage
+
+    with fake_image_storage():
+        rows, results = measure(options.model, options.repeat)
+
+    baseline = results[0]['bytes']
+    columns = ['format', 'encoding', 'bytes', 'render_ms', 'compress_ms']
+    print(f"{rows} casas por página")
+    print(''.join(f"{column:>12}" for column in columns) + f"{'% de json':>12}")
+    for result in results:
+        print(''.join(f"{result[column]!s:>12}" for column in columns)
+              + f"{100 * result['bytes'] / baseline:>11.1f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
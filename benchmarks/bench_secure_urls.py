@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+URLs firmadas de una galería: una petición por imagen
+(``GET /api/property-images/{id}/secure_url/``) frente a una sola
+``GET /api/property-images/secure_urls/?ids=...``.
+
+Corre dentro del proceso (``APIClient`` autenticado) contra la base de
+``DATABASE_URL`` y firma de verdad con boto3 (sin red: firmar es local). Se
+informan p50/p95 por galería y las consultas SQL.
+
+Uso:
+    python -m benchmarks.bench_secure_urls --images 30 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+
+def setup_django():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+
+
+def measure(client, urls, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    latencies = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            for url in urls:
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise SystemExit(f"{url}: HTTP {response.status_code}")
+            latencies.append((time.perf_counter() - start) * 1000)
+        queries = len(captured)
+    latencies.sort()
+    return {
+        'requests': len(urls),
+        'queries': queries,
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': latencies[max(0, int(len(latencies) * 0.95) - 1)],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-image secure_url vs batch secure_urls")
+    parser.add_argument('--images', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    from rest_framework.settings import api_settings
+
+    from api.benchmark import authenticated_client, fake_image_storage
+    from property.models import PropertyImage
+
+    ids = list(PropertyImage.objects.order_by('pk').values_list('pk', flat=True)[:options.images])
+    if len(ids) < options.images:
+        raise SystemExit(f"Sólo hay {len(ids)} imágenes: correr manage.py generate_fixtures")
+    client = authenticated_client()
+    variants = {
+        'por-imagen': [f"/api/property-images/{pk}/secure_url/" for pk in ids],
+        'batch': [f"/api/property-images/secure_urls/?ids={','.join(map(str, ids))}"],
+    }
+
+    # Un solo cliente hace todas las peticiones: sin límite de peticiones
+    throttles = api_settings.DEFAULT_THROTTLE_CLASSES
+    api_settings.DEFAULT_THROTTLE_CLASSES = []
+    try:
+        with fake_image_storage(real_signing=True):
+            for urls in variants.values():
+                client.get(urls[0])  # calentamiento: cliente de boto3, resolver de URLs
+            reports = {name: measure(client, urls, options.repeat) for name, urls in variants.items()}
+    finally:
+        api_settings.DEFAULT_THROTTLE_CLASSES = throttles
+
+    print(f"galería de {options.images} imágenes, {options.repeat} repeticiones")
+    header = f"{'variante':<12}{'peticiones':>11}{'consultas':>11}{'p50 ms':>10}{'p95 ms':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, report in reports.items():
+        print(f"{name:<12}{report['requests']:>11}{report['queries']:>11}"
+              f"{report['p50_ms']:>10.1f}{report['p95_ms']:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Filas por segundo al serializar una página del listado de casas:
+
+- ``serializer``: lo que hacía el listado antes, instancias del modelo +
+  ``HouseForSaleSerializer(many=True)`` (una consulta de imágenes por casa) +
+  ``JSONRenderer``
+- ``plan``: ``values_list()`` + ``FieldPlan`` (una consulta de imágenes por
+  página) + ``JSONRenderer``
+- ``plan+orjson``: lo mismo codificado con ``FastJSONRenderer``
+
+Corre dentro del proceso contra la base de ``DATABASE_URL`` (necesita casas
+con imágenes, p. ej. de ``manage.py generate_fixtures``). Por defecto el
+almacenamiento y la firma de URLs de S3 se sustituyen por versiones en memoria
+para medir sólo la serialización; ``--real-signing`` firma con boto3 (sin red).
+Comprueba además que los tres caminos producen los mismos bytes (con firma
+real la fecha de la firma puede variar entre variantes).
+
+Uso:
+    python -m benchmarks.bench_serialization --rows 100 --repeat 30
+    python -m benchmarks.bench_serialization --model rent --real-signing
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+
+def setup_django():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+
+
+def variants(model_name, rows):
+    from django.db import connection
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from backend.renderers import FastJSONRenderer
+    from property.fast_serializers import FieldPlan
+    from property.models import HouseForRent, HouseForSale
+    from property.serializers import HouseForRentSerializer, HouseForSaleSerializer
+
+    model, serializer_class = {
+        'sale': (HouseForSale, HouseForSaleSerializer),
+        'rent': (HouseForRent, HouseForRentSerializer),
+    }[model_name]
+    request = Request(APIRequestFactory().get(f"/api/houses-for-{model_name}/"))
+    queryset = model.objects.order_by('-created_at')
+    plan = FieldPlan(serializer_class)
+
+    def serializer(renderer):
+        def run():
+            houses = list(queryset[:rows])
+            data = serializer_class(houses, many=True, context={'request': request}).data
+            return renderer.render(data), len(houses)
+        return run
+
+    def fast(renderer):
+        def run():
+            page = list(plan.rows(queryset)[:rows])
+            return renderer.render(plan.serialize(page, request=request)), len(page)
+        return run
+
+    connection.ensure_connection()
+    return {
+        'serializer': serializer(JSONRenderer()),
+        'plan': fast(JSONRenderer()),
+        'plan+orjson': fast(FastJSONRenderer()),
+    }
+
+
+def measure(run, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    run()  # calentamiento: ContentType, plan, caché de URLs
+    timings = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body, count = run()
+            timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    return {
+        'rows': count,
+        'ms_per_page': round(median * 1000, 2),
+        'rows_per_s': round(count / median) if median else 0,
+        'queries_per_page': len(queries) // repeat,
+        'bytes': len(body),
+    }, body
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rows/sec of the house list: DRF serializer vs field plan + orjson")
+    parser.add_argument('--model', choices=['sale', 'rent'], default='sale')
+    parser.add_argument('--rows', type=int, default=100, help="Rows per page")
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--real-signing', action='store_true', help="Sign image URLs with boto3 (offline)")
+    options = parser.parse_args(argv)
+
+    setup_django()
+    from api.benchmark import fake_image_storage
+
+    results, bodies = {}, {}
+    with fake_image_storage(real_signing=options.real_signing):
+        for name, run in variants(options.model, options.rows).items():
+            results[name], bodies[name] = measure(run, options.repeat)
+
+    columns = ['rows', 'ms_per_page', 'rows_per_s', 'queries_per_page', 'bytes']
+    print(f"{'variante':<14}" + ''.join(f"{column:>18}" for column in columns))
+    for name, result in results.items():
+        print(f"{name:<14}" + ''.join(f"{result[column]!s:>18}" for column in columns))
+    baseline = results['serializer']['rows_per_s']
+    for name in ('plan', 'plan+orjson'):
+        if baseline:
+            print(f"{name}: x{results[name]['rows_per_s'] / baseline:.1f} filas/s frente a serializer")
+
+    identical = len(set(bodies.values())) == 1
+    print(f"mismos bytes en las tres variantes: {'sí' if identical else 'NO'}")
+    return 0 if identical or options.real_signing else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
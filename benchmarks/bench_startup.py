@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Tiempo de arranque y memoria por worker de gunicorn según la configuración
+(clase de worker y ``preload_app``), usando ``gunicorn.conf.py``.
+
+Para cada variante arranca gunicorn, mide el tiempo hasta la primera respuesta
+HTTP, hace algunas peticiones de calentamiento y lee la memoria de cada worker
+en ``/proc/<pid>/smaps_rollup`` (sólo Linux):
+
+- RSS: memoria residente (cuenta varias veces las páginas compartidas)
+- PSS: reparte las páginas compartidas entre los procesos que las usan; la
+  suma de PSS es lo que de verdad ocupa el servidor
+- USS: memoria privada del worker (lo que se libera si termina)
+
+Uso:
+    python -m benchmarks.bench_startup --workers 4
+    python -m benchmarks.bench_startup --variant gthread-preload --variant gthread --token <jwt>
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from benchmarks.bench_async import free_port
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+VARIANTS = {
+    'sync': {'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_PRELOAD': 'false'},
+    'sync-preload': {'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_PRELOAD': 'true'},
+    'gthread': {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_PRELOAD': 'false'},
+    'gthread-preload': {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_PRELOAD': 'true'},
+    'uvicorn': {'GUNICORN_WORKER_CLASS': 'uvicorn', 'GUNICORN_PRELOAD': 'false'},
+    'uvicorn-preload': {'GUNICORN_WORKER_CLASS': 'uvicorn', 'GUNICORN_PRELOAD': 'true'},
+}
+
+
+def memory_kb(pid):
+    """
+    Returns:
+        dict: rss, pss and uss in kB for a process
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding='ascii') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                values[key] = int(rest.split()[0])
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'uss': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children", encoding='ascii') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def request(url, token=None):
+    headers = {'Authorization': f"Bearer {token}"} if token else {}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def measure(name, options):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(options.workers), **VARIANTS[name])
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f"127.0.0.1:{port}", '--log-level', 'warning'],
+        cwd=BASE_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        first_response = None
+        while first_response is None:
+            if process.poll() is not None:
+                raise SystemExit(f"{name}: gunicorn exited with code {process.returncode}")
+            if time.perf_counter() - started > 60:
+                raise SystemExit(f"{name}: no response after 60s")
+            try:
+                request(f"{base_url}{options.path}", options.token)
+                first_response = time.perf_counter() - started
+            except OSError:
+                time.sleep(0.05)
+
+        # Esperar a que todos los workers hayan arrancado y calentarlos
+        deadline = time.perf_counter() + 60
+        while len(children(process.pid)) < options.workers and time.perf_counter() < deadline:
+            time.sleep(0.1)
+        statuses = {request(f"{base_url}{options.path}", options.token) for _ in range(options.warmup_requests)}
+        all_ready = time.perf_counter() - started
+
+        workers = [memory_kb(pid) for pid in children(process.pid)]
+        master = memory_kb(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    average = {key: sum(w[key] for w in workers) / len(workers) / 1024 for key in ('rss', 'pss', 'uss')}
+    return {
+        'variant': name,
+        'first_response_s': round(first_response, 2),
+        'all_ready_s': round(all_ready, 2),
+        'statuses': sorted(statuses),
+        'workers': len(workers),
+        'worker_rss_mb': round(average['rss'], 1),
+        'worker_pss_mb': round(average['pss'], 1),
+        'worker_uss_mb': round(average['uss'], 1),
+        'total_pss_mb': round((sum(w['pss'] for w in workers) + master['pss']) / 1024, 1),
+    }
+
+
+def render(results):
+    columns = ['variant', 'first_response_s', 'all_ready_s', 'workers',
+               'worker_rss_mb', 'worker_pss_mb', 'worker_uss_mb', 'total_pss_mb']
+    lines = [' '.join(f"{column:>16}" for column in columns)]
+    for result in results:
+        lines.append(' '.join(f"{result[column]!s:>16}" for column in columns))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gunicorn time-to-first-request and memory per worker")
+    parser.add_argument('--variant', choices=sorted(VARIANTS), action='append',
+                        help="Configurations to compare (default: all)")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--path', default='/api/houses-for-sale/', help="Path requested to detect readiness and warm up")
+    parser.add_argument('--token', help="JWT so warm-up requests reach the views (otherwise they get 401)")
+    parser.add_argument('--warmup-requests', type=int, default=20)
+    options = parser.parse_args(argv)
+    if not Path('/proc/self/smaps_rollup').exists():
+        parser.error("memory is read from /proc/<pid>/smaps_rollup (Linux only)")
+
+    results = []
+    for name in options.variant or list(VARIANTS):
+        results.append(measure(name, options))
+        print(f"{name}: listo", flush=True)
+    print(render(results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
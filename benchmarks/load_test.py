@@ -0,0 +1,516 @@
+#!/usr/bin/env python
+"""
+Generador de carga para la API (asyncio + pool de conexiones keep-alive).
+
+Reproduce una mezcla ponderada de llamadas contra los endpoints de listado,
+obtiene y renueva el JWT a través de /api/token/ y reporta throughput y
+percentiles de latencia por endpoint en JSON y/o HTML. Sirve para dimensionar
+el número de workers de gunicorn.
+
+Uso:
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 \\
+        --username admin --password secret --concurrency 32 --duration 60 \\
+        --json report.json --html report.html
+
+    # Reproducir tráfico real: una línea "GET /api/..." por petición (p. ej.
+    # extraída del access log de gunicorn) o JSONL con campos "method"/"path"
+    python -m benchmarks.load_test --replay paths.txt ...
+"""
+import argparse
+import asyncio
+import base64
+import html
+import json
+import math
+import random
+import re
+import ssl
+import sys
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+DEFAULT_MIX = [
+    {'name': 'houses-for-sale list', 'weight': 35, 'method': 'GET', 'path': '/api/houses-for-sale/?page={page}'},
+    {'name': 'houses-for-sale filtered', 'weight': 15, 'method': 'GET',
+     'path': '/api/houses-for-sale/?city={city}&min_price={min_price}&ordering=selling_cost'},
+    {'name': 'houses-for-rent list', 'weight': 25, 'method': 'GET', 'path': '/api/houses-for-rent/?page={page}'},
+    {'name': 'property-images list', 'weight': 15, 'method': 'GET', 'path': '/api/property-images/?page={page}'},
+    {'name': 'owners list', 'weight': 10, 'method': 'GET', 'path': '/api/owners/'},
+]
+
+TEMPLATE_VALUES = {
+    'page': lambda rng: rng.choices([1, 2, 3, 4, 5], [50, 20, 15, 10, 5])[0],
+    'city': lambda rng: rng.choice(['monclova', 'frontera', 'saltillo']),
+    'min_price': lambda rng: rng.choice([0, 500000, 1000000, 2000000]),
+    'id': lambda rng: rng.randint(1, 100),
+}
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool:
+    """Fixed-size pool of keep-alive HTTP/1.1 connections to a single host"""
+
+    def __init__(self, base_url, size):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.secure = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.secure else 80)
+        self.host_header = parts.netloc
+        self.size = size
+        self.idle = asyncio.LifoQueue()
+        self.semaphore = asyncio.Semaphore(size)
+        self.opened = 0
+
+    async def _connect(self):
+        ssl_context = ssl.create_default_context() if self.secure else None
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=ssl_context)
+        self.opened += 1
+        return Connection(reader, writer)
+
+    async def request(self, method, path, headers=None, body=None, timeout=30):
+        """
+        Returns:
+            tuple: (status, headers dict, body bytes)
+        """
+        async with self.semaphore:
+            reused = not self.idle.empty()
+            conn = self.idle.get_nowait() if reused else await self._connect()
+            try:
+                status, response_headers, data, keep_alive = await asyncio.wait_for(
+                    self._send(conn, method, path, headers or {}, body), timeout
+                )
+            except (HTTPError, ConnectionError, asyncio.IncompleteReadError):
+                conn.close()
+                if not reused:
+                    raise
+                # El servidor cerró la conexión keep-alive inactiva: reintentar en una nueva
+                conn = await self._connect()
+                try:
+                    status, response_headers, data, keep_alive = await asyncio.wait_for(
+                        self._send(conn, method, path, headers or {}, body), timeout
+                    )
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            if keep_alive:
+                self.idle.put_nowait(conn)
+            else:
+                conn.close()
+            return status, response_headers, data
+
+    async def _send(self, conn, method, path, headers, body):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host_header}", "Connection: keep-alive"]
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        conn.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await conn.writer.drain()
+
+        status_line = await conn.reader.readline()
+        if not status_line:
+            raise HTTPError("connection closed by server")
+        parts = status_line.decode('latin-1').split(' ', 2)
+        status = int(parts[1])
+
+        response_headers = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            response_headers[key.strip().lower()] = value.strip()
+
+        keep_alive = response_headers.get('connection', '').lower() != 'close'
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = await self._read_chunked(conn.reader)
+        elif 'content-length' in response_headers:
+            data = await conn.reader.readexactly(int(response_headers['content-length']))
+        elif method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            data = b''
+        else:
+            data = await conn.reader.read()
+            keep_alive = False
+        return status, response_headers, data, keep_alive
+
+    async def _read_chunked(self, reader):
+        chunks = []
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';')[0].strip(), 16)
+            if size == 0:
+                # trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+
+def _jwt_expiry(token):
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))['exp']
+    except (IndexError, KeyError, ValueError):
+        return 0
+
+
+class TokenManager:
+    """Obtains the JWT pair from /api/token/ and refreshes the access token before it expires"""
+
+    def __init__(self, pool, username, password, token=None, refresh_margin=30):
+        self.pool = pool
+        self.username = username
+        self.password = password
+        self.access = token
+        self.refresh = None
+        self.expires_at = _jwt_expiry(token) if token else 0
+        self.refresh_margin = refresh_margin
+        self.lock = asyncio.Lock()
+        self.stats = Counter()
+
+    async def _post(self, path, payload):
+        body = json.dumps(payload).encode()
+        status, _, data = await self.pool.request(
+            'POST', path, {'Content-Type': 'application/json', 'Accept': 'application/json'}, body
+        )
+        if status != 200:
+            raise HTTPError(f"{path} returned {status}: {data[:200]!r}")
+        return json.loads(data)
+
+    async def header(self):
+        if self.username is None:
+            return {'Authorization': f"Bearer {self.access}"} if self.access else {}
+        if time.time() >= self.expires_at - self.refresh_margin:
+            await self.renew(self.access)
+        return {'Authorization': f"Bearer {self.access}"}
+
+    async def renew(self, stale=None):
+        async with self.lock:
+            # Otro worker ya lo renovó mientras esperábamos el lock
+            if self.access and self.access != stale and time.time() < self.expires_at - self.refresh_margin:
+                return
+            if self.refresh:
+                try:
+                    data = await self._post('/api/token/refresh/', {'refresh': self.refresh})
+                    self.stats['refresh'] += 1
+                    self._store(data)
+                    return
+                except HTTPError:
+                    self.stats['refresh_failed'] += 1
+            data = await self._post('/api/token/', {'username': self.username, 'password': self.password})
+            self.stats['obtain'] += 1
+            self._store(data)
+
+    def _store(self, data):
+        self.access = data['access']
+        self.refresh = data.get('refresh', self.refresh)
+        self.expires_at = _jwt_expiry(self.access)
+
+
+class Scenario:
+    """Weighted choice of requests, either from a mix definition or from replayed paths"""
+
+    def __init__(self, entries, seed=None):
+        self.entries = entries
+        self.weights = [entry['weight'] for entry in entries]
+        self.rng = random.Random(seed)
+
+    @classmethod
+    def from_mix(cls, path=None, seed=None):
+        entries = DEFAULT_MIX
+        if path:
+            with open(path, encoding='utf-8') as f:
+                entries = json.load(f)
+        return cls(entries, seed)
+
+    @classmethod
+    def from_replay(cls, path, seed=None):
+        counts = Counter()
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith('{'):
+                    entry = json.loads(line)
+                    method, target = entry.get('method', 'GET'), entry.get('path')
+                else:
+                    method, _, target = line.partition(' ')
+                    if not target:
+                        method, target = 'GET', method
+                if target:
+                    counts[(method.upper(), target.split()[0])] += 1
+        entries = [
+            {'name': endpoint_name(target), 'weight': weight, 'method': method, 'path': target}
+            for (method, target), weight in counts.items()
+        ]
+        if not entries:
+            raise SystemExit(f"No requests found in {path}")
+        return cls(entries, seed)
+
+    def next(self):
+        entry = self.rng.choices(self.entries, self.weights)[0]
+        path = entry['path']
+        if '{' in path:
+            path = path.format(**{key: make(self.rng) for key, make in TEMPLATE_VALUES.items()})
+        return entry['name'], entry.get('method', 'GET'), path, entry.get('body')
+
+
+def endpoint_name(path):
+    """/api/houses-for-sale/12/secure_url/?x=1 -> /api/houses-for-sale/{id}/secure_url/"""
+    return re.sub(r'/\d+(?=/|$)', '/{id}', path.split('?')[0])
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = defaultdict(Counter)
+        self.bytes = Counter()
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, name, latency_ms, status, size):
+        self.latencies[name].append(latency_ms)
+        self.statuses[name][status] += 1
+        self.bytes[name] += size
+
+    def error(self, name, exc):
+        self.errors[name][type(exc).__name__] += 1
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        names = set(self.latencies) | set(self.errors)
+        for name in sorted(names):
+            values = sorted(self.latencies[name])
+            endpoints[name] = {
+                'requests': len(values),
+                'errors': sum(self.errors[name].values()),
+                'error_types': dict(self.errors[name]),
+                'statuses': {str(k): v for k, v in sorted(self.statuses[name].items())},
+                'rps': round(len(values) / elapsed, 2) if elapsed else 0,
+                'mean_kb': round(self.bytes[name] / max(len(values), 1) / 1024, 1),
+                **latency_stats(values),
+            }
+        all_values = sorted(v for values in self.latencies.values() for v in values)
+        total = {
+            'requests': len(all_values),
+            'errors': sum(sum(c.values()) for c in self.errors.values()),
+            'non_2xx': sum(v for c in self.statuses.values() for k, v in c.items() if not 200 <= k < 300),
+            'rps': round(len(all_values) / elapsed, 2) if elapsed else 0,
+            **latency_stats(all_values),
+        }
+        return {'duration_s': round(elapsed, 2), 'total': total, 'endpoints': endpoints}
+
+
+def latency_stats(values):
+    return {
+        'p50_ms': round(percentile(values, 50), 2),
+        'p90_ms': round(percentile(values, 90), 2),
+        'p95_ms': round(percentile(values, 95), 2),
+        'p99_ms': round(percentile(values, 99), 2),
+        'max_ms': round(values[-1], 2) if values else 0.0,
+    }
+
+
+async def worker(pool, tokens, scenario, recorder, deadline, remaining, pacer):
+    while time.perf_counter() < deadline:
+        if remaining is not None:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        # Con --rps la latencia cuenta desde el envío programado: si el servidor
+        # se atrasa, la espera hasta que un worker queda libre también cuenta
+        # (sin esto los percentiles ocultan la cola: "coordinated omission")
+        start = await pacer() if pacer is not None else time.perf_counter()
+        name, method, path, body = scenario.next()
+        try:
+            headers = await tokens.header()
+            headers['Accept'] = 'application/json'
+            payload = json.dumps(body).encode() if body is not None else None
+            if payload is not None:
+                headers['Content-Type'] = 'application/json'
+            status, _, data = await pool.request(method, path, headers, payload)
+            if status == 401 and tokens.username is not None:
+                # Token revocado o expirado antes de tiempo: renovar y reintentar una vez
+                await tokens.renew(tokens.access)
+                headers.update(await tokens.header())
+                status, _, data = await pool.request(method, path, headers, payload)
+        except Exception as exc:
+            recorder.error(name, exc)
+            continue
+        recorder.record(name, (time.perf_counter() - start) * 1000, status, len(data))
+
+
+def make_pacer(rps):
+    """
+    Open-loop pacing: request ``n`` is scheduled at ``t0 + n / rps``.
+
+    The schedule never slips when the server falls behind: late requests go
+    out immediately and keep their original send time.
+
+    Returns:
+        Coroutine function that waits for the next slot and returns its
+        scheduled ``time.perf_counter()`` value, or None without ``rps``
+    """
+    if not rps:
+        return None
+    interval = 1.0 / rps
+    state = {'next': time.perf_counter()}
+
+    async def pace():
+        scheduled = state['next']
+        state['next'] += interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return scheduled
+    return pace
+
+
+async def run(options):
+    if options.replay:
+        scenario = Scenario.from_replay(options.replay, options.seed)
+    else:
+        scenario = Scenario.from_mix(options.mix, options.seed)
+
+    pool = ConnectionPool(options.base_url, options.connections or options.concurrency)
+    tokens = TokenManager(pool, options.username, options.password, options.token)
+    if options.username:
+        await tokens.renew()
+
+    if options.warmup:
+        warmup = Recorder()
+        await asyncio.gather(*[
+            worker(pool, tokens, scenario, warmup, time.perf_counter() + options.warmup, None, None)
+            for _ in range(options.concurrency)
+        ])
+
+    recorder = Recorder()
+    deadline = time.perf_counter() + (options.duration if options.duration else float('inf'))
+    remaining = [options.requests] if options.requests else None
+    pacer = make_pacer(options.rps)
+    await asyncio.gather(*[
+        worker(pool, tokens, scenario, recorder, deadline, remaining, pacer)
+        for _ in range(options.concurrency)
+    ])
+    recorder.finished = time.perf_counter()
+    await pool.close()
+
+    report = recorder.summary()
+    report['config'] = {
+        'base_url': options.base_url,
+        'concurrency': options.concurrency,
+        'connections_opened': pool.opened,
+        'rps_target': options.rps,
+        'scenario': options.replay or options.mix or 'default',
+    }
+    report['auth'] = dict(tokens.stats)
+    return report
+
+
+def render_text(report):
+    lines = [f"{'endpoint':<40} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"]
+    rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+    for name, stats in rows:
+        lines.append(
+            f"{name[:40]:<40} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8} "
+            f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}"
+        )
+    return '\n'.join(lines)
+
+
+def render_html(report):
+    rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+    body = ''.join(
+        "<tr>" + ''.join(f"<td>{html.escape(str(value))}</td>" for value in (
+            name, stats['requests'], stats['errors'], stats['rps'], stats['p50_ms'],
+            stats['p90_ms'], stats['p95_ms'], stats['p99_ms'], stats['max_ms'],
+        )) + "</tr>"
+        for name, stats in rows
+    )
+    config = html.escape(json.dumps(report['config']))
+    return f"""<!doctype html>
+<html><head><meta charset="utf-8"><title>Load test</title>
+<style>body{{font-family:sans-serif}} table{{border-collapse:collapse}}
+td,th{{border:1px solid #ccc;padding:4px 8px;text-align:right}} td:first-child{{text-align:left}}</style>
+</head><body>
+<h1>Load test ({report['duration_s']}s)</h1>
+<p><code>{config}</code></p>
+<table><tr><th>endpoint</th><th>requests</th><th>errors</th><th>req/s</th>
+<th>p50 ms</th><th>p90 ms</th><th>p95 ms</th><th>p99 ms</th><th>max ms</th></tr>
+{body}</table></body></html>
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a weighted mix of API calls and report latency percentiles")
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--username', help="Obtain/refresh JWTs through /api/token/ with these credentials")
+    parser.add_argument('--password')
+    parser.add_argument('--token', help="Use a fixed access token instead of username/password")
+    parser.add_argument('--concurrency', type=int, default=16, help="Concurrent virtual clients")
+    parser.add_argument('--connections', type=int, help="Pool size (default: concurrency)")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run (0 = until --requests)")
+    parser.add_argument('--requests', type=int, help="Stop after this many requests")
+    parser.add_argument('--rps', type=float, help="Target request rate (open loop, latency measured from the scheduled "
+                             "send time); default closed loop")
+    parser.add_argument('--warmup', type=float, default=0, help="Seconds of unrecorded warm-up")
+    parser.add_argument('--mix', help="JSON file: [{name, weight, method, path}]")
+    parser.add_argument('--replay', help="File of 'METHOD /path' lines (or JSONL with method/path) to replay")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Write the JSON report here")
+    parser.add_argument('--html', help="Write an HTML report here")
+    options = parser.parse_args(argv)
+    if options.username and not options.password:
+        parser.error("--password is required with --username")
+    if not options.duration and not options.requests:
+        parser.error("use --duration and/or --requests")
+    return options
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    report = asyncio.run(run(options))
+    print(render_text(report))
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if options.html:
+        with open(options.html, 'w', encoding='utf-8') as f:
+            f.write(render_html(report))
+    return 1 if report['total']['requests'] == 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,7 +6,6 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 django.setup()
 
 import sqlite3
-import pandas as pd
 from property.models import HouseForSale
 from owner.models import Owner
 
@@ -39,6 +38,8 @@ FIELDS_XLSX_HOUSE_FOR_SALE = {
     "negociable": 24
 }
 def load_houses(filename: str):
+    import pandas as pd  # pesado: sólo al cargar el Excel
+
     df = pd.read_excel(filename, sheet_name='CASAS VENTA', header=1)
     df.columns = df.columns.str.strip().str.upper()
 
@@ -110,6 +111,8 @@ def load_houses(filename: str):
 
 
 def load_owners():
+    import pandas as pd
+
     file_path = 'casas.xlsx'
     sheet_name = 'Hoja1'
     df = pd.read_excel(file_path, sheet_name=sheet_name)
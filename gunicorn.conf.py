@@ -0,0 +1,113 @@
+"""
+Configuración de gunicorn (se carga sola desde el directorio del proyecto).
+
+Todo se ajusta con variables de entorno:
+
+    GUNICORN_WORKER_CLASS   gthread (default), uvicorn (ASGI) o sync
+    WEB_CONCURRENCY         número de workers (default según CPUs y clase)
+    GUNICORN_THREADS        hilos por worker gthread (default 4)
+    GUNICORN_PRELOAD        importar la app una vez en el master (default true)
+    GUNICORN_MAX_REQUESTS   reciclar cada worker tras N peticiones (default 1000, 0 = nunca)
+    GUNICORN_MAX_REQUESTS_JITTER  variación aleatoria de lo anterior (default 10%)
+    GUNICORN_TIMEOUT, GUNICORN_KEEPALIVE, GUNICORN_ACCESS_LOG
+
+Con ``preload_app`` Django, DRF, boto3, pandas, etc. se importan una sola vez y
+los workers comparten esas páginas de memoria (copy-on-write). Lo que no se
+puede compartir entre procesos (conexiones a la base de datos, clientes de
+S3 y sus sockets) se cierra en el master antes de crear los workers
+(``when_ready``) y se descarta en ``post_fork`` para que cada worker cree los
+suyos.
+
+Métricas: con PROMETHEUS_MULTIPROC_DIR definido, cada worker escribe sus
+contadores en ese directorio; aquí se limpia al arrancar y se descartan los
+archivos de los workers que terminan.
+"""
+import multiprocessing
+import os
+import shutil
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn_worker.UvicornWorker',
+}
+
+_kind = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if _kind not in WORKER_CLASSES:
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, not {_kind!r}")
+_cpus = multiprocessing.cpu_count()
+
+worker_class = WORKER_CLASSES[_kind]
+wsgi_app = 'backend.asgi:application' if _kind == 'uvicorn' else 'backend.wsgi:application'
+
+# Workers async/con hilos ya atienden varias peticiones cada uno: menos procesos
+workers = _env_int('WEB_CONCURRENCY', _cpus * 2 + 1 if _kind == 'sync' else _cpus + 1)
+threads = _env_int('GUNICORN_THREADS', 4) if _kind == 'gthread' else 1
+
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+
+# Reciclar workers acota fugas de memoria; el jitter evita que todos se
+# reinicien a la vez
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = timeout
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# El heartbeat de los workers en tmpfs evita bloqueos cuando /tmp está en disco lento
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+
+def on_starting(server):
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        # Los archivos de una ejecución anterior sumarían contadores viejos
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        # Si algo consultó la base de datos al importar, esa conexión no debe
+        # heredarse: dos procesos escribiendo en el mismo socket la corrompen
+        connections.close_all()
+        # Lo mismo con el pool de psycopg (DB_POOL): sus hilos no sobreviven
+        # al fork y sus conexiones quedarían compartidas
+        for connection in connections.all(initialized_only=True):
+            if connection.alias in getattr(connection, '_connection_pools', {}):
+                connection.close_pool()
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return  # la app aún no se ha importado en este proceso
+    from backend.storage_backends import reset_clients
+
+    # Clientes de boto3, pools de conexiones y locks copiados del master
+    reset_clients()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
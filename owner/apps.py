@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class OwnerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'owner'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from .models import Owner
+        from .search import invalidate
+
+        # El índice de autocompletado en memoria se reconstruye tras cualquier cambio
+        post_save.connect(invalidate, sender=Owner, dispatch_uid='owner.search_invalidate_on_save')
+        post_delete.connect(invalidate, sender=Owner, dispatch_uid='owner.search_invalidate_on_delete')
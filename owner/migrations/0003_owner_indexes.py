@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('owner', '0002_owner_owner_id_house'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='owner',
+            index=models.Index(fields=['name', 'id'], name='owner_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='owner',
+            index=models.Index(fields=['owner_id_house'], name='owner_house_id_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:14
+
+from django.db import migrations, models
+
+from owner.models import compute_search_key
+
+
+def fill_search_key(apps, schema_editor):
+    Owner = apps.get_model('owner', 'Owner')
+    owners = Owner.objects.using(schema_editor.connection.alias).order_by('pk')
+    batch = []
+    for owner in owners.iterator(chunk_size=2000):
+        owner.search_key = compute_search_key(owner.name, owner.last_name, owner.phone, owner.owner_id_house)
+        batch.append(owner)
+        if len(batch) == 2000:
+            Owner.objects.using(schema_editor.connection.alias).bulk_update(batch, ['search_key'])
+            batch = []
+    Owner.objects.using(schema_editor.connection.alias).bulk_update(batch, ['search_key'])
+
+
+def create_trigram_index(apps, schema_editor):
+    # Sólo PostgreSQL con pg_trgm instalado: si no, el autocompletado usa el
+    # índice en memoria (owner/search.py)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS owner_search_trgm_idx ON owner_owner USING gin (search_key gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS owner_search_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('owner', '0003_owner_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='owner',
+            name='search_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_search_key, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
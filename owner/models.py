@@ -1,12 +1,45 @@
+import unicodedata
+
 from django.db import models
 
+# Campos de los que sale Owner.search_key
+SEARCH_FIELDS = ('name', 'last_name', 'phone', 'owner_id_house')
+
+
+def normalize_search(text):
+    """Minúsculas, sin acentos y con un solo espacio entre palabras"""
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    return ' '.join(''.join(c for c in text if not unicodedata.combining(c)).split())
+
+
+def compute_search_key(name, last_name, phone, owner_id_house):
+    """Texto en el que busca el autocompletado de propietarios"""
+    values = (name, last_name, phone, owner_id_house)
+    return normalize_search(' '.join(str(value) for value in values if value not in (None, '')))
+
 
 class Owner(models.Model):
     name = models.CharField(max_length=100, null=True, blank=True)
     last_name = models.CharField(max_length=100, null=True, blank=True)
     phone = models.CharField(max_length=11, null=True, blank=True)
     owner_id_house = models.IntegerField(null=True, blank=True)
+    search_key = models.CharField(max_length=255, blank=True, default='', editable=False)
+
+    def save(self, *args, **kwargs):
+        self.search_key = compute_search_key(self.name, self.last_name, self.phone, self.owner_id_house)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(SEARCH_FIELDS) & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'search_key'}
+        super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            # Orden del listado y del cursor de /owners/portfolio/ (name, id)
+            models.Index(fields=['name', 'id'], name='owner_name_idx'),
+            models.Index(fields=['owner_id_house'], name='owner_house_id_idx'),
+            # En PostgreSQL search_key tiene además un índice de trigramas
+            # (migración 0004_owner_search_key)
+        ]
 
     def __str__(self):
         return str(self.name) + str(self.last_name)
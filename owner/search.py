@@ -0,0 +1,246 @@
+"""
+Autocompletado de propietarios por nombre, apellidos, teléfono y
+``owner_id_house``.
+
+La consulta se normaliza igual que ``Owner.search_key`` (minúsculas, sin
+acentos) y se parte en palabras; un propietario coincide si cada palabra de
+la consulta es el principio de alguna palabra de su ``search_key``
+(``"ana gonz"`` encuentra a "Ana González Ruiz"). Se devuelven los primeros
+``limit`` en orden de nombre.
+
+Dos implementaciones (``OWNER_SEARCH_BACKEND``):
+
+- ``trigram``: en PostgreSQL, una expresión regular por palabra sobre
+  ``search_key``, resuelta con el índice GIN de trigramas
+  ``owner_search_trgm_idx`` (migración ``0004_owner_search_key``). Las
+  palabras de menos de 3 letras no tienen trigramas: se filtran recorriendo
+  ``owner_name_idx`` en orden hasta juntar ``limit`` resultados.
+- ``prefix``: índice en memoria de cada proceso (``PrefixIndex``) con las
+  palabras ordenadas y, por palabra, los propietarios que la tienen. Se
+  construye con una consulta la primera vez y se reconstruye cuando un
+  propietario cambia (``invalidate``, a través del caché de Django) o tras
+  ``OWNER_SEARCH_INDEX_TTL`` segundos (los ``bulk_create`` no avisan). La
+  reconstrucción corre en un hilo aparte: mientras tanto responde el índice
+  anterior.
+
+``auto`` (por defecto) elige ``trigram`` si la base de lectura es
+PostgreSQL y tiene el índice (la migración lo omite si el servidor no tiene
+la extensión pg_trgm) y ``prefix`` en otro caso.
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import accumulate, chain
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models import F
+
+from .models import Owner, normalize_search
+
+logger = logging.getLogger(__name__)
+
+MAX_TOKENS = 5
+MERGE_MAX_WORDS = 256
+SORT_MAX_OWNERS = 50000
+VERSION_KEY = 'owner-search-version'
+TRIGRAM_INDEX = 'owner_search_trgm_idx'
+
+# Mismo orden que /owners/portfolio/
+ORDERING = (F('name').asc(nulls_last=True), 'id')
+
+
+def tokens(query):
+    """Distinct normalized words of a query, at most ``MAX_TOKENS``"""
+    return list(dict.fromkeys(normalize_search(query).split()))[:MAX_TOKENS]
+
+
+class PrefixIndex:
+    """
+    Sorted words of every ``search_key`` with the owners that have them.
+
+    Owners are numbered by their position in ``ORDERING`` (their rank), so
+    merging the rank lists of the words sharing a prefix yields matches
+    already in output order and the search stops after ``limit`` of them.
+    """
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows (iterable): ``(pk, search_key)`` in ``ORDERING``
+        """
+        postings = {}
+        self.pks = array('q')
+        # Con un espacio delante: ' ana' in key <=> alguna palabra empieza por 'ana'
+        self.keys = []
+        for rank, (pk, key) in enumerate(rows):
+            self.pks.append(pk)
+            self.keys.append(f" {key}")
+            for word in set(key.split()):
+                postings.setdefault(word, []).append(rank)
+        self.words = sorted(postings)
+        # Las listas de todas las palabras, una detrás de otra; la de la
+        # palabra i es ranks[sizes[i]:sizes[i + 1]]. Un solo array en vez de
+        # uno por palabra (millones de objetos para el recolector de ciclos)
+        self.ranks = array('l', chain.from_iterable(postings[word] for word in self.words))
+        self.sizes = array('q', [0, *accumulate(len(postings[word]) for word in self.words)])
+
+    def word_range(self, prefix):
+        """``(start, end)`` of the words starting with ``prefix``"""
+        return bisect_left(self.words, prefix), bisect_left(self.words, prefix + '\U0010ffff')
+
+    def postings(self, i):
+        """Ranks of the owners having word ``i``, ascending"""
+        return self.ranks[self.sizes[i]:self.sizes[i + 1]]
+
+    def scan_cost(self, span):
+        start, end = span
+        size = self.sizes[end] - self.sizes[start]
+        return (end - start > MERGE_MAX_WORDS and size > SORT_MAX_OWNERS, size)
+
+    def search(self, words, limit):
+        """
+        Returns:
+            list: Primary keys of the first ``limit`` owners matching every word
+        """
+        if not words:
+            return []
+        prefixes = [f" {word}" for word in words]
+        # Se recorren los propietarios de una de las palabras (la más
+        # selectiva de las que se pueden recorrer en orden sin leerlas
+        # enteras) y se comprueban las demás en cada uno
+        start, end = min((self.word_range(word) for word in words), key=self.scan_cost)
+        if end - start <= MERGE_MAX_WORDS:
+            ranks = heapq.merge(*(self.postings(i) for i in range(start, end)))
+        elif self.sizes[end] - self.sizes[start] <= SORT_MAX_OWNERS:
+            ranks = sorted(self.ranks[self.sizes[start]:self.sizes[end]])
+        else:
+            # Prefijo muy común (``"866"``: casi todos los teléfonos): las
+            # coincidencias son densas, basta recorrer en orden
+            ranks = range(len(self.pks))
+        matches = []
+        last = None
+        for rank in ranks:
+            if rank == last:
+                continue
+            last = rank
+            key = self.keys[rank]
+            if all(word in key for word in prefixes):
+                matches.append(self.pks[rank])
+                if len(matches) == limit:
+                    break
+        return matches
+
+
+_index = None  # (versión, momento en que se construyó, PrefixIndex)
+_index_lock = threading.Lock()
+_build_lock = threading.Lock()
+_rebuild_thread = None
+
+
+def invalidate(**kwargs):
+    """Signal receiver: rebuild the prefix indexes of every process on next use"""
+    cache.set(VERSION_KEY, time.time(), None)
+
+
+def build_index():
+    """``PrefixIndex`` over every owner, read with one query"""
+    rows = Owner.objects.order_by(*ORDERING).values_list('pk', 'search_key').iterator(chunk_size=10000)
+    return PrefixIndex(rows)
+
+
+def _is_stale(entry, version, ttl):
+    return entry[0] != version or time.monotonic() - entry[1] > ttl
+
+
+def _rebuild(version):
+    global _index, _rebuild_thread
+    try:
+        index = build_index()
+        with _index_lock:
+            _index = (version, time.monotonic(), index)
+    except Exception:
+        logger.exception("Error rebuilding the owner search index")
+    finally:
+        with _index_lock:
+            _rebuild_thread = None
+        # La conexión de este hilo no la cierra nadie más
+        connections.close_all()
+
+
+def prefix_index():
+    """
+    This process's ``PrefixIndex``. The first call builds it; afterwards, if
+    owners changed or it expired, it is rebuilt in a background thread
+    (one at a time) and the old one keeps answering until the new one is ready.
+    With ``OWNER_SEARCH_INDEX_BACKGROUND`` off the rebuild happens in the request.
+    """
+    global _index, _rebuild_thread
+    version = cache.get(VERSION_KEY)
+    ttl = getattr(settings, 'OWNER_SEARCH_INDEX_TTL', 300)
+    background = getattr(settings, 'OWNER_SEARCH_INDEX_BACKGROUND', True)
+    with _index_lock:
+        entry = _index
+        if entry is not None and not _is_stale(entry, version, ttl):
+            return entry[2]
+        if entry is not None and background:
+            if _rebuild_thread is None:
+                _rebuild_thread = threading.Thread(
+                    target=_rebuild, args=(version,), name='owner-search-index', daemon=True,
+                )
+                _rebuild_thread.start()
+            return entry[2]
+
+    # Sin índice que servir: se construye aquí, una sola vez aunque lleguen varias peticiones
+    with _build_lock:
+        with _index_lock:
+            entry = _index
+        if entry is None or _is_stale(entry, version, ttl):
+            index = build_index()
+            with _index_lock:
+                _index = entry = (version, time.monotonic(), index)
+        return entry[2]
+
+
+@lru_cache(maxsize=None)
+def has_trigram_index(alias):
+    """Whether the migration could create ``owner_search_trgm_idx`` (needs pg_trgm)"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [TRIGRAM_INDEX])
+        return cursor.fetchone() is not None
+
+
+def backend():
+    name = getattr(settings, 'OWNER_SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        return 'trigram' if has_trigram_index(router.db_for_read(Owner)) else 'prefix'
+    return name
+
+
+def autocomplete(query, limit=10):
+    """
+    Owners whose ``search_key`` words start with every word of ``query``
+
+    Returns:
+        list: Up to ``limit`` Owner instances in name order
+    """
+    words = tokens(query)
+    if not words:
+        return []
+    if backend() == 'trigram':
+        queryset = Owner.objects.all()
+        for word in words:
+            queryset = queryset.filter(search_key__regex=f"(^| ){re.escape(word)}")
+        return list(queryset.order_by(*ORDERING)[:limit])
+    pks = prefix_index().search(words, limit)
+    owners = Owner.objects.in_bulk(pks)
+    return [owners[pk] for pk in pks if pk in owners]
@@ -1,3 +1,171 @@
-from django.test import TestCase
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api import benchmark
+from owner import search
+from owner.models import Owner
+from property.models import HouseForSale, HouseForRent
+
+
+@override_settings(JWT_CLAIMS_AUTH=True)
+class OwnerPortfolioTests(TestCase):
+    """/api/owners/portfolio/: aggregates in one query, field projection and keyset pages"""
+
+    @classmethod
+    def setUpTestData(cls):
+        names = ['Beto', None, 'Ana', 'Beto', None, 'Carla', 'Ana']
+        cls.owners = Owner.objects.bulk_create(Owner(name=name, owner_id_house=i) for i, name in enumerate(names))
+        ana = cls.owners[2]
+        HouseForSale.objects.bulk_create(HouseForSale(owner=ana, selling_cost=cost) for cost in (100, 250))
+        HouseForRent.objects.create(owner=ana, rent_cost=30)
+
+    def setUp(self):
+        self.client = benchmark.authenticated_client()
+
+    def walk(self, url):
+        results = []
+        while url:
+            page = self.client.get(url).json()
+            results.extend(page['results'])
+            url = page['next']
+        return results
+
+    def test_aggregates_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/owners/portfolio/?page_size=2')
+        first = response.json()['results'][0]
+        self.assertEqual(first['id'], self.owners[2].pk)
+        self.assertEqual(
+            {key: first[key] for key in ('houses_for_sale', 'houses_for_rent', 'sale_value', 'monthly_rent')},
+            {'houses_for_sale': 2, 'houses_for_rent': 1, 'sale_value': 350, 'monthly_rent': 30},
+        )
+        self.assertEqual(response.json()['results'][1]['sale_value'], 0)
+        # La página donde se acaban los nombres lee también la rama de owners sin nombre
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.client.get('/api/owners/portfolio/').json()['results']), len(self.owners))
+
+    def test_keyset_pages_follow_name_then_id(self):
+        expected = sorted(self.owners, key=lambda owner: (owner.name is None, owner.name or '', owner.pk))
+        for page_size in (1, 2, 3, 100):
+            with self.subTest(page_size=page_size):
+                results = self.walk(f'/api/owners/portfolio/?page_size={page_size}&fields=id')
+                self.assertEqual([owner['id'] for owner in results], [owner.pk for owner in expected])
+
+    def test_fields_projection(self):
+        results = self.client.get('/api/owners/portfolio/?fields=id,houses_for_sale').json()['results']
+        self.assertEqual(set(results[0]), {'id', 'houses_for_sale'})
+        results = self.client.get('/api/owners/?fields=id,name').json()['results']
+        self.assertEqual(set(results[0]), {'id', 'name'})
+        response = self.client.get('/api/owners/portfolio/?fields=id,rating')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/owners/portfolio/?cursor=abc').status_code, 400)
+
+
+# La reconstrucción en otro hilo no vería los datos de la transacción del test
+@override_settings(JWT_CLAIMS_AUTH=True, OWNER_SEARCH_INDEX_BACKGROUND=False)
+class OwnerAutocompleteTests(TestCase):
+    """/api/owners/autocomplete/ over the normalized search_key"""
+
+    @classmethod
+    def setUpTestData(cls):
+        people = [
+            ('Jose', 'González Ruiz', '8661230000', 7),
+            ('Josefina', 'Ruiz', '8669990000', 12),
+            ('Ana', 'Gonzalo Pérez', '8441230000', 70),
+            (None, 'Sin Nombre', None, None),
+        ]
+        cls.owners = [
+            Owner.objects.create(name=name, last_name=last_name, phone=phone, owner_id_house=house)
+            for name, last_name, phone, house in people
+        ]
+
+    def setUp(self):
+        search.invalidate()
+        self.client = benchmark.authenticated_client()
+
+    def names(self, query, **params):
+        response = self.client.get('/api/owners/autocomplete/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [owner['name'] or owner['last_name'] for owner in response.json()]
+
+    def test_search_key_follows_saves(self):
+        owner = self.owners[0]
+        self.assertEqual(owner.search_key, 'jose gonzalez ruiz 8661230000 7')
+        owner.phone = '8005550000'
+        owner.save(update_fields=['phone'])
+        owner.refresh_from_db()
+        self.assertEqual(owner.search_key, 'jose gonzalez ruiz 8005550000 7')
+
+    def test_every_word_prefixes_a_word(self):
+        self.assertEqual(self.names('jos'), ['Jose', 'Josefina'])
+        self.assertEqual(self.names('GONZ'), ['Ana', 'Jose'])
+        self.assertEqual(self.names('josé ruiz'), ['Jose', 'Josefina'])
+        self.assertEqual(self.names('perez an'), ['Ana'])
+        self.assertEqual(self.names('866'), ['Jose', 'Josefina'])
+        self.assertEqual(self.names('7'), ['Ana', 'Jose'])
+        self.assertEqual(self.names('sin'), ['Sin Nombre'])
+        self.assertEqual(self.names('uiz'), [])
+        self.assertEqual(self.names(''), [])
+        self.assertEqual(self.names('jos', limit=1), ['Jose'])
+
+    def test_changes_rebuild_the_index(self):
+        self.assertEqual(self.names('jos'), ['Jose', 'Josefina'])
+        Owner.objects.create(name='Jorge', last_name='Treviño')
+        self.assertEqual(self.names('jo'), ['Jorge', 'Jose', 'Josefina'])
+        self.owners[1].delete()
+        self.assertEqual(self.names('jos'), ['Jose'])
+
+    def test_one_query_per_search(self):
+        self.names('ana')  # construye el índice en memoria
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names('ana', fields='id,name'), ['Ana'])
+
+
+@override_settings(OWNER_SEARCH_INDEX_BACKGROUND=True, OWNER_SEARCH_INDEX_TTL=300)
+class PrefixIndexRebuildTests(SimpleTestCase):
+    """A stale prefix index keeps answering while a background thread rebuilds it"""
+
+    def setUp(self):
+        search.invalidate()
+        search._index = None
+        self.addCleanup(setattr, search, '_index', None)
+
+    def index_of(self, *owners):
+        return search.PrefixIndex((pk, name) for pk, name in owners)
+
+    def test_old_index_answers_during_the_rebuild(self):
+        release = threading.Event()
+        built = []
+
+        def slow_build():
+            built.append(threading.current_thread().name)
+            if len(built) > 1:
+                release.wait(5)
+                return self.index_of((1, 'ana'), (2, 'anabel'))
+            return self.index_of((1, 'ana'))
+
+        with mock.patch.object(search, 'build_index', slow_build):
+            # La primera vez no hay índice que servir: se construye en la petición
+            self.assertEqual(search.prefix_index().search(['ana'], 10), [1])
+            search.invalidate()
+            for _ in range(3):
+                self.assertEqual(search.prefix_index().search(['ana'], 10), [1])
+            thread = search._rebuild_thread
+            self.assertEqual(thread.name, 'owner-search-index')
+            release.set()
+            thread.join(5)
+            self.assertEqual(search.prefix_index().search(['ana'], 10), [1, 2])
+        # Una sola reconstrucción aunque llegaran varias peticiones
+        self.assertEqual(built, ['MainThread', 'owner-search-index'])
+
+    def test_expired_index_is_rebuilt_in_background(self):
+        with mock.patch.object(search, 'build_index', lambda: self.index_of((1, 'ana'))):
+            search.prefix_index()
+        version, built_at, index = search._index
+        search._index = (version, built_at - 301, index)
+        with mock.patch.object(search, 'build_index', lambda: self.index_of((3, 'ana'))):
+            self.assertIs(search.prefix_index(), index)
+            search._rebuild_thread.join(5)
+            self.assertEqual(search.prefix_index().search(['ana'], 10), [3])
@@ -1,8 +1,24 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.fields.tuple_lookups import Tuple, TupleGreaterThan
+from django.db.models.functions import Coalesce
 from django.shortcuts import render
 from rest_framework import viewsets, serializers
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.decorators import action
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
+from backend.db_routers import ReplicaReadMixin
+from backend.profiling import ProfiledSerializerMixin
+from backend.throttling import CostThrottleMixin
 from owner.models import Owner
+from owner.search import autocomplete
+from property.models import HouseForSale, HouseForRent
 
 # Create your views here.
 # class HouseForSaleViewSet(viewsets.ModelViewSet):
@@ -10,17 +26,215 @@ from owner.models import Owner
 #     serializer_class = HouseForSaleSerializer
 
 
-class OwnerSerializer(serializers.ModelSerializer):
+def portfolio_subquery(model, aggregate):
+    """
+    ``aggregate`` over the houses of ``model`` belonging to the outer owner,
+    as a correlated subquery (0 for owners without houses). Each one is
+    resolved with the ``(owner, -created_at)`` index of the house table.
+    """
+    houses = (
+        model.objects.filter(owner=OuterRef('pk'))
+        .order_by()
+        .values('owner')
+        .annotate(total=aggregate)
+        .values('total')
+    )
+    return Coalesce(Subquery(houses, output_field=IntegerField()), Value(0))
+
+
+# Estadísticas de cartera de /api/owners/portfolio/: sólo se calculan las pedidas en ?fields=
+PORTFOLIO_STATS = {
+    'houses_for_sale': lambda: portfolio_subquery(HouseForSale, Count('pk')),
+    'houses_for_rent': lambda: portfolio_subquery(HouseForRent, Count('pk')),
+    'sale_value': lambda: portfolio_subquery(HouseForSale, Sum('selling_cost')),
+    'monthly_rent': lambda: portfolio_subquery(HouseForRent, Sum('rent_cost')),
+}
+
+
+class ProjectedFieldsMixin:
+    """
+    ``?fields=id,name`` keeps only those fields of the serializer output.
+
+    Raises:
+        ValidationError: If a requested field does not exist
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = projected_fields(request)
+        if requested is None:
+            return
+        unknown = requested - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+        for name in set(self.fields) - requested:
+            self.fields.pop(name)
+
+
+def projected_fields(request):
+    """Field names of ``?fields=``, or None to return every field"""
+    if request is None or request.method != 'GET':
+        return None
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class OwnerSerializer(ProjectedFieldsMixin, ProfiledSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Owner
+        exclude = ['search_key']
+
+
+class OwnerPortfolioSerializer(OwnerSerializer):
+    """Owner with the size and value of their listings"""
+    houses_for_sale = serializers.IntegerField(read_only=True)
+    houses_for_rent = serializers.IntegerField(read_only=True)
+    sale_value = serializers.IntegerField(read_only=True)
+    monthly_rent = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Owner
-        fields = "__all__"
+        fields = ['id', 'name', 'last_name', 'phone', 'owner_id_house', *PORTFOLIO_STATS]
+
 
 class OwnerPagination(PageNumberPagination):
     page_size = 1000  # Permitir hasta 1000 owners por página
     page_size_query_param = 'page_size'
     max_page_size = 1000
 
-class OwnerViewSet(viewsets.ModelViewSet):
+
+class OwnerKeysetPagination(BasePagination):
+    """
+    Keyset pagination in ``(name, id)`` order, owners without name last.
+
+    The cursor keeps the last ``(name, id)`` of the page. Named owners are
+    read with a row comparison, ``WHERE (name, id) > (%s, %s) ORDER BY name,
+    id``, which PostgreSQL answers with one range scan of ``owner_name_idx``
+    however deep the page is (SQLite gets the equivalent OR). Owners without
+    name are a second branch, ``WHERE name IS NULL AND id > %s ORDER BY id``,
+    on the same index; only the page where the names run out queries both.
+    There is no ``COUNT(*)``. Follow ``next`` for the following page.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    ordering = ('name', 'id')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, owner):
+        payload = json.dumps({'n': owner.name, 'id': owner.pk}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Returns the ``(name, id)`` stored in a cursor
+
+        Raises:
+            ValidationError: If the cursor is malformed
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            name = payload['n']
+            if name is not None and not isinstance(name, str):
+                raise ValueError
+            return name, int(payload['id'])
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise serializers.ValidationError({'cursor': "Invalid cursor"})
+
+    def branches(self, queryset, cursor):
+        """
+        Returns:
+            tuple: (owners with name after the cursor or None, owners without name after it)
+        """
+        if cursor is None:
+            return queryset.filter(name__isnull=False), queryset.filter(name__isnull=True)
+        name, pk = cursor
+        if name is None:
+            return None, queryset.filter(name__isnull=True, id__gt=pk)
+        # (name, id) > (x, y) nunca es cierto con name NULL: esos van en la otra rama
+        named = queryset.filter(TupleGreaterThan(Tuple(F('name'), F('id')), (name, pk)))
+        return named, queryset.filter(name__isnull=True)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        named, unnamed = self.branches(queryset, self.decode_cursor(cursor) if cursor else None)
+        page = []
+        if named is not None:
+            page = list(named.order_by(*self.ordering)[:page_size + 1])
+        if len(page) <= page_size:
+            page += list(unnamed.order_by('id')[:page_size + 1 - len(page)])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def get_paginated_response(self, data):
+        next_url = None
+        if self.next_cursor:
+            next_url = replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+        return Response({'next': next_url, 'results': data})
+
+
+class OwnerViewSet(CostThrottleMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Owner.objects.all().order_by("name")
     serializer_class = OwnerSerializer
-    pagination_class = OwnerPagination
\ No newline at end of file
+    pagination_class = OwnerPagination
+    filterset_fields = ['owner_id_house']
+    autocomplete_max_limit = 50
+
+    @action(detail=False, methods=['get'], pagination_class=OwnerKeysetPagination,
+            serializer_class=OwnerPortfolioSerializer)
+    def portfolio(self, request):
+        """
+        Owners with the number of houses for sale and for rent, the total
+        selling price and the total monthly rent of their listings, in one query
+        Endpoint: GET /owners/portfolio/?fields=id,name,houses_for_sale&cursor=...
+
+        Keyset paginated by name (see OwnerKeysetPagination). ``fields``
+        limits both the output and what is computed: statistics not asked
+        for are not queried.
+        """
+        # El serializer valida ?fields= antes de armar la consulta
+        wanted = set(self.get_serializer().fields)
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.annotate(**{
+            name: stat() for name, stat in PORTFOLIO_STATS.items() if name in wanted
+        })
+        columns = [field.attname for field in Owner._meta.concrete_fields if field.name in wanted]
+        queryset = queryset.only('pk', 'name', *columns)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def autocomplete(self, request):
+        """
+        Owners matching a partial name, last name, phone or owner_id_house,
+        for pickers that search as the user types
+        Endpoint: GET /owners/autocomplete/?q=ana gonz&limit=10
+
+        Every word of ``q`` must start a word of the owner (case and accents
+        are ignored). Returns up to ``limit`` owners (10 by default, at most
+        50) in name order, without pagination; ``fields`` works as in the list.
+        """
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            raise serializers.ValidationError({'limit': "Must be a number"})
+        limit = max(1, min(limit, self.autocomplete_max_limit))
+        serializer = self.get_serializer(autocomplete(request.query_params.get('q', ''), limit), many=True)
+        return Response(serializer.data)
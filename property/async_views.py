@@ -0,0 +1,180 @@
+"""
+Variantes async (ASGI) del listado y detalle de casas.
+
+Devuelven exactamente lo mismo que ``/api/houses-for-sale/`` y
+``/api/houses-for-rent/`` (mismos filtros, orden, paginación y formato), pero:
+
+- autenticación, permisos y filtros se resuelven en un solo salto a hilo
+  reutilizando el viewset síncrono;
+- las filas y las imágenes de toda la página se leen con el ORM async
+  (una consulta de imágenes por página, no una por casa);
+- las URLs firmadas de S3 se generan en paralelo en hilos con un solo
+  cliente de boto3, sin bloquear el event loop.
+
+Bajo uvicorn (ver ``Procfile``) un worker atiende otras peticiones mientras
+espera a la base de datos o termina de firmar URLs.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.contenttypes.models import ContentType
+from django.http import Http404
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from backend import db_routers, storage_backends
+from .models import PropertyImage, attach_images
+from .views import HouseForSaleViewSet, HouseForRentViewSet
+
+
+async def sign_image_urls(images, expiration=3600, chunk_size=256):
+    """
+    Presigned URLs for many images, signed in worker threads (in chunks, so
+    the event loop keeps serving other requests) with the shared boto3 client.
+
+    Returns:
+        dict: PropertyImage id -> URL (or None on error)
+    """
+    images = [image for image in images if image.image]
+    if not images:
+        return {}
+    service = storage_backends.S3ImageService()
+
+    def sign(chunk):
+        urls = service.generate_presigned_urls([image.image.name for image in chunk], expiration)
+        return [urls[image.image.name] for image in chunk]
+
+    chunks = [images[i:i + chunk_size] for i in range(0, len(images), chunk_size)]
+    urls = []
+    for chunk_urls in await asyncio.gather(*(asyncio.to_thread(sign, chunk) for chunk in chunks)):
+        urls.extend(chunk_urls)
+    return dict(zip((image.pk for image in images), urls))
+
+
+class AsyncHouseView(View):
+    """
+    Async list/detail for a house viewset. Subclasses set ``viewset_class``;
+    a ``pk`` URL kwarg selects the detail view.
+    """
+    viewset_class = None
+    http_method_names = ['get', 'head', 'options']
+
+    def prepare(self, request, action):
+        """
+        Runs the synchronous part of the viewset (authentication, permissions,
+        throttling, content negotiation and filter backends).
+
+        Returns:
+            tuple: (viewset, queryset, content type id), or (viewset, rendered error response, None)
+        """
+        viewset = self.viewset_class(
+            action_map={'get': action, 'head': action}, args=(), kwargs={}, format_kwarg=None, headers={},
+        )
+        drf_request = viewset.initialize_request(request)
+        viewset.request = drf_request
+        try:
+            viewset.initial(drf_request)
+            # También el detalle pasa por los filtros, igual que get_object()
+            queryset = viewset.filter_queryset(viewset.get_queryset())
+            content_type_id = ContentType.objects.get_for_model(queryset.model).id
+        except Exception as exc:
+            return viewset, self.render(viewset, viewset.handle_exception(exc)), None
+        return viewset, queryset, content_type_id
+
+    def render(self, viewset, response):
+        response = viewset.finalize_response(viewset.request, response)
+        response.render()
+        return response
+
+    async def get(self, request, pk=None):
+        # prepare() elige réplica igual que el viewset; sync_to_async propaga
+        # esa elección a las consultas async siguientes
+        with db_routers.routing_scope():
+            return await self.respond(request, pk)
+
+    async def respond(self, request, pk):
+        action = 'list' if pk is None else 'retrieve'
+        viewset, queryset, content_type_id = await sync_to_async(self.prepare)(request, action)
+        if content_type_id is None:
+            return queryset  # respuesta de error ya renderizada
+
+        try:
+            if pk is None:
+                data, houses = await self.list_page(viewset, queryset)
+            else:
+                house = await queryset.filter(pk=pk).afirst()
+                if house is None:
+                    raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+                viewset.check_object_permissions(viewset.request, house)
+                data, houses = None, [house]
+        except (exceptions.APIException, Http404) as exc:
+            return await sync_to_async(self.render)(viewset, viewset.handle_exception(exc))
+
+        images = [
+            image async for image in PropertyImage.objects.filter(
+                content_type_id=content_type_id, object_id__in=[house.pk for house in houses],
+            )
+        ]
+        attach_images(houses, images)
+        secure_urls = await sign_image_urls(images)
+
+        context = viewset.get_serializer_context()
+        context['secure_urls'] = secure_urls
+        if pk is None:
+            data['results'] = viewset.get_serializer_class()(houses, many=True, context=context).data
+        else:
+            data = viewset.get_serializer_class()(houses[0], context=context).data
+        return self.render(viewset, Response(data))
+
+    async def list_page(self, viewset, queryset):
+        """
+        Same page/page_size semantics and response shape as DRF's PageNumberPagination.
+
+        Returns:
+            tuple: (response dict without results, houses of the page)
+        """
+        paginator = viewset.paginator
+        request = viewset.request
+        page_size = paginator.get_page_size(request)
+        count = await queryset.acount()
+        num_pages = max(1, -(-count // page_size))
+
+        page_number = request.query_params.get(paginator.page_query_param) or 1
+        if page_number in paginator.last_page_strings:
+            page_number = num_pages
+        try:
+            page_number = int(page_number)
+        except (TypeError, ValueError):
+            page_number = 0
+        if page_number < 1 or page_number > num_pages:
+            raise exceptions.NotFound(paginator.invalid_page_message)
+
+        offset = (page_number - 1) * page_size
+        houses = [house async for house in queryset[offset:offset + page_size]]
+
+        url = request.build_absolute_uri()
+        next_link = previous_link = None
+        if page_number < num_pages:
+            next_link = replace_query_param(url, paginator.page_query_param, page_number + 1)
+        if page_number > 1:
+            if page_number == 2:
+                previous_link = remove_query_param(url, paginator.page_query_param)
+            else:
+                previous_link = replace_query_param(url, paginator.page_query_param, page_number - 1)
+        return {'count': count, 'next': next_link, 'previous': previous_link}, houses
+
+
+class AsyncHouseForSaleView(AsyncHouseView):
+    """
+    Endpoint: GET /api/async/houses-for-sale/ and /api/async/houses-for-sale/{id}/
+    """
+    viewset_class = HouseForSaleViewSet
+
+
+class AsyncHouseForRentView(AsyncHouseView):
+    """
+    Endpoint: GET /api/async/houses-for-rent/ and /api/async/houses-for-rent/{id}/
+    """
+    viewset_class = HouseForRentViewSet
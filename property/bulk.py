@@ -0,0 +1,222 @@
+"""
+Altas, cambios y bajas de muchas casas en una sola petición.
+
+``POST /api/houses-for-sale/bulk/`` (y ``houses-for-rent``) recibe::
+
+    {
+        "create": [{"title": "...", "owner": 1, "selling_cost": 1000000}],
+        "update": [{"id": 12, "selling_cost": 950000, "estatus": "VENDIDA"}],
+        "delete": [40, 41]
+    }
+
+Todo se valida junto con el serializer del viewset (``update`` como un
+PATCH) y se aplica en una transacción: ``bulk_create``, un ``bulk_update``
+con las columnas que cambian y un ``DELETE ... WHERE id IN``. Si algún
+elemento no es válido no se aplica ninguno y la respuesta es 400 con los
+errores de cada uno.
+
+Las consultas no dependen del número de elementos: una para los
+propietarios referenciados, una (con ``SELECT ... FOR UPDATE``) para las
+casas a modificar o borrar y las escrituras en bloques de
+``BULK_BATCH_SIZE``. Con PATCH por casa son tres o cuatro consultas y una
+transacción por cada una.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from owner.models import Owner
+from .models import compute_geocell
+
+ACTIONS = ('create', 'update', 'delete')
+DEFAULT_MAX_ITEMS = 500
+DEFAULT_BATCH_SIZE = 200
+
+
+class BatchOwnerField(serializers.PrimaryKeyRelatedField):
+    """``owner`` looked up among the owners loaded once for the whole batch"""
+
+    def to_internal_value(self, data):
+        owners = self.context.get('owners')
+        if owners is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            owner = owners.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if owner is None:
+            self.fail('does_not_exist', pk_value=data)
+        return owner
+
+
+def parse_batch(data):
+    """
+    Returns:
+        dict: ``{'create': [...], 'update': [...], 'delete': [...]}``
+
+    Raises:
+        ValidationError: If the body is not a batch or has too many items
+    """
+    if not isinstance(data, dict) or not set(data) <= set(ACTIONS):
+        raise serializers.ValidationError({'detail': f"Expected an object with keys {', '.join(ACTIONS)}"})
+    batch = {name: data.get(name) or [] for name in ACTIONS}
+    for name, items in batch.items():
+        if not isinstance(items, list):
+            raise serializers.ValidationError({name: "Expected a list"})
+    max_items = getattr(settings, 'BULK_MAX_ITEMS', DEFAULT_MAX_ITEMS)
+    total = sum(len(items) for items in batch.values())
+    if total > max_items:
+        raise serializers.ValidationError({'detail': f"At most {max_items} items per request, got {total}"})
+    return batch
+
+
+def as_id(value):
+    """``value`` as a primary key, or None if it is not an integer"""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def item_id(action_name, item):
+    """Primary key of an update (``{"id": ...}``) or delete (the id itself), or None"""
+    if action_name == 'update':
+        return as_id(item.get('id')) if isinstance(item, dict) else None
+    return as_id(item)
+
+
+@lru_cache(maxsize=None)
+def bulk_serializer(serializer_class):
+    """``serializer_class`` with ``owner`` resolved from the batch's owners"""
+    return type(f"Bulk{serializer_class.__name__}", (serializer_class,),
+                {'owner': BatchOwnerField(queryset=Owner.objects.all())})
+
+
+class BulkWriteMixin:
+    """
+    ``bulk`` action for a house ``ModelViewSet``: creates, partial updates
+    and deletes validated together and applied in one transaction.
+    """
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create, update and delete many houses in one request
+        Endpoint: POST /houses-for-sale/bulk/  {"create": [...], "update": [{"id": ..., ...}], "delete": [ids]}
+
+        Returns 200 with one result per item (action, index, id, status), or
+        400 with the errors of the invalid items and nothing applied.
+        """
+        batch = parse_batch(request.data)
+        model = self.get_queryset().model
+        serializer_class = bulk_serializer(self.get_serializer_class())
+
+        with transaction.atomic():
+            errors = []
+            ids = {}
+            for action_name in ('update', 'delete'):
+                for index, item in enumerate(batch[action_name]):
+                    pk = item_id(action_name, item)
+                    if pk is None:
+                        errors.append(self.bulk_error(action_name, index, None, {'id': ["A valid integer is required."]}))
+                    elif pk in ids:
+                        errors.append(self.bulk_error(action_name, index, pk, {'id': ["Appears more than once in this request."]}))
+                    else:
+                        ids[pk] = (action_name, index)
+            houses = self.get_queryset().select_for_update().in_bulk(list(ids))
+
+            owner_ids = set()
+            for item in batch['create'] + batch['update']:
+                pk = as_id(item.get('owner')) if isinstance(item, dict) else None
+                if pk is not None:
+                    owner_ids.add(pk)
+            context = {**self.get_serializer_context(), 'owners': Owner.objects.in_bulk(owner_ids)}
+
+            created = []
+            for index, item in enumerate(batch['create']):
+                serializer = serializer_class(data=item, context=context)
+                if serializer.is_valid():
+                    created.append(model(**serializer.validated_data))
+                else:
+                    errors.append(self.bulk_error('create', index, None, serializer.errors))
+
+            updated = []
+            changed = set()
+            for index, item in enumerate(batch['update']):
+                pk = item_id('update', item)
+                if ids.get(pk) != ('update', index):
+                    continue
+                house = houses.get(pk)
+                if house is None:
+                    errors.append(self.bulk_error('update', index, pk, {'detail': "Not found."}, status.HTTP_404_NOT_FOUND))
+                    continue
+                data = {key: value for key, value in item.items() if key != 'id'}
+                serializer = serializer_class(house, data=data, partial=True, context=context)
+                if serializer.is_valid():
+                    for field, value in serializer.validated_data.items():
+                        setattr(house, field, value)
+                    changed.update(serializer.validated_data)
+                    updated.append((index, house))
+                else:
+                    errors.append(self.bulk_error('update', index, pk, serializer.errors))
+
+            deleted = []
+            for index, item in enumerate(batch['delete']):
+                pk = item_id('delete', item)
+                if ids.get(pk) != ('delete', index):
+                    continue
+                if pk not in houses:
+                    errors.append(self.bulk_error('delete', index, pk, {'detail': "Not found."}, status.HTTP_404_NOT_FOUND))
+                else:
+                    deleted.append((index, pk))
+
+            if errors:
+                errors.sort(key=lambda error: (ACTIONS.index(error['action']), error['index']))
+                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            self.apply_bulk(model, created, [house for _, house in updated], changed, [pk for _, pk in deleted])
+
+        results = (
+            [{'action': 'create', 'index': index, 'id': house.pk, 'status': status.HTTP_201_CREATED}
+             for index, house in enumerate(created)]
+            + [{'action': 'update', 'index': index, 'id': house.pk, 'status': status.HTTP_200_OK}
+               for index, house in updated]
+            + [{'action': 'delete', 'index': index, 'id': pk, 'status': status.HTTP_204_NO_CONTENT}
+               for index, pk in deleted]
+        )
+        response = Response({'results': results})
+        # Para CostThrottleMixin: se cobra cada elemento escrito
+        response.row_count = len(results)
+        return response
+
+    def apply_bulk(self, model, created, updated, changed, deleted):
+        batch_size = getattr(settings, 'BULK_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        # bulk_create/bulk_update no pasan por save(): geocell y updated_at a mano
+        for house in created:
+            house.geocell = compute_geocell(house.latitude, house.longitude)
+        if created:
+            model.objects.bulk_create(created, batch_size=batch_size)
+        if updated:
+            now = timezone.now()
+            for house in updated:
+                house.geocell = compute_geocell(house.latitude, house.longitude)
+                house.updated_at = now
+            fields = changed | {'updated_at'}
+            if {'latitude', 'longitude'} & changed:
+                fields.add('geocell')
+            model.objects.bulk_update(updated, sorted(fields), batch_size=batch_size)
+        if deleted:
+            model.objects.filter(pk__in=deleted).delete()
+
+    @staticmethod
+    def bulk_error(action_name, index, pk, errors, code=status.HTTP_400_BAD_REQUEST):
+        return {'action': action_name, 'index': index, 'id': pk, 'status': code, 'errors': errors}
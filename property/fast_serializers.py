@@ -0,0 +1,281 @@
+"""
+Listados de casas sin instanciar modelos ni pasar por cada campo de DRF.
+
+``ModelSerializer`` con ``fields = '__all__'`` resuelve, para cada fila y cada
+campo, ``get_attribute`` + ``to_representation``, y además crea la instancia
+del modelo. Para listados de 100 casas eso domina el tiempo de CPU.
+
+``FieldPlan`` recorre una sola vez los campos del serializer y precompila:
+qué columnas pedir con ``values_list()``, en qué orden salen en el JSON y qué
+conversión necesita cada una (la mayoría ninguna: un CharField o IntegerField
+ya llega como ``str``/``int`` desde la base de datos). Las imágenes de toda la
+página se leen en una sola consulta. El resultado es idéntico, byte a byte, a
+``HouseForSaleSerializer(many=True).data`` renderizado con ``JSONRenderer``.
+
+Si el serializer cambia a algo que el plan no sabe reproducir (campos
+calculados, relaciones anidadas nuevas) el plan falla al compilarse en vez de
+devolver otra cosa.
+"""
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import models
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from backend import db_routers, profiling, storage_backends
+from backend.renderers import FastJSONRenderer, NDJSONRenderer
+from .models import PropertyImage
+from .serializers import PropertyImageSerializer
+
+# Campos del serializer que llegan de la base de datos ya con el tipo que
+# devolvería su to_representation()
+_IDENTITY_FIELDS = (
+    (serializers.CharField, (models.CharField, models.TextField)),
+    (serializers.IntegerField, (models.IntegerField, models.AutoField)),
+    (serializers.BooleanField, (models.BooleanField,)),
+)
+
+IMAGE_FIELDS = ['id', 'image', 'image_url', 'secure_url', 'caption', 'is_main', 'order', 'created_at']
+IMAGE_COLUMNS = ('object_id', 'id', 'image', 'caption', 'is_main', 'order', 'created_at')
+
+# Acciones que aceptan ?format=ndjson además de los formatos de siempre
+STREAMING_RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+STREAM_CHUNK_SIZE = 500
+
+
+class FieldPlan:
+    """
+    Precompiled mapping from ``values_list()`` rows to the serializer output.
+
+    Attributes:
+        columns (list): Columns to request, primary key first
+        keys (list): Output keys, in serializer order
+        converters (list): (position in the output, function) for values that
+            need DRF's ``to_representation``
+        images_key (str): Output key of the nested image list, or None
+    """
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.model = model
+        self.columns = [model._meta.pk.attname]
+        self.keys = []
+        self.converters = []
+        self.images_key = None
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                if name != 'images' or not isinstance(field.child, PropertyImageSerializer):
+                    raise ImproperlyConfigured(f"{serializer_class.__name__}.{name}: unsupported nested list")
+                self.images_key = name
+                self.keys.append(name)
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                # DRF omite un campo de sólo lectura cuyo atributo no existe
+                # (p. ej. main_image): tampoco sale aquí
+                if field.read_only and not hasattr(model, field.source):
+                    continue
+                raise ImproperlyConfigured(f"{serializer_class.__name__}.{name}: unsupported nested serializer")
+
+            column, converter = self._compile(serializer_class, model, name, field)
+            if column != self.columns[0]:
+                self.columns.append(column)
+            if converter is not None:
+                self.converters.append((len(self.keys), converter))
+            self.keys.append(name)
+
+        if not self.keys or self.keys[0] != model._meta.pk.name:
+            raise ImproperlyConfigured(f"{serializer_class.__name__}: the primary key must be the first field")
+
+    @staticmethod
+    def _compile(serializer_class, model, name, field):
+        if isinstance(field, serializers.SerializerMethodField) or '.' in field.source or field.source == '*':
+            raise ImproperlyConfigured(f"{serializer_class.__name__}.{name}: computed fields are not supported")
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(f"{serializer_class.__name__}.{name}: not a model field")
+        if not model_field.concrete:
+            raise ImproperlyConfigured(f"{serializer_class.__name__}.{name}: not a database column")
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            if field.pk_field is not None:
+                raise ImproperlyConfigured(f"{serializer_class.__name__}.{name}: pk_field is not supported")
+            return model_field.attname, None
+        if isinstance(field, serializers.ReadOnlyField):
+            return model_field.attname, None
+        for field_class, model_classes in _IDENTITY_FIELDS:
+            if type(field) is field_class and isinstance(model_field, model_classes):
+                return model_field.attname, None
+        return model_field.attname, field.to_representation
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.columns)
+
+    def serialize(self, rows, request=None, secure_urls=None, url_expiration=3600):
+        """
+        Turn ``values_list()`` rows into the serializer's list of dicts.
+
+        Args:
+            rows (list): Tuples in ``self.columns`` order
+            request: Used to build absolute image URLs, like the serializer context
+            secure_urls (dict): Already signed URLs by image id (optional)
+            url_expiration (int): Seconds the signed image URLs stay valid
+
+        Returns:
+            list: One dict per row
+        """
+        with profiling.section('serialize'):
+            images = {}
+            if self.images_key is not None and rows:
+                images = self.images_for([row[0] for row in rows], request, secure_urls, url_expiration)
+
+            keys = self.keys
+            converters = self.converters
+            images_at = keys.index(self.images_key) if self.images_key is not None else None
+            data = []
+            for row in rows:
+                values = list(row)
+                if images_at is not None:
+                    values.insert(images_at, images.get(row[0], []))
+                for position, convert in converters:
+                    value = values[position]
+                    if value is not None:
+                        values[position] = convert(value)
+                data.append(dict(zip(keys, values)))
+            return data
+
+    def stream(self, rows, request=None, url_expiration=3600, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        NDJSON lines for an iterable of ``values_list()`` rows, serializing
+        ``chunk_size`` rows (and loading their images) at a time, so memory
+        does not grow with the number of rows.
+
+        Yields:
+            bytes: One chunk of lines
+        """
+        renderer = FastJSONRenderer()
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield self._lines(chunk, renderer, request, url_expiration)
+                chunk = []
+        if chunk:
+            yield self._lines(chunk, renderer, request, url_expiration)
+
+    def _lines(self, rows, renderer, request, url_expiration):
+        data = self.serialize(rows, request=request, url_expiration=url_expiration)
+        return b''.join(renderer.render(item) + b'\n' for item in data)
+
+    def images_for(self, house_ids, request=None, secure_urls=None, url_expiration=3600):
+        """
+        Serialized images of several houses with one query, grouped by house id,
+        in the same gallery order and format as ``PropertyImageSerializer``.
+        """
+        content_type = ContentType.objects.get_for_model(self.model)
+        image_rows = PropertyImage.objects.filter(
+            content_type=content_type, object_id__in=house_ids,
+        ).values_list(*IMAGE_COLUMNS)
+
+        storage = PropertyImage._meta.get_field('image').storage
+        created_at = PropertyImageSerializer().fields['created_at'].to_representation
+        service = None
+        grouped = {}
+        for object_id, pk, name, caption, is_main, order, created in image_rows:
+            url = signed = None
+            if name:
+                url = storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                if secure_urls is not None and pk in secure_urls:
+                    signed = secure_urls[pk]
+                else:
+                    service = service or storage_backends.S3ImageService()
+                    signed = service.generate_presigned_url(name, url_expiration)
+            elif secure_urls is not None and pk in secure_urls:
+                signed = secure_urls[pk]
+            grouped.setdefault(object_id, []).append({
+                'id': pk,
+                'image': url,
+                'image_url': signed,
+                'secure_url': signed,
+                'caption': caption,
+                'is_main': is_main,
+                'order': order,
+                'created_at': created_at(created) if created is not None else None,
+            })
+        return grouped
+
+
+def check_image_serializer():
+    fields = [name for name, field in PropertyImageSerializer().fields.items() if not field.write_only]
+    if fields != IMAGE_FIELDS:
+        raise ImproperlyConfigured(f"PropertyImageSerializer fields changed ({fields}); update fast_serializers")
+
+
+class FastListMixin:
+    """
+    ``list`` action of a house viewset through a ``FieldPlan``: same filters,
+    ordering, pagination and bytes as the ModelViewSet version.
+    """
+    _plan = None
+
+    @classmethod
+    def get_field_plan(cls):
+        # Por clase: se compila en la primera petición, no al importar
+        if cls.__dict__.get('_plan') is None:
+            check_image_serializer()
+            cls._plan = FieldPlan(cls.serializer_class)
+        return cls._plan
+
+    def list(self, request, *args, **kwargs):
+        return self.plan_response(self.filter_queryset(self.get_queryset()))
+
+    def plan_response(self, queryset):
+        """
+        Paginated response for an already filtered and ordered queryset, or,
+        when the action accepts it and the client asks for ``?format=ndjson``,
+        every row (up to ``STREAM_MAX_ROWS``) streamed one house per line.
+        """
+        plan = self.get_field_plan()
+        context = self.get_serializer_context()
+        url_expiration = context.get('url_expiration', 3600)
+        if getattr(self.request.accepted_renderer, 'format', None) == NDJSONRenderer.format:
+            return self.stream_response(plan, queryset, context.get('request'), url_expiration)
+
+        rows = plan.rows(queryset)
+        page = self.paginate_queryset(rows)
+        data = plan.serialize(
+            list(page) if page is not None else list(rows),
+            request=context.get('request'),
+            url_expiration=url_expiration,
+        )
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def stream_response(self, plan, queryset, request, url_expiration):
+        max_rows = getattr(settings, 'STREAM_MAX_ROWS', 10000)
+        # La respuesta se genera después de que la vista termina: la réplica
+        # elegida para la petición se fija aquí
+        alias = db_routers.current_read_alias()
+        total = queryset.count()
+
+        def lines():
+            with db_routers.routing_scope(alias):
+                rows = plan.rows(queryset)[:max_rows].iterator(chunk_size=STREAM_CHUNK_SIZE)
+                yield from plan.stream(rows, request, url_expiration)
+
+        response = StreamingHttpResponse(lines(), content_type=NDJSONRenderer.media_type)
+        response['X-Total-Count'] = str(total)
+        if total > max_rows:
+            response['X-Truncated'] = 'true'
+        response.row_count = min(total, max_rows)
+        return response
@@ -0,0 +1,172 @@
+"""
+Generación de datos sintéticos realistas para pruebas de carga.
+
+Las distribuciones imitan el inventario real (``casas.xlsx``): pocas ciudades
+concentran casi todas las casas, cada ciudad tiene colonias con distinto
+precio por m², y el precio se deriva del tamaño de la construcción. Todas las
+funciones reciben un ``random.Random`` para que el resultado dependa sólo de
+la semilla.
+"""
+import math
+
+from owner.models import compute_search_key
+
+from .geo import encode_geohash
+
+# (ciudad, peso, precio por m² base, centro lat/lng, código postal base)
+CITIES = [
+    ('MONCLOVA', 50, 9500, (26.9081, -101.4216), 25700),
+    ('FRONTERA', 15, 8200, (26.9282, -101.4497), 25600),
+    ('SALTILLO', 12, 14500, (25.4232, -101.0053), 25000),
+    ('CASTAÑOS', 6, 7000, (26.7882, -101.4312), 25870),
+    ('SAN BUENAVENTURA', 5, 6500, (27.0606, -101.5480), 25500),
+    ('NADADORES', 3, 6000, (27.0300, -101.5947), 27300),
+    ('MONTERREY', 9, 21000, (25.6866, -100.3161), 64000),
+]
+
+# (colonia, peso, factor de precio)
+NGHOODS = [
+    ('ZONA CENTRO', 30, 1.0),
+    ('GUADALUPE', 12, 0.85),
+    ('ESTANCIAS DE SANTA ANA', 10, 1.35),
+    ('LA AMISTAD', 9, 0.9),
+    ('EL PUEBLO', 8, 0.8),
+    ('LUIS DONALDO COLOSIO', 7, 0.75),
+    ('FRACCIONAMIENTO ELIZONDO', 6, 1.2),
+    ('LA SIERRITA', 5, 0.95),
+    ('AV MONTESSORI', 4, 1.5),
+    ('LOS BOSQUES', 3, 1.8),
+]
+
+FIRST_NAMES = ['JUAN', 'MARIA', 'JOSE', 'GUADALUPE', 'FRANCISCO', 'ANA', 'LUIS', 'ROSA',
+               'CARLOS', 'LAURA', 'JORGE', 'PATRICIA', 'MIGUEL', 'ELENA', 'RICARDO', 'SOFIA']
+LAST_NAMES = ['GARCIA', 'MARTINEZ', 'HERNANDEZ', 'LOPEZ', 'GONZALEZ', 'RODRIGUEZ', 'PEREZ',
+              'SANCHEZ', 'RAMIREZ', 'CRUZ', 'FLORES', 'GOMEZ', 'MORALES', 'VAZQUEZ', 'REYES']
+STREETS = ['HIDALGO', 'JUAREZ', 'ZARAGOZA', 'MADERO', 'ALLENDE', 'MORELOS', 'CARRANZA',
+           'DE LA FUENTE', 'HARROLD R. PAPE', 'CUAUHTEMOC', 'REFORMA', 'INDEPENDENCIA']
+ESTATUS = [('DISPONIBLE', 80), ('EN TRATO', 15), ('VENDIDA', 5)]
+PAYMENT_METHODS = ['CONTADO', 'INFONAVIT', 'CREDITO BANCARIO', 'FOVISSSTE', 'CONTADO O CREDITO']
+SERVICES = ['AGUA, LUZ, GAS', 'AGUA, LUZ', 'TODOS LOS SERVICIOS', 'AGUA, LUZ, GAS, INTERNET']
+
+_CITY_WEIGHTS = [city[1] for city in CITIES]
+_NGHOOD_WEIGHTS = [nghood[1] for nghood in NGHOODS]
+_ESTATUS_VALUES = [value for value, _ in ESTATUS]
+_ESTATUS_WEIGHTS = [weight for _, weight in ESTATUS]
+IMAGE_COUNT_WEIGHTS = [4, 6, 10, 14, 16, 14, 12, 10, 8, 6]  # 0..9 fotos por casa
+
+
+def pick_location(rng):
+    """
+    Returns:
+        dict: city, nghood, postal_code, coordinates and the price per m²
+    """
+    city, _, base_price, (lat, lng), postal_base = rng.choices(CITIES, _CITY_WEIGHTS)[0]
+    nghood_index = rng.choices(range(len(NGHOODS)), _NGHOOD_WEIGHTS)[0]
+    nghood, _, factor = NGHOODS[nghood_index]
+
+    # Cada colonia queda en una zona fija alrededor del centro de la ciudad
+    angle = nghood_index * 2.399963  # ángulo áureo
+    distance = 0.006 * math.sqrt(nghood_index + 1)
+    latitude = lat + distance * math.sin(angle) + rng.gauss(0, 0.003)
+    longitude = lng + distance * math.cos(angle) + rng.gauss(0, 0.003)
+
+    return {
+        'city': city,
+        'nghood': nghood,
+        'postal_code': postal_base + nghood_index * 10,
+        'latitude': round(latitude, 6),
+        'longitude': round(longitude, 6),
+        'geocell': encode_geohash(latitude, longitude),
+        'price_per_m2': base_price * factor,
+    }
+
+
+def pick_owner_id(rng, owner_ids):
+    """Unos cuantos propietarios concentran muchas casas (sesgo tipo Pareto)"""
+    return owner_ids[int(len(owner_ids) * rng.random() ** 3)]
+
+
+def owner_fields(rng, sequence):
+    fields = {
+        'name': rng.choice(FIRST_NAMES),
+        'last_name': f"{rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}",
+        'phone': f"866{rng.randrange(10 ** 7):07d}",
+        'owner_id_house': sequence,
+    }
+    # bulk_create no pasa por Owner.save()
+    fields['search_key'] = compute_search_key(**fields)
+    return fields
+
+
+def _size(rng):
+    beds = rng.choices([1, 2, 3, 4, 5], [8, 30, 42, 15, 5])[0]
+    construccion = round(rng.lognormvariate(math.log(35 + beds * 28), 0.25), 1)
+    superficie = round(construccion * rng.uniform(1.0, 2.2), 1)
+    baths = rng.choice([1, 1.5, 2, 2.5, 3][:max(2, beds)])
+    return beds, baths, construccion, superficie
+
+
+def house_for_sale_fields(rng, owner_id):
+    location = pick_location(rng)
+    beds, baths, construccion, superficie = _size(rng)
+    price = construccion * location.pop('price_per_m2') * rng.lognormvariate(0, 0.15)
+    selling_cost = int(round(price, -4))
+    return dict(
+        location,
+        title=f"CASA EN {location['nghood']}",
+        street=rng.choice(STREETS),
+        number=rng.randint(1, 3000),
+        selling_cost=selling_cost,
+        infonavit=selling_cost < 2_500_000 and rng.random() < 0.6,
+        owner_id=owner_id,
+        estatus=rng.choices(_ESTATUS_VALUES, _ESTATUS_WEIGHTS)[0],
+        cochera=rng.choices([0, 1, 2, 3], [15, 45, 30, 10])[0],
+        baths=baths,
+        patio=rng.random() < 0.75,
+        beds=beds,
+        minisplits=rng.randint(0, beds),
+        construccion=construccion,
+        superficie=superficie,
+        servicios=rng.choice(SERVICES),
+        metodo_de_pago=rng.choice(PAYMENT_METHODS),
+        negociable=rng.random() < 0.4,
+    )
+
+
+def house_for_rent_fields(rng, owner_id):
+    location = pick_location(rng)
+    beds, baths, construccion, _ = _size(rng)
+    # Renta mensual ~0.5% del valor estimado de la casa
+    value = construccion * location.pop('price_per_m2')
+    rent_cost = int(round(value * 0.005 * rng.lognormvariate(0, 0.2), -2))
+    return dict(
+        location,
+        title=f"RENTA EN {location['nghood']}",
+        street=rng.choice(STREETS),
+        number=rng.randint(1, 3000),
+        rent_cost=max(rent_cost, 1500),
+        garage=rng.random() < 0.7,
+        bedrooms=beds,
+        bathrooms=baths,
+        minisplits=rng.randint(0, beds),
+        included_services=rng.choice(SERVICES),
+        petfriendly=rng.random() < 0.35,
+        patio=rng.random() < 0.6,
+        owner_id=owner_id,
+    )
+
+
+def image_fields(rng, model_name, content_type_id, object_id):
+    """Filas de PropertyImage para una casa; sólo nombres, no se sube nada"""
+    count = rng.choices(range(len(IMAGE_COUNT_WEIGHTS)), IMAGE_COUNT_WEIGHTS)[0]
+    return [
+        {
+            'image': f"properties/{model_name}/{object_id}/fixture_{order}.jpg",
+            'caption': None if rng.random() < 0.5 else f"Foto {order + 1}",
+            'is_main': order == 0,
+            'order': order,
+            'content_type_id': content_type_id,
+            'object_id': object_id,
+        }
+        for order in range(count)
+    ]
@@ -0,0 +1,100 @@
+"""
+Galería completa de una propiedad en una sola petición.
+
+``PUT /api/houses-for-sale/{id}/gallery/`` (y ``houses-for-rent``) recibe
+la lista ordenada de todas las imágenes de la casa::
+
+    {"images": [{"id": 7, "is_main": true}, {"id": 3, "caption": "Cocina"}, {"id": 5}]}
+
+La posición en la lista es el nuevo ``order`` (0, 1, 2...). ``caption`` e
+``is_main`` son opcionales (si faltan no cambian); si una imagen viene con
+``is_main: true`` las demás dejan de ser principales.
+
+Se aplica en una transacción con un solo ``bulk_update``, en vez de un PATCH
+por imagen y ``set_as_main``. Cuando la imagen principal cambia se quita
+antes la anterior con un ``UPDATE`` aparte: ``image_one_main_per_property``
+es un índice único parcial, que se comprueba fila por fila (no se puede
+diferir) y dentro del ``bulk_update`` podría ver dos principales a la vez.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import PropertyImage
+from .serializers import PropertyImageSerializer
+
+
+class GalleryItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    caption = serializers.CharField(max_length=200, required=False, allow_null=True, allow_blank=True)
+    is_main = serializers.BooleanField(required=False)
+
+
+class GallerySerializer(serializers.Serializer):
+    images = GalleryItemSerializer(many=True)
+
+    def validate_images(self, items):
+        ids = [item['id'] for item in items]
+        repeated = sorted({pk for pk in ids if ids.count(pk) > 1})
+        if repeated:
+            raise serializers.ValidationError(f"Repeated image ids: {', '.join(map(str, repeated))}")
+        if sum(1 for item in items if item.get('is_main')) > 1:
+            raise serializers.ValidationError("Only one image can be the main image")
+        return items
+
+
+class GalleryMixin:
+    """``gallery`` action for a house ``ModelViewSet``: reorder, caption and pick the main image at once"""
+
+    @action(detail=True, methods=['put'])
+    def gallery(self, request, pk=None):
+        """
+        Replace the order, captions and main image of a house's gallery
+        Endpoint: PUT /houses-for-sale/{id}/gallery/  {"images": [{"id": ..., "caption": ..., "is_main": ...}]}
+
+        ``images`` must list every image of the house exactly once, in the
+        new display order. Returns the gallery in that order.
+
+        Raises:
+            ValidationError: If the list is not exactly the house's images
+        """
+        house = self.get_object()
+        serializer = GallerySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['images']
+
+        with transaction.atomic():
+            images = PropertyImage.objects.filter(
+                content_type=ContentType.objects.get_for_model(house), object_id=house.pk
+            ).select_for_update().in_bulk()
+            listed = {item['id'] for item in items}
+            missing, unknown = sorted(set(images) - listed), sorted(listed - set(images))
+            if missing or unknown:
+                errors = {}
+                if missing:
+                    errors['missing'] = missing
+                if unknown:
+                    errors['unknown'] = unknown
+                raise serializers.ValidationError({'images': errors})
+
+            main = next((item['id'] for item in items if item.get('is_main')), None)
+            now = timezone.now()
+            gallery = []
+            for order, item in enumerate(items):
+                image = images[item['id']]
+                image.order = order
+                if 'caption' in item:
+                    image.caption = item['caption']
+                image.is_main = image.pk == main if main is not None else item.get('is_main', image.is_main)
+                image.updated_at = now
+                gallery.append(image)
+
+            if main is not None:
+                PropertyImage.objects.filter(pk__in=list(images), is_main=True).exclude(pk=main).update(is_main=False)
+            PropertyImage.objects.bulk_update(gallery, ['order', 'caption', 'is_main', 'updated_at'])
+
+        context = self.get_serializer_context()
+        return Response(PropertyImageSerializer(gallery, many=True, context=context).data)
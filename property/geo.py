@@ -0,0 +1,256 @@
+"""
+Utilidades geoespaciales para las propiedades.
+
+Las casas guardan latitud/longitud y una celda geohash (``geocell``) indexada
+con un B-tree normal. Un bounding box se convierte en un conjunto pequeño de
+rangos de celdas (``geocell >= a AND geocell < b``) que el índice resuelve
+rápido; después se aplica el filtro exacto por coordenadas. No requiere PostGIS.
+"""
+import math
+
+from django.db.models import F, Q
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOCELL_PRECISION = 9  # ~4.8m x 4.8m
+MAX_COVER_CELLS = 32
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LNG = 111.320
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_RADIUS_KM = 1
+
+
+def encode_geohash(latitude, longitude, precision=GEOCELL_PRECISION):
+    """
+    Encode a coordinate as a geohash string
+
+    Args:
+        latitude (float): Latitude in degrees
+        longitude (float): Longitude in degrees
+        precision (int): Number of characters of the resulting hash
+
+    Returns:
+        str: Geohash of ``precision`` characters
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bit = 0
+    char_index = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                char_index = (char_index << 1) | 1
+                lng_range[0] = mid
+            else:
+                char_index <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                char_index = (char_index << 1) | 1
+                lat_range[0] = mid
+            else:
+                char_index <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_ALPHABET[char_index])
+            bit = 0
+            char_index = 0
+
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return (height, width) in degrees of a geohash cell of the given precision"""
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def _next_prefix(prefix):
+    """
+    Lexicographically next geohash prefix of the same length, or None when
+    ``prefix`` is the last one (e.g. ``'zz'``).
+    """
+    chars = list(prefix)
+    for i in range(len(chars) - 1, -1, -1):
+        index = GEOHASH_ALPHABET.index(chars[i])
+        if index < len(GEOHASH_ALPHABET) - 1:
+            chars[i] = GEOHASH_ALPHABET[index + 1]
+            return ''.join(chars[:i + 1]) + GEOHASH_ALPHABET[0] * (len(chars) - i - 1)
+    return None
+
+
+def covering_cells(min_lat, min_lng, max_lat, max_lng, max_cells=MAX_COVER_CELLS):
+    """
+    Return the sorted geohash prefixes covering a bounding box, using the
+    finest precision that stays under ``max_cells`` cells.
+    """
+    for precision in range(GEOCELL_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor((max_lat + 90) / height) - math.floor((min_lat + 90) / height) + 1
+        cols = math.floor((max_lng + 180) / width) - math.floor((min_lng + 180) / width) + 1
+        if rows * cols <= max_cells:
+            break
+
+    first_lat = (math.floor((min_lat + 90) / height) + 0.5) * height - 90
+    first_lng = (math.floor((min_lng + 180) / width) + 0.5) * width - 180
+    cells = set()
+    for row in range(rows):
+        lat = min(first_lat + row * height, 90.0)
+        for col in range(cols):
+            lng = min(first_lng + col * width, 180.0)
+            cells.add(encode_geohash(lat, lng, precision))
+    return sorted(cells)
+
+
+def cell_ranges(cells):
+    """
+    Merge sorted prefixes into ``(start, stop)`` ranges over the geocell
+    column. Adjacent prefixes collapse into a single range; ``stop`` is None
+    when the range is open-ended.
+    """
+    ranges = []
+    for cell in cells:
+        stop = _next_prefix(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1] = (ranges[-1][0], stop)
+        else:
+            ranges.append((cell, stop))
+    return ranges
+
+
+def _cells_q(cells):
+    condition = Q()
+    for start, stop in cell_ranges(cells):
+        cell_q = Q(geocell__gte=start)
+        if stop is not None:
+            cell_q &= Q(geocell__lt=stop)
+        condition |= cell_q
+    return condition
+
+
+def filter_bbox(queryset, min_lat, min_lng, max_lat, max_lng):
+    """
+    Restrict a house queryset to the given bounding box
+    """
+    if min_lat > max_lat or min_lng > max_lng:
+        return queryset.none()
+    cells = covering_cells(min_lat, min_lng, max_lat, max_lng)
+    return queryset.filter(_cells_q(cells)).filter(
+        latitude__gte=min_lat, latitude__lte=max_lat,
+        longitude__gte=min_lng, longitude__lte=max_lng,
+    )
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """Bounding box (min_lat, min_lng, max_lat, max_lng) enclosing a circle"""
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    d_lng = min(radius_km / (KM_PER_DEGREE_LNG * cos_lat), 180.0)
+    return (
+        max(latitude - d_lat, -90.0), max(longitude - d_lng, -180.0),
+        min(latitude + d_lat, 90.0), min(longitude + d_lng, 180.0),
+    )
+
+
+def filter_radius(queryset, latitude, longitude, radius_km):
+    """
+    Restrict a house queryset to a circle around a point.
+
+    The cell index narrows the candidates to the enclosing bounding box and an
+    equirectangular distance (accurate at city scale, no SQL trigonometry
+    needed) discards the corners. Rows are annotated with ``distance_sq``
+    (km²) so callers can order by proximity.
+    """
+    min_lat, min_lng, max_lat, max_lng = radius_bbox(latitude, longitude, radius_km)
+    queryset = filter_bbox(queryset, min_lat, min_lng, max_lat, max_lng)
+
+    k_lat = KM_PER_DEGREE_LAT
+    k_lng = KM_PER_DEGREE_LNG * math.cos(math.radians(latitude))
+    dy = (F('latitude') - latitude) * k_lat
+    dx = (F('longitude') - longitude) * k_lng
+    return queryset.annotate(distance_sq=dx * dx + dy * dy).filter(
+        distance_sq__lte=radius_km * radius_km
+    )
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometers"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def parse_floats(value):
+    """
+    Comma-separated finite numbers
+
+    Raises:
+        ValueError: If a part is not a number, or is ``nan``/``inf``
+    """
+    parts = [float(part) for part in str(value).split(',')]
+    if not all(math.isfinite(part) for part in parts):
+        raise ValueError("coordinates must be finite numbers")
+    return parts
+
+
+def parse_bbox(value):
+    """
+    Parse ``min_lat,min_lng,max_lat,max_lng``
+
+    Raises:
+        ValueError: If the value is malformed or out of range
+    """
+    parts = parse_floats(value)
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_lat,min_lng,max_lat,max_lng")
+    min_lat, min_lng, max_lat, max_lng = parts
+    for lat in (min_lat, max_lat):
+        if not -90 <= lat <= 90:
+            raise ValueError("latitude out of range")
+    for lng in (min_lng, max_lng):
+        if not -180 <= lng <= 180:
+            raise ValueError("longitude out of range")
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def parse_point(value):
+    """
+    Parse ``lat,lng``
+
+    Raises:
+        ValueError: If the value is malformed or out of range
+    """
+    parts = parse_floats(value)
+    if len(parts) != 2:
+        raise ValueError("point must be lat,lng")
+    lat, lng = parts
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        raise ValueError("coordinates out of range")
+    return lat, lng
+
+
+def parse_radius(value, default=DEFAULT_RADIUS_KM):
+    """
+    Parse a ``radius_km``; ``None`` or empty means ``default``.
+    0 is allowed and matches only the exact point.
+
+    Raises:
+        ValueError: If the value is not a finite number >= 0
+    """
+    if value is None or value == '':
+        return float(default)
+    radius_km = float(value)
+    if not math.isfinite(radius_km) or radius_km < 0:
+        raise ValueError("radius_km must be a number >= 0")
+    return radius_km
@@ -0,0 +1,397 @@
+"""
+Proxy de imágenes: URLs propias firmadas y un caché LRU en disco.
+
+``redirect_to_image`` y las URLs firmadas de S3 cambian en cada firma, así
+que el navegador no puede reutilizar lo que ya descargó y las fotos de los
+listados más vistos se piden a S3 una y otra vez. Con
+``IMAGE_PROXY_ENABLED`` (o ``IMAGE_STORAGE=local``) las URLs de imagen de la
+API son ``/api/images/<token>/``:
+
+- el token lleva el nombre del archivo y su vencimiento, firmados con HMAC
+  (``django.core.signing``, con ``SECRET_KEY``); no hace falta la base de
+  datos para servirlo. El vencimiento se redondea hacia arriba (al día para
+  las URLs sin ``expiration``, a un múltiplo de ``expiration`` para
+  ``secure_url``/``secure_urls``), así que la URL de una imagen se repite
+  durante ese tiempo y el navegador la guarda en caché
+  (``Cache-Control: immutable``; los nombres de archivo son únicos, el
+  contenido de una URL nunca cambia)
+- los bytes salen de ``IMAGE_PROXY_CACHE_DIR`` (como mucho
+  ``IMAGE_PROXY_CACHE_BYTES``; se borran primero los menos usados). En un
+  fallo se copian del storage una sola vez aunque lleguen varias peticiones
+  a la vez (las demás esperan a la primera, dentro de cada proceso)
+- ``FileResponse`` con el archivo del caché: gunicorn lo envía con
+  ``sendfile``, también los rangos (``FileRange`` expone el descriptor ya
+  posicionado y ``Content-Length`` acota los bytes). Se aceptan ``Range``
+  (un solo rango), ``If-Range`` e ``If-None-Match``. No hay
+  ``Last-Modified``: la copia del caché cambia de fecha cada vez que se
+  vuelve a llenar; el ``ETag`` sale del nombre, que no cambia
+
+Sin S3, ``IMAGE_STORAGE=local`` guarda las imágenes en
+``IMAGE_STORAGE_LOCAL_ROOT`` y las sirve por aquí (``benchmarks.bench_image_proxy``).
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+
+from backend import metrics
+from backend.storage_backends import image_proxy_enabled
+
+logger = logging.getLogger(__name__)
+
+SALT = 'property.image_proxy'
+DAY = 24 * 3600
+CHUNK_SIZE = 1024 * 1024
+# Al pasar del máximo se borra hasta quedar en este porcentaje (no en cada archivo nuevo)
+EVICT_TO = 0.9
+# Como mucho una actualización de la fecha de uso por archivo y minuto
+TOUCH_INTERVAL = 60
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def sign(name, expiration=None, now=None):
+    """
+    Token for ``name``. Without ``expiration`` it is valid ``IMAGE_PROXY_URL_TTL``
+    seconds from the end of today. With ``expiration`` it is valid at least
+    that long: the expiry is rounded up to a multiple of ``expiration`` (of a
+    day, at most), so the same URL is handed out for that long and at most
+    ``expiration`` more seconds are added.
+
+    Returns:
+        str: URL-safe signed token
+    """
+    now = int(time.time() if now is None else now)
+    if expiration is None:
+        expires = (now // DAY + 1) * DAY + settings.IMAGE_PROXY_URL_TTL
+    else:
+        step = max(1, min(int(expiration), DAY))
+        expires = ((now + int(expiration)) // step + 1) * step
+    return signing.Signer(salt=SALT).sign_object({'n': name, 'e': expires})
+
+
+def unsign(token, now=None):
+    """
+    Returns:
+        tuple: (file name, expiry timestamp)
+
+    Raises:
+        BadSignature: If the token was not signed here or has expired
+    """
+    payload = signing.Signer(salt=SALT).unsign_object(token)
+    now = time.time() if now is None else now
+    if not isinstance(payload, dict) or not isinstance(payload.get('n'), str) or payload.get('e', 0) <= now:
+        raise signing.BadSignature("Expired image URL")
+    return payload['n'], payload['e']
+
+
+def proxy_url(name, expiration=None):
+    """App URL serving the image file ``name`` through the proxy (see ``sign``)"""
+    return getattr(settings, 'IMAGE_PROXY_BASE_URL', '') + reverse('image-proxy', args=[sign(name, expiration)])
+
+
+class InflightCopy:
+    """A copy from the storage in progress: waiters get its outcome"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class DiskLRUCache:
+    """
+    Files copied from the image storage into a local directory, at most
+    ``max_bytes``. Reading a file marks it as used (its access time); when
+    a new file goes over the limit the least recently used are deleted.
+
+    Several processes may share the directory: files are written to a
+    temporary name and renamed, so a reader never sees a partial file.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._size = None
+
+    def path(self, name):
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, name):
+        """Path of the cached copy of ``name``, or None"""
+        path = self.path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        if now - stat.st_atime > TOUCH_INTERVAL:
+            try:
+                # Sólo la fecha de acceso, que ordena el desalojo
+                os.utime(path, (now, stat.st_mtime))
+            except FileNotFoundError:
+                return None
+        return path
+
+    def fill(self, name, storage):
+        """
+        Copy ``name`` from ``storage`` unless another thread is already doing it
+
+        Returns:
+            str: Path of the cached copy
+
+        Raises:
+            FileNotFoundError: If the storage does not have the file
+            Exception: The storage error of the copy, also in the threads
+                that waited for another one to do it
+        """
+        with self._lock:
+            inflight = self._inflight.get(name)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[name] = InflightCopy()
+        if not leader:
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            path = self.get(name)
+            if path is None:
+                raise FileNotFoundError(name)
+            return path
+        try:
+            return self._copy(name, storage)
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[name]
+            inflight.done.set()
+
+    def open(self, name, storage, path=None):
+        """
+        Open the cached copy of ``name`` (``path``, from ``get``), copying it
+        from ``storage`` first if it is not cached. Another process may evict
+        the file between ``get`` and opening it: then it is copied again.
+
+        Returns:
+            file: The copy, opened in binary mode
+
+        Raises:
+            FileNotFoundError: If the storage does not have the file
+        """
+        if path is not None:
+            try:
+                return open(path, 'rb')
+            except FileNotFoundError:
+                pass
+        return open(self.fill(name, storage), 'rb')
+
+    def _copy(self, name, storage):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = 0
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as output, storage.open(name, 'rb') as source:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    output.write(chunk)
+                    size += len(chunk)
+            os.replace(temporary, path)
+        except BaseException:
+            try:
+                os.unlink(temporary)
+            except FileNotFoundError:
+                pass
+            raise
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+            full = self._size is None or self._size > self.max_bytes
+        if full:
+            self.evict(keep=path)
+        return path
+
+    def entries(self):
+        """``(last use, size, path)`` of every cached file"""
+        found = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_atime, stat.st_size, entry.path))
+        return found
+
+    def evict(self, keep=None):
+        """Delete the least recently used files (but ``keep``) until the cache is under its limit"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        with self._lock:
+            self._size = total
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def disk_cache():
+    """This process's ``DiskLRUCache`` over ``IMAGE_PROXY_CACHE_DIR``"""
+    global _cache
+    with _cache_lock:
+        directory, max_bytes = settings.IMAGE_PROXY_CACHE_DIR, settings.IMAGE_PROXY_CACHE_BYTES
+        if _cache is None or (_cache.directory, _cache.max_bytes) != (directory, max_bytes):
+            _cache = DiskLRUCache(directory, max_bytes)
+        return _cache
+
+
+def image_storage():
+    from .models import PropertyImage
+    return PropertyImage._meta.get_field('image').storage
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` (inclusive) of a single-range ``Range`` header
+
+    Returns:
+        tuple: The range, None to serve the whole file (no header, several
+        ranges or a syntax error), or False if the range is not satisfiable
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-500: los últimos 500
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+class FileRange:
+    """
+    The bytes ``start..end`` of an open file, for ``FileResponse``.
+
+    ``fileno()`` lets gunicorn use ``sendfile``: it sends from the current
+    offset of the descriptor (``start``) as many bytes as ``Content-Length``
+    says. Without sendfile (TLS, other servers) ``read`` stops at ``end``.
+    """
+
+    def __init__(self, file, start, end):
+        file.seek(start)
+        self.file = file
+        self.remaining = end - start + 1
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+@require_safe
+def serve_image(request, token):
+    """
+    Image bytes for a signed proxy URL
+    Endpoint: GET /api/images/{token}/
+
+    No authentication: the signature is the permission, like an S3
+    presigned URL. Returns 404 when the proxy is disabled or the file does
+    not exist and 403 for a bad or expired token.
+    """
+    if not image_proxy_enabled():
+        raise Http404("Image proxy is disabled")
+    try:
+        name, expires = unsign(token)
+    except signing.BadSignature:
+        return HttpResponseForbidden("Invalid or expired image URL")
+
+    cache = disk_cache()
+    path = cache.get(name)
+    metrics.image_proxy_cache(hit=path is not None)
+    try:
+        # Abierto antes de leer tamaño y fecha: si otro proceso lo borra
+        # después, el descriptor sigue siendo válido
+        file = cache.open(name, image_storage(), path)
+    except FileNotFoundError:
+        raise Http404("Image not found")
+    except Exception:
+        logger.exception("Error copying image %s from storage", name)
+        return HttpResponse("Could not read the image", status=502)
+
+    stat = os.fstat(file.fileno())
+    etag = f'"{os.path.basename(cache.path(name))[:32]}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f"private, max-age={max(0, int(expires - time.time()))}, immutable",
+        'Accept-Ranges': 'bytes',
+    }
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        file.close()
+        for header, value in headers.items():
+            not_modified.headers.setdefault(header, value)
+        return not_modified
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+    if_range = request.headers.get('If-Range')
+    if byte_range is not None and if_range and if_range != etag:
+        byte_range = None  # If-Range de otra versión (o una fecha): el archivo entero
+    if byte_range is False:
+        file.close()
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f"bytes */{stat.st_size}"})
+
+    if byte_range is None:
+        return FileResponse(file, content_type=content_type, headers=headers)
+    start, end = byte_range
+    response = FileResponse(FileRange(file, start, end), status=206, content_type=content_type, headers=headers)
+    response['Content-Range'] = f"bytes {start}-{end}/{stat.st_size}"
+    response['Content-Length'] = str(end - start + 1)
+    return response
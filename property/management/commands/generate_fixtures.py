@@ -0,0 +1,205 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from multiprocessing import get_context
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from owner import search as owner_search
+from owner.models import Owner
+from property import fixtures
+from property.models import HouseForSale, HouseForRent, PropertyImage
+
+# Fecha de referencia por defecto: con la actual, dos corridas con la misma
+# semilla darían fechas distintas
+DEFAULT_NOW = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+# Estado por proceso, fijado en el initializer del pool
+_worker_state = {}
+
+
+def _init_worker(owner_ids, content_type_ids):
+    _worker_state['owner_ids'] = owner_ids
+    _worker_state['content_type_ids'] = content_type_ids
+
+
+def parse_now(value):
+    """
+    Raises:
+        CommandError: If ``value`` is not an ISO 8601 datetime or ``now``
+    """
+    if value == 'now':
+        return timezone.now()
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CommandError("--now must be an ISO 8601 datetime or 'now'")
+    return timezone.make_aware(parsed, dt_timezone.utc) if timezone.is_naive(parsed) else parsed
+
+
+def _chunk_rng(seed, kind, index):
+    # Cada bloque tiene su propio generador: el resultado no depende de
+    # cuántos procesos hay ni del orden en que terminan
+    return random.Random(f"{seed}:{kind}:{index}")
+
+
+class _ExplicitTimestamps:
+    """Permite fijar created_at/updated_at en bulk_create (auto_now los sobrescribe)"""
+
+    def __init__(self, model):
+        self.fields = [model._meta.get_field(name) for name in ('created_at', 'updated_at')]
+
+    def __enter__(self):
+        self.saved = [(f.auto_now, f.auto_now_add) for f in self.fields]
+        for field in self.fields:
+            field.auto_now = field.auto_now_add = False
+
+    def __exit__(self, *exc):
+        for field, (auto_now, auto_now_add) in zip(self.fields, self.saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def generate_owner_chunk(task):
+    seed, index, start, count = task
+    rng = _chunk_rng(seed, 'owner', index)
+    owners = [Owner(**fixtures.owner_fields(rng, start + i)) for i in range(count)]
+    with transaction.atomic():
+        Owner.objects.bulk_create(owners)
+    return 'owners', count, 0
+
+
+def generate_house_chunk(task):
+    kind, seed, index, count, max_age_days, now = task
+    model, make_fields = {
+        'sale': (HouseForSale, fixtures.house_for_sale_fields),
+        'rent': (HouseForRent, fixtures.house_for_rent_fields),
+    }[kind]
+    rng = _chunk_rng(seed, kind, index)
+    owner_ids = _worker_state['owner_ids']
+
+    houses = []
+    for _ in range(count):
+        house = model(**make_fields(rng, fixtures.pick_owner_id(rng, owner_ids)))
+        house.created_at = now - timedelta(seconds=rng.randrange(max_age_days * 86400))
+        house.updated_at = house.created_at + timedelta(seconds=rng.randrange(30 * 86400))
+        houses.append(house)
+
+    content_type_id = _worker_state['content_type_ids'][kind]
+    model_name = model._meta.model_name
+    with transaction.atomic(), _ExplicitTimestamps(model), _ExplicitTimestamps(PropertyImage):
+        houses = model.objects.bulk_create(houses)
+        images = [
+            PropertyImage(**fields, created_at=house.created_at, updated_at=house.created_at)
+            for house in houses
+            for fields in fixtures.image_fields(rng, model_name, content_type_id, house.pk)
+        ]
+        PropertyImage.objects.bulk_create(images)
+    return kind, count, len(images)
+
+
+class Command(BaseCommand):
+    """
+    Genera millones de propietarios, casas e imágenes sintéticas con
+    distribuciones realistas (ver ``property/fixtures.py``) para medir
+    rendimiento con un volumen parecido al de producción.
+
+    El resultado depende sólo de ``--seed`` y ``--now`` (sobre una base vacía),
+    sin importar el número de procesos. ``--now`` es la fecha de referencia de
+    ``created_at``/``updated_at`` (por defecto una fija, ``DEFAULT_NOW``). En
+    SQLite se usa un solo proceso.
+
+    Uso:
+        python manage.py generate_fixtures --owners 100000 --houses-for-sale 1000000 \\
+            --houses-for-rent 300000 --workers 8 --seed 42
+    """
+    help = "Generate large, deterministic synthetic datasets for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owners', type=int, default=10_000)
+        parser.add_argument('--houses-for-sale', type=int, default=100_000)
+        parser.add_argument('--houses-for-rent', type=int, default=30_000)
+        parser.add_argument('--batch-size', type=int, default=2_000, help="Rows per bulk_create")
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--max-age-days', type=int, default=730,
+                            help="created_at is spread over this many days")
+        parser.add_argument('--now', default=DEFAULT_NOW.isoformat(),
+                            help="Reference time for created_at (ISO 8601, or 'now' for the current time)")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        seed = options['seed']
+        workers = max(1, options['workers'])
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write("SQLite no admite escrituras concurrentes: usando 1 proceso")
+            workers = 1
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive")
+        now = parse_now(options['now'])
+
+        started = time.monotonic()
+        start_sequence = (Owner.objects.order_by('-owner_id_house').values_list('owner_id_house', flat=True).first() or 0) + 1
+        owner_tasks = [
+            (seed, index, start_sequence + offset, min(batch_size, options['owners'] - offset))
+            for index, offset in enumerate(range(0, options['owners'], batch_size))
+        ]
+        self.run_tasks(generate_owner_chunk, owner_tasks, workers, (), 'owners')
+        # bulk_create no envía post_save: avisar al autocompletado de propietarios
+        owner_search.invalidate()
+
+        # Orden por secuencia (no por id) para que la asignación no dependa de
+        # qué proceso insertó primero cada bloque
+        owner_ids = list(Owner.objects.order_by('owner_id_house', 'id').values_list('id', flat=True))
+        if not owner_ids:
+            raise CommandError("No owners available to assign houses to")
+        content_type_ids = {
+            'sale': ContentType.objects.get_for_model(HouseForSale).id,
+            'rent': ContentType.objects.get_for_model(HouseForRent).id,
+        }
+
+        house_tasks = []
+        for kind, total in (('sale', options['houses_for_sale']), ('rent', options['houses_for_rent'])):
+            for index, offset in enumerate(range(0, total, batch_size)):
+                house_tasks.append((kind, seed, index, min(batch_size, total - offset), options['max_age_days'], now))
+        self.run_tasks(generate_house_chunk, house_tasks, workers, (owner_ids, content_type_ids), 'houses')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Listo en {elapsed:.1f}s"))
+
+    def run_tasks(self, func, tasks, workers, initargs, label):
+        if not tasks:
+            return
+        totals = {}
+        images = 0
+        started = time.monotonic()
+
+        if workers == 1:
+            if initargs:
+                _init_worker(*initargs)
+            results = map(func, tasks)
+            pool = None
+        else:
+            # Los hijos abren sus propias conexiones; las heredadas no se comparten
+            connections.close_all()
+            pool = get_context('fork').Pool(workers, initializer=_init_worker if initargs else None,
+                                            initargs=initargs)
+            results = pool.imap_unordered(func, tasks)
+
+        try:
+            for done, (kind, rows, image_rows) in enumerate(results, start=1):
+                totals[kind] = totals.get(kind, 0) + rows
+                images += image_rows
+                if done % 10 == 0 or done == len(tasks):
+                    rate = sum(totals.values()) / max(time.monotonic() - started, 1e-6)
+                    summary = ', '.join(f"{k}={v}" for k, v in sorted(totals.items()))
+                    self.stdout.write(f"[{label}] {done}/{len(tasks)} bloques  {summary} images={images}  {rate:,.0f} filas/s")
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
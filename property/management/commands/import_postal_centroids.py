@@ -0,0 +1,75 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from property.models import HouseForSale, HouseForRent, compute_geocell
+
+
+class Command(BaseCommand):
+    """
+    Geocodificación offline: asigna a cada casa el centroide de su código postal.
+
+    El archivo es un CSV con columnas ``postal_code,latitude,longitude``
+    (por ejemplo exportado del catálogo de SEPOMEX). Sólo se actualizan casas
+    sin coordenadas, salvo que se use ``--overwrite``.
+
+    Uso: python manage.py import_postal_centroids centroides.csv
+    """
+    help = "Assign latitude/longitude to houses from a postal-code centroid CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with postal_code,latitude,longitude columns")
+        parser.add_argument('--overwrite', action='store_true',
+                            help="Also replace coordinates that are already set")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--delimiter', default=',')
+
+    def handle(self, *args, **options):
+        centroids = self.read_centroids(options['path'], options['delimiter'])
+        self.stdout.write(f"{len(centroids)} centroides cargados")
+
+        for model in (HouseForSale, HouseForRent):
+            updated = self.geocode(model, centroids, options['overwrite'], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: {updated} casas geocodificadas"))
+
+    def read_centroids(self, path, delimiter):
+        centroids = {}
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                reader = csv.DictReader(f, delimiter=delimiter)
+                missing = {'postal_code', 'latitude', 'longitude'} - set(reader.fieldnames or [])
+                if missing:
+                    raise CommandError(f"Missing columns: {', '.join(sorted(missing))}")
+                for line, row in enumerate(reader, start=2):
+                    try:
+                        postal_code = int(str(row['postal_code']).strip())
+                        centroids[postal_code] = (float(row['latitude']), float(row['longitude']))
+                    except (TypeError, ValueError):
+                        self.stderr.write(f"⚠️ Línea {line} inválida, saltando: {row}")
+        except OSError as e:
+            raise CommandError(str(e))
+        return centroids
+
+    def geocode(self, model, centroids, overwrite, batch_size):
+        queryset = model.objects.filter(postal_code__in=list(centroids))
+        if not overwrite:
+            queryset = queryset.filter(latitude__isnull=True)
+
+        updated = 0
+        batch = []
+        for house in queryset.only('id', 'postal_code').iterator(chunk_size=batch_size):
+            house.latitude, house.longitude = centroids[house.postal_code]
+            house.geocell = compute_geocell(house.latitude, house.longitude)
+            batch.append(house)
+            if len(batch) >= batch_size:
+                updated += self.flush(model, batch)
+                batch = []
+        if batch:
+            updated += self.flush(model, batch)
+        return updated
+
+    def flush(self, model, batch):
+        with transaction.atomic():
+            model.objects.bulk_update(batch, ['latitude', 'longitude', 'geocell'])
+        return len(batch)
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0003_alter_propertyimage_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='houseforrent',
+            name='geocell',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='houseforrent',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='houseforrent',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='houseforsale',
+            name='geocell',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='houseforsale',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='houseforsale',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
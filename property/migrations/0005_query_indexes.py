@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('owner', '0002_owner_owner_id_house'),
+        ('property', '0004_house_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='houseforrent',
+            index=models.Index(fields=['-created_at'], name='rent_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='houseforrent',
+            index=models.Index(fields=['owner', '-created_at'], name='rent_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='houseforrent',
+            index=models.Index(fields=['rent_cost'], name='rent_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='houseforrent',
+            index=models.Index(fields=['city', 'rent_cost'], name='rent_city_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='houseforsale',
+            index=models.Index(fields=['-created_at'], name='sale_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='houseforsale',
+            index=models.Index(fields=['owner', '-created_at'], name='sale_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='houseforsale',
+            index=models.Index(fields=['selling_cost'], name='sale_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='houseforsale',
+            index=models.Index(fields=['city', 'selling_cost'], name='sale_city_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='houseforsale',
+            index=models.Index(condition=models.Q(('estatus', 'DISPONIBLE')), fields=['selling_cost'], name='sale_available_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyimage',
+            index=models.Index(fields=['content_type', 'object_id', 'order', 'created_at'], name='image_gallery_order_idx'),
+        ),
+        # El índice nuevo cubre (content_type, object_id) como prefijo
+        migrations.RemoveIndex(
+            model_name='propertyimage',
+            name='property_pr_content_3af013_idx',
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:37
+
+import backend.storage_backends
+import property.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='image',
+            field=models.ImageField(storage=backend.storage_backends.LazyPrivateMediaStorage(), upload_to=property.models.property_image_upload_path),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:32
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def keep_one_main_image(apps, schema_editor):
+    # Propiedades con varias imágenes principales: se queda la primera de la
+    # galería (order, created_at, id) y las demás dejan de serlo
+    PropertyImage = apps.get_model('property', 'PropertyImage')
+    images = PropertyImage.objects.using(schema_editor.connection.alias)
+    duplicated = (
+        images.filter(is_main=True)
+        .values('content_type', 'object_id')
+        .annotate(mains=Count('id'))
+        .filter(mains__gt=1)
+        .order_by()
+    )
+    for group in duplicated.iterator():
+        mains = images.filter(content_type=group['content_type'], object_id=group['object_id'], is_main=True)
+        keep = mains.order_by('order', 'created_at', 'id').values_list('id', flat=True)[0]
+        mains.exclude(id=keep).update(is_main=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('property', '0006_lazy_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_one_main_image, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='propertyimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_main', True)), fields=('content_type', 'object_id'), name='image_one_main_per_property'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:07
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('owner', '0004_owner_search_key'),
+        ('property', '0007_image_one_main'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='houseforrent',
+            name='rent_city_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='houseforsale',
+            name='sale_city_price_idx',
+        ),
+        migrations.AddIndex(
+            model_name='houseforrent',
+            index=models.Index(django.db.models.functions.text.Upper('city'), models.F('rent_cost'), name='rent_city_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='houseforsale',
+            index=models.Index(django.db.models.functions.text.Upper('city'), models.F('selling_cost'), name='sale_city_price_idx'),
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.contrib.contenttypes.fields import GenericForeignKey
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.functions import Upper
 from django.contrib.contenttypes.models import ContentType
 from owner.models import Owner
-from backend.storage_backends import PrivateMediaStorage
+from backend.storage_backends import LazyPrivateMediaStorage
+from .geo import encode_geohash
 
 
 def property_image_upload_path(instance, filename):
@@ -25,11 +28,35 @@ def property_image_upload_path(instance, filename):
     return f'properties/{model_name}/{object_id}/{new_filename}'
 
 
+def compute_geocell(latitude, longitude):
+    """Celda geohash para las coordenadas, o None si faltan"""
+    if latitude is None or longitude is None:
+        return None
+    return encode_geohash(latitude, longitude)
+
+
+def attach_images(houses, images):
+    """
+    Precarga las imágenes de varias casas (del mismo modelo) para que
+    ``house.images`` no haga una consulta por casa.
+
+    Args:
+        houses (list): Instancias de HouseForSale o HouseForRent
+        images (iterable): PropertyImage de esas casas, ya en orden de galería
+    """
+    by_house = {house.pk: [] for house in houses}
+    for image in images:
+        if image.object_id in by_house:
+            by_house[image.object_id].append(image)
+    for house in houses:
+        house._prefetched_images = by_house[house.pk]
+
+
 class PropertyImage(models.Model):
     """Modelo genérico para manejar imágenes de cualquier tipo de propiedad"""
     image = models.ImageField(
         upload_to=property_image_upload_path,
-        storage=PrivateMediaStorage()
+        storage=LazyPrivateMediaStorage()
     )
     caption = models.CharField(max_length=200, null=True, blank=True)
     is_main = models.BooleanField(default=False)  # Imagen principal
@@ -46,18 +73,42 @@ class PropertyImage(models.Model):
     class Meta:
         ordering = ['order', 'created_at']
         indexes = [
-            models.Index(fields=['content_type', 'object_id']),
+            # Galería de una propiedad ya en el orden de visualización
+            models.Index(fields=['content_type', 'object_id', 'order', 'created_at'], name='image_gallery_order_idx'),
+        ]
+        constraints = [
+            # Una sola imagen principal por propiedad (índice único parcial)
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id'],
+                condition=Q(is_main=True),
+                name='image_one_main_per_property',
+            ),
         ]
 
+    def save(self, *args, **kwargs):
+        if not self.is_main:
+            return super().save(*args, **kwargs)
+        # La imagen principal anterior deja de serlo antes de guardar ésta
+        with transaction.atomic(using=kwargs.get('using')):
+            self.siblings().filter(is_main=True).update(is_main=False)
+            super().save(*args, **kwargs)
+
+    def siblings(self):
+        """The other images of the same property"""
+        return PropertyImage.objects.filter(
+            content_type_id=self.content_type_id, object_id=self.object_id
+        ).exclude(pk=self.pk)
+
     def __str__(self):
         return f"Image for {self.content_object}"
     
-    def get_secure_url(self, expiration=3600):
+    def get_secure_url(self, expiration=3600, cache=True):
         """
         Generate a secure presigned URL for this image
         
         Args:
             expiration (int): Time in seconds for the URL to remain valid
+            cache (bool): Allow a recently signed URL that expires sooner
         
         Returns:
             str: Presigned URL or None if error
@@ -65,7 +116,7 @@ class PropertyImage(models.Model):
         if self.image:
             from backend.storage_backends import S3ImageService
             s3_service = S3ImageService()
-            return s3_service.generate_presigned_url(self.image.name, expiration)
+            return s3_service.generate_presigned_url(self.image.name, expiration, cache=cache)
         return None
 
 
@@ -93,11 +144,43 @@ class HouseForSale(models.Model):
     servicios = models.CharField(max_length=120, null=True, blank=True)
     metodo_de_pago = models.CharField(max_length=120, null=True, blank=True)
     negociable = models.BooleanField(null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geocell = models.CharField(max_length=12, null=True, blank=True, editable=False, db_index=True)
 
+    def save(self, *args, **kwargs):
+        self.geocell = compute_geocell(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geocell'}
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # Listado por defecto (-created_at)
+            models.Index(fields=['-created_at'], name='sale_created_idx'),
+            # ?owner_id=X con el orden por defecto: WHERE owner_id = X
+            # ORDER BY created_at DESC sale del índice sin ordenar en memoria
+            models.Index(fields=['owner', '-created_at'], name='sale_owner_created_idx'),
+            # Rango / orden por precio
+            models.Index(fields=['selling_cost'], name='sale_price_idx'),
+            # ?city_exact= (iexact compila a UPPER(city) = UPPER(%s)) con
+            # rango u orden por precio; ?city= (icontains) no puede usarlo
+            models.Index(Upper('city'), 'selling_cost', name='sale_city_price_idx'),
+            # Casas disponibles por precio (filtro disponible=true)
+            models.Index(
+                fields=['selling_cost'],
+                condition=Q(estatus='DISPONIBLE'),
+                name='sale_available_price_idx',
+            ),
+        ]
 
     @property
     def images(self):
-        """Retorna todas las imágenes relacionadas"""
+        """Retorna todas las imágenes relacionadas (o las precargadas con attach_images)"""
+        prefetched = getattr(self, '_prefetched_images', None)
+        if prefetched is not None:
+            return prefetched
         return PropertyImage.objects.filter(
             content_type=ContentType.objects.get_for_model(self),
             object_id=self.id
@@ -126,10 +209,32 @@ class HouseForRent(models.Model):
     owner = models.ForeignKey(Owner, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geocell = models.CharField(max_length=12, null=True, blank=True, editable=False, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.geocell = compute_geocell(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geocell'}
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # Mismas consultas que HouseForSale
+            models.Index(fields=['-created_at'], name='rent_created_idx'),
+            models.Index(fields=['owner', '-created_at'], name='rent_owner_created_idx'),
+            models.Index(fields=['rent_cost'], name='rent_price_idx'),
+            models.Index(Upper('city'), 'rent_cost', name='rent_city_price_idx'),
+        ]
 
     @property
     def images(self):
-        """Retorna todas las imágenes relacionadas"""
+        """Retorna todas las imágenes relacionadas (o las precargadas con attach_images)"""
+        prefetched = getattr(self, '_prefetched_images', None)
+        if prefetched is not None:
+            return prefetched
         return PropertyImage.objects.filter(
             content_type=ContentType.objects.get_for_model(self),
             object_id=self.id
@@ -0,0 +1,291 @@
+"""
+Búsqueda combinada de casas en venta y en renta.
+
+Cada modelo se consulta con el mismo vocabulario de filtros y ordenado por
+``(valor, tipo, id)``. Como ambos querysets ya vienen ordenados, se combinan con
+un merge de k vías (``heapq.merge``) leyendo a lo más ``page_size + 1`` filas de
+cada uno. La paginación es por cursor (keyset): el cursor guarda la última
+llave devuelta y la siguiente página continúa estrictamente después de ella.
+"""
+import base64
+import binascii
+import heapq
+import json
+from datetime import datetime
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from backend import storage_backends
+from .models import HouseForSale, HouseForRent, PropertyImage, attach_images
+from . import geo
+
+
+class SearchKind:
+    """Field mapping for one of the searchable property models"""
+
+    def __init__(self, name, rank, model, serializer_class, fields):
+        self.name = name
+        self.rank = rank
+        self.model = model
+        self.serializer_class = serializer_class
+        self.fields = fields
+
+    def field(self, term):
+        return self.fields[term]
+
+
+# Vocabulario compartido -> campo de cada modelo
+SALE_FIELDS = {
+    'price': 'selling_cost',
+    'beds': 'beds',
+    'baths': 'baths',
+    'created_at': 'created_at',
+}
+RENT_FIELDS = {
+    'price': 'rent_cost',
+    'beds': 'bedrooms',
+    'baths': 'bathrooms',
+    'created_at': 'created_at',
+}
+
+ORDERINGS = ('-created_at', 'created_at', 'price', '-price')
+DEFAULT_ORDERING = '-created_at'
+
+
+class InvalidSearch(ValueError):
+    pass
+
+
+def get_kinds():
+    from .serializers import HouseForSaleSerializer, HouseForRentSerializer
+    return [
+        SearchKind('sale', 0, HouseForSale, HouseForSaleSerializer, SALE_FIELDS),
+        SearchKind('rent', 1, HouseForRent, HouseForRentSerializer, RENT_FIELDS),
+    ]
+
+
+def is_int(value):
+    # bool es subclase de int, pero true/false no es un valor de cursor
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def encode_cursor(ordering, key):
+    value, rank, pk = key
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({'o': ordering, 'v': value, 'k': rank, 'id': pk}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering):
+    """
+    Returns the ``(value, rank, id)`` key stored in a cursor
+
+    Raises:
+        InvalidSearch: If the cursor is malformed or belongs to another ordering
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload['o'] != ordering:
+            raise InvalidSearch("cursor does not match ordering")
+        value, rank, pk = payload['v'], payload['k'], payload['id']
+        if ordering.lstrip('-') == 'created_at':
+            # Sólo fechas ISO con zona horaria: se comparan con columnas aware
+            value = parse_datetime(value) if isinstance(value, str) else None
+            if value is None or timezone.is_naive(value):
+                raise InvalidSearch("invalid cursor")
+        elif not is_int(value):
+            raise InvalidSearch("invalid cursor")
+        if not is_int(rank) or not is_int(pk):
+            raise InvalidSearch("invalid cursor")
+        return value, rank, pk
+    except InvalidSearch:
+        raise
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidSearch("invalid cursor")
+
+
+def parse_params(params):
+    """
+    Validate the shared query parameters
+
+    Raises:
+        InvalidSearch: If a parameter has an invalid value
+    """
+    def number(name, cast=int):
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return cast(value)
+        except ValueError:
+            raise InvalidSearch(f"{name} must be a number")
+
+    kind = params.get('type')
+    if kind not in (None, '', 'sale', 'rent'):
+        raise InvalidSearch("type must be 'sale' or 'rent'")
+    ordering = params.get('ordering') or DEFAULT_ORDERING
+    if ordering not in ORDERINGS:
+        raise InvalidSearch(f"ordering must be one of {', '.join(ORDERINGS)}")
+
+    bbox = params.get('bbox')
+    if bbox:
+        try:
+            bbox = geo.parse_bbox(bbox)
+        except ValueError as e:
+            raise InvalidSearch(str(e))
+
+    patio = params.get('patio')
+    if patio not in (None, ''):
+        if patio.lower() not in ('true', 'false', '1', '0'):
+            raise InvalidSearch("patio must be true or false")
+        patio = patio.lower() in ('true', '1')
+    else:
+        patio = None
+
+    return {
+        'type': kind or None,
+        'ordering': ordering,
+        'city': params.get('city') or None,
+        'city_exact': params.get('city_exact') or None,
+        'nghood': params.get('nghood') or None,
+        'postal_code': number('postal_code'),
+        'owner_id': number('owner_id'),
+        'min_price': number('min_price'),
+        'max_price': number('max_price'),
+        'min_beds': number('min_beds'),
+        'min_baths': number('min_baths', float),
+        'patio': patio,
+        'bbox': bbox,
+    }
+
+
+def build_queryset(kind, filters):
+    """Apply the shared filters and keyset ordering to one model"""
+    queryset = kind.model.objects.all()
+    if filters['city']:
+        queryset = queryset.filter(city__icontains=filters['city'])
+    if filters['city_exact']:
+        queryset = queryset.filter(city__iexact=filters['city_exact'])
+    if filters['nghood']:
+        queryset = queryset.filter(nghood__icontains=filters['nghood'])
+    if filters['postal_code'] is not None:
+        queryset = queryset.filter(postal_code=filters['postal_code'])
+    if filters['owner_id'] is not None:
+        queryset = queryset.filter(owner_id=filters['owner_id'])
+    if filters['min_price'] is not None:
+        queryset = queryset.filter(**{f"{kind.field('price')}__gte": filters['min_price']})
+    if filters['max_price'] is not None:
+        queryset = queryset.filter(**{f"{kind.field('price')}__lte": filters['max_price']})
+    if filters['min_beds'] is not None:
+        queryset = queryset.filter(**{f"{kind.field('beds')}__gte": filters['min_beds']})
+    if filters['min_baths'] is not None:
+        queryset = queryset.filter(**{f"{kind.field('baths')}__gte": filters['min_baths']})
+    if filters['patio'] is not None:
+        queryset = queryset.filter(patio=filters['patio'])
+    if filters['bbox']:
+        queryset = geo.filter_bbox(queryset, *filters['bbox'])
+
+    ordering = filters['ordering']
+    sort_field = kind.field(ordering.lstrip('-'))
+    # Las filas sin valor de orden no tienen posición en el keyset
+    queryset = queryset.filter(**{f"{sort_field}__isnull": False})
+    if ordering.startswith('-'):
+        return queryset.order_by(f"-{sort_field}", '-id'), sort_field
+    return queryset.order_by(sort_field, 'id'), sort_field
+
+
+def after_cursor(kind, sort_field, key, descending):
+    """
+    Rows strictly after ``key`` in ``(value, rank, id)`` order. The rank is
+    constant per model so the comparison collapses to at most two terms.
+    """
+    value, rank, pk = key
+    strict, inclusive, id_lookup = ('lt', 'lte', 'id__lt') if descending else ('gt', 'gte', 'id__gt')
+    rank_after = kind.rank < rank if descending else kind.rank > rank
+
+    if rank_after:
+        return Q(**{f"{sort_field}__{inclusive}": value})
+    if kind.rank == rank:
+        return Q(**{f"{sort_field}__{strict}": value}) | Q(**{sort_field: value, id_lookup: pk})
+    return Q(**{f"{sort_field}__{strict}": value})
+
+
+def image_context(kind, houses, context=None):
+    """
+    Load the images of ``houses`` (all of ``kind``) with one query and sign
+    their URLs in one batch, so the serializer does not query per house.
+
+    Returns:
+        dict: Serializer context with ``secure_urls``
+    """
+    context = dict(context or {})
+    images = list(PropertyImage.objects.filter(
+        content_type=ContentType.objects.get_for_model(kind.model),
+        object_id__in=[house.pk for house in houses],
+    ))
+    attach_images(houses, images)
+    names = [image.image.name for image in images if image.image]
+    if names:
+        urls = storage_backends.S3ImageService().generate_presigned_urls(names, context.get('url_expiration', 3600))
+        context['secure_urls'] = {image.pk: urls[image.image.name] for image in images if image.image}
+    return context
+
+
+def search(params, page_size, context=None):
+    """
+    Run the combined search.
+
+    Returns:
+        tuple: ``(results, next_cursor)`` where results are serialized houses
+        with a ``type`` key, in merged order
+    """
+    filters = parse_params(params)
+    ordering = filters['ordering']
+    descending = ordering.startswith('-')
+    cursor = params.get('cursor')
+    key = decode_cursor(cursor, ordering) if cursor else None
+
+    streams = []
+    kinds = [kind for kind in get_kinds() if filters['type'] in (None, kind.name)]
+    for kind in kinds:
+        queryset, sort_field = build_queryset(kind, filters)
+        if key is not None:
+            queryset = queryset.filter(after_cursor(kind, sort_field, key, descending))
+        rows = queryset[:page_size + 1]
+        streams.append(
+            [((getattr(house, sort_field), kind.rank, house.pk), kind, house) for house in rows]
+        )
+
+    merged = heapq.merge(*streams, key=lambda item: item[0], reverse=descending)
+    page = []
+    for item in merged:
+        page.append(item)
+        if len(page) > page_size:
+            break
+
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(ordering, page[-1][0])
+
+    # Serializar por modelo y reensamblar en el orden del merge
+    serialized = {}
+    for kind in kinds:
+        houses = [house for _, item_kind, house in page if item_kind is kind]
+        if not houses:
+            continue
+        data = kind.serializer_class(houses, many=True, context=image_context(kind, houses, context)).data
+        for house, item in zip(houses, data):
+            serialized[(kind.name, house.pk)] = item
+
+    results = []
+    for _, kind, house in page:
+        item = {'type': kind.name}
+        item.update(serialized[(kind.name, house.pk)])
+        results.append(item)
+    return results, next_cursor
@@ -1,6 +1,7 @@
 # serializers.py
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
+from backend.profiling import ProfiledSerializerMixin
 from .models import HouseForSale, HouseForRent, PropertyImage
 
 
@@ -32,7 +33,7 @@ class PropertyImageUploadSerializer(serializers.ModelSerializer):
 
 
 
-class PropertyImageSerializer(serializers.ModelSerializer):
+class PropertyImageSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     secure_url = serializers.SerializerMethodField()
 
@@ -51,6 +52,10 @@ class PropertyImageSerializer(serializers.ModelSerializer):
         """
         Generate a secure presigned URL for the image
         """
+        # URLs ya firmadas por la vista (p. ej. en paralelo en las vistas async)
+        secure_urls = self.context.get('secure_urls')
+        if secure_urls is not None and obj.pk in secure_urls:
+            return secure_urls[obj.pk]
         if obj.image:
             # Get expiration time from context or use default (1 hour)
             expiration = self.context.get('url_expiration', 3600)
@@ -58,7 +63,7 @@ class PropertyImageSerializer(serializers.ModelSerializer):
         return None
 
 
-class HouseForSaleSerializer(serializers.ModelSerializer):
+class HouseForSaleSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     images = PropertyImageSerializer(many=True, read_only=True)
     main_image = PropertyImageSerializer(read_only=True)
     # documents = PropertyDocumentSerializer(many=True, read_only=True)
@@ -68,7 +73,7 @@ class HouseForSaleSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class HouseForRentSerializer(serializers.ModelSerializer):
+class HouseForRentSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     images = PropertyImageSerializer(many=True, read_only=True)
     main_image = PropertyImageSerializer(read_only=True)
 
@@ -1,3 +1,797 @@
-from django.test import TestCase
+import base64
+import concurrent.futures
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import AsyncClient, AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import viewsets
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api import benchmark
+from backend import storage_backends
+from backend.storage_backends import S3ImageService
+from backend.compression import CompressionMiddleware
+from backend.renderers import FastJSONRenderer
+from owner.models import Owner
+from property import geo, image_proxy
+from property.fast_serializers import STREAM_CHUNK_SIZE, FastListMixin
+from property.management.commands import generate_fixtures
+from property.models import HouseForRent, HouseForSale, PropertyImage
+
+
+@override_settings(JWT_CLAIMS_AUTH=True)
+class FastListTests(TestCase):
+    """The field-plan list path returns the same bytes as the DRF serializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=3, houses_per_owner=5, images_per_house=3)
+
+    def setUp(self):
+        self.client = benchmark.authenticated_client()
+        storage = benchmark.fake_image_storage()
+        storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+
+    def get_both(self, url):
+        fast = self.client.get(url)
+        with mock.patch.object(FastListMixin, 'list', viewsets.ModelViewSet.list), \
+                mock.patch.object(FastJSONRenderer, 'render', JSONRenderer.render):
+            drf = self.client.get(url)
+        return fast, drf
+
+    def test_same_bytes_as_serializer(self):
+        for url in ('/api/houses-for-sale/', '/api/houses-for-sale/?ordering=selling_cost&city=SALT',
+                    '/api/houses-for-rent/?page=last', '/api/houses-for-rent/?page=9'):
+            with self.subTest(url=url):
+                fast, drf = self.get_both(url)
+                self.assertEqual(fast.status_code, drf.status_code)
+                self.assertEqual(fast.content, drf.content)
+
+    def test_images_are_loaded_once_per_page(self):
+        # count, página, imágenes de toda la página (el usuario sale del token)
+        with self.assertNumQueries(3):
+            self.client.get('/api/houses-for-sale/')
+
+
+    def test_compact_format_round_trips(self):
+        full = self.client.get('/api/houses-for-sale/').json()
+        compact = self.client.get('/api/houses-for-sale/?format=compact').json()
+        self.assertEqual(compact['count'], full['count'])
+        images = compact['tables']['images']
+        houses = []
+        for row in compact['rows']:
+            house = dict(zip(compact['fields'], row))
+            house['images'] = [dict(zip(images['fields'], images['rows'][i])) for i in house['images']]
+            houses.append(house)
+        self.assertEqual(houses, full['results'])
+
+    def test_negotiated_compression(self):
+        plain = self.client.get('/api/houses-for-sale/')
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        compressed = self.client.get('/api/houses-for-sale/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(compressed.content)), plain.json())
+        # Respuestas pequeñas (errores, detalles) no se comprimen
+        missing = self.client.get('/api/houses-for-sale/0/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(missing.has_header('Content-Encoding'))
+
+
+@override_settings(JWT_CLAIMS_AUTH=True)
+class AsyncViewsTests(TestCase):
+    """/api/async/ houses return the same responses as the viewsets"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=3, houses_per_owner=5, images_per_house=2)
+
+    def setUp(self):
+        self.client = benchmark.authenticated_client()
+        self.async_client = AsyncClient()
+        self.headers = {'Authorization': self.client._credentials['HTTP_AUTHORIZATION']}
+        storage = benchmark.fake_image_storage()
+        storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+
+    async def test_same_responses_as_sync_views(self):
+        sale = await HouseForSale.objects.order_by('pk').afirst()
+        rent = await HouseForRent.objects.order_by('pk').afirst()
+        paths = [
+            'houses-for-sale/', 'houses-for-sale/?page=2', 'houses-for-sale/?page=999',
+            'houses-for-sale/?city=SALT&ordering=selling_cost', 'houses-for-sale/?bbox=1,2',
+            'houses-for-sale/?bbox=-90,-180,90,180', 'houses-for-rent/?min_price=5000',
+            f'houses-for-sale/{sale.pk}/', f'houses-for-rent/{rent.pk}/', 'houses-for-sale/999999/',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                expected = await sync_to_async(self.client.get)(f'/api/{path}')
+                response = await self.async_client.get(f'/api/async/{path}', headers=self.headers)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content.replace(b'/api/async/', b'/api/'), expected.content)
+
+        # Sin credenciales: el mismo 401
+        expected = await sync_to_async(APIClient().get)('/api/houses-for-sale/')
+        response = await self.async_client.get('/api/async/houses-for-sale/')
+        self.assertEqual((response.status_code, response.content), (401, expected.content))
+
+    async def test_compression_runs_in_async_mode(self):
+        body = json.dumps({'results': ['casa'] * 500})
+
+        async def get_response(request):
+            return HttpResponse(body, content_type='application/json')
+
+        middleware = CompressionMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(AsyncRequestFactory().get('/', headers={'Accept-Encoding': 'gzip'}))
+        self.assertEqual(gzip.decompress(response.content).decode(), body)
+
+        # De punta a punta por ASGI
+        plain = await self.async_client.get('/api/async/houses-for-sale/', headers=self.headers)
+        response = await self.async_client.get('/api/async/houses-for-sale/',
+                                               headers={**self.headers, 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+
+class GeoTests(TestCase):
+    """Cell covers, radius boundaries and coordinate parsing of ``property.geo``"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=1, houses_per_owner=1, images_per_house=0)
+        cls.center = (20.0, -100.0)
+        owner = HouseForSale.objects.get().owner
+        cls.houses = {}
+        for name, north_km in (('center', 0), ('inside', 0.99), ('outside', 1.01)):
+            cls.houses[name] = HouseForSale.objects.create(
+                owner=owner, title=name,
+                latitude=cls.center[0] + north_km / geo.KM_PER_DEGREE_LAT, longitude=cls.center[1],
+            )
+
+    def setUp(self):
+        self.client = benchmark.authenticated_client()
+        storage = benchmark.fake_image_storage()
+        storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+
+    def test_cover_contains_every_point_of_the_box(self):
+        boxes = [
+            (19.43, -99.14, 19.44, -99.13),
+            (20.0, -100.0, 20.0, -100.0),
+            (-0.01, -0.01, 0.01, 0.01),
+            (89.9, 179.9, 90.0, 180.0),
+            (-90.0, -180.0, -89.9, -179.9),
+            (-90.0, -180.0, 90.0, 180.0),
+        ]
+        for box in boxes:
+            with self.subTest(box=box):
+                cells = geo.covering_cells(*box)
+                self.assertLessEqual(len(cells), geo.MAX_COVER_CELLS)
+                min_lat, min_lng, max_lat, max_lng = box
+                for i in range(5):
+                    for j in range(5):
+                        lat = min_lat + (max_lat - min_lat) * i / 4
+                        lng = min_lng + (max_lng - min_lng) * j / 4
+                        point = geo.encode_geohash(lat, lng)
+                        self.assertTrue(any(point.startswith(cell) for cell in cells), (lat, lng))
+
+    def test_radius_boundary(self):
+        def titles(queryset):
+            return sorted(geo.filter_radius(queryset, *self.center, 1).values_list('title', flat=True))
+
+        self.assertEqual(titles(HouseForSale.objects.all()), ['center', 'inside'])
+        for query, expected in (('', ['center', 'inside']), ('&radius_km=0', ['center']),
+                                ('&radius_km=2', ['center', 'inside', 'outside'])):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/houses-for-sale/?near=20,-100{query}')
+                self.assertEqual(sorted(house['title'] for house in response.json()['results']), expected)
+        # search_by_location: mismos parámetros y reglas que el listado, más cercanas primero
+        for query, expected in (('lat=20&lng=-100', ['center', 'inside']), ('near=20,-100', ['center', 'inside']),
+                                ('near=20,-100&radius_km=0', ['center']),
+                                ('lat=20&lng=-100&radius_km=0', ['center'])):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/houses-for-sale/search_by_location/?{query}')
+                self.assertEqual([house['title'] for house in response.json()['results']], expected)
+
+    def test_rejects_malformed_and_non_finite_coordinates(self):
+        for value in ('1,2,3', 'a,b,c,d', 'nan,0,1,1', '0,0,inf,1', '91,0,92,1', '0,-181,1,1'):
+            with self.subTest(bbox=value), self.assertRaises(ValueError):
+                geo.parse_bbox(value)
+        for value in ('1', 'nan,1', '1,-inf', '0,200'):
+            with self.subTest(point=value), self.assertRaises(ValueError):
+                geo.parse_point(value)
+        self.assertEqual(geo.parse_bbox(' 1,2 ,3,4'), (1.0, 2.0, 3.0, 4.0))
+        for value in ('-1', 'nan', 'inf', 'x'):
+            with self.subTest(radius_km=value), self.assertRaises(ValueError):
+                geo.parse_radius(value)
+        self.assertEqual([geo.parse_radius(v) for v in (None, '', '0', '2.5')], [1.0, 1.0, 0.0, 2.5])
+        for query in ('bbox=nan,0,1,1', 'near=nan,1', 'near=20,-100&radius_km=nan',
+                      'near=20,-100&radius_km=-1'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/houses-for-sale/?{query}').status_code, 400)
+        for query in ('lat=nan&lng=1', 'lat=20&lng=-100&radius_km=nan', 'lat=20&lng=-100&radius_km=inf',
+                      'lat=20&lng=-100&radius_km=-1', 'near=20&radius_km=1', 'near=20,-100&radius_km=-1'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/houses-for-sale/search_by_location/?{query}')
+                self.assertEqual(response.status_code, 400)
+
+
+class GenerateFixturesTests(TestCase):
+    """manage.py generate_fixtures depends only on --seed and --now"""
+
+    def generate(self, *args):
+        call_command('generate_fixtures', '--owners', '20', '--houses-for-sale', '30', '--houses-for-rent', '10',
+                     '--batch-size', '7', '--workers', '1', *args, stdout=io.StringIO())
+        owner = ('owner__owner_id_house',)
+        house = ('title', 'created_at', 'updated_at', 'latitude', 'longitude')
+        rows = {
+            'owners': list(Owner.objects.order_by('owner_id_house').values_list('owner_id_house', 'name', 'phone')),
+            'sale': list(HouseForSale.objects.order_by('id').values_list(*owner, *house, 'selling_cost')),
+            'rent': list(HouseForRent.objects.order_by('id').values_list(*owner, *house, 'rent_cost')),
+            'images': list(PropertyImage.objects.order_by('id').values_list(
+                'caption', 'is_main', 'order', 'created_at', 'updated_at')),
+        }
+        for model in (PropertyImage, HouseForSale, HouseForRent, Owner):
+            model.objects.all().delete()
+        return rows
+
+    def test_same_seed_same_rows(self):
+        first = self.generate('--seed', '7')
+        self.assertEqual(self.generate('--seed', '7'), first)
+        self.assertNotEqual(self.generate('--seed', '8'), first)
+        self.assertTrue(all(house[2] < generate_fixtures.DEFAULT_NOW for house in first['sale']))
+
+    def test_now_moves_the_dates(self):
+        first = self.generate('--seed', '7', '--now', '2024-06-01T00:00:00Z')
+        later = self.generate('--seed', '7', '--now', '2024-06-02T00:00:00')
+        self.assertEqual([row[2] + timedelta(days=1) for row in first['sale']], [row[2] for row in later['sale']])
+        with self.assertRaises(CommandError):
+            self.generate('--now', 'ayer')
+
+
+class StreamingActionsTests(TestCase):
+    """search_by_location, price_range and rent_range paginate like the list, or stream NDJSON"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=30, houses_per_owner=100, images_per_house=1)
+
+    def setUp(self):
+        self.client = benchmark.authenticated_client()
+        storage = benchmark.fake_image_storage()
+        storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+
+    def stream(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return response, [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_actions_are_paginated_with_list_filters(self):
+        for url in ('/api/houses-for-sale/price_range/?min_price=2000000&ordering=-selling_cost',
+                    '/api/houses-for-sale/search_by_location/?bbox=-90,-180,90,180',
+                    '/api/houses-for-rent/rent_range/?max_rent=20000',
+                    '/api/houses-for-rent/search_by_location/?lat=25.42&lng=-101.0&radius_km=50'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(set(response.json()), {'count', 'next', 'previous', 'results'})
+                self.assertLessEqual(len(response.json()['results']), 100)
+
+    def test_ndjson_lines_match_the_pages(self):
+        url = '/api/houses-for-sale/price_range/?max_price=3000000&ordering=selling_cost'
+        pages = []
+        next_url = url
+        while next_url:
+            page = self.client.get(next_url).json()
+            pages.extend(page['results'])
+            next_url = page['next']
+        response, lines = self.stream(url + '&format=ndjson')
+        self.assertEqual(lines, pages)
+        self.assertEqual(response['X-Total-Count'], str(len(pages)))
+        self.assertFalse(response.has_header('X-Truncated'))
+
+    def test_stream_is_truncated_at_max_rows(self):
+        with self.settings(STREAM_MAX_ROWS=7):
+            response, lines = self.stream('/api/houses-for-rent/rent_range/?format=ndjson')
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(response['X-Total-Count'], '3000')
+        self.assertEqual(response['X-Truncated'], 'true')
+
+    def test_stream_memory_does_not_grow_with_rows(self):
+        prices = sorted(HouseForSale.objects.values_list('selling_cost', flat=True))
+
+        def peak(max_price):
+            response = self.client.get(f'/api/houses-for-sale/price_range/?format=ndjson&max_price={max_price}')
+            tracemalloc.start()
+            try:
+                rows = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+                return rows, tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        small_rows, small_peak = peak(prices[STREAM_CHUNK_SIZE - 1])
+        large_rows, large_peak = peak(prices[-1])
+        self.assertEqual(small_rows, sum(price <= prices[STREAM_CHUNK_SIZE - 1] for price in prices))
+        self.assertEqual(large_rows, len(prices))
+        # Seis veces más filas, el mismo pico: sólo hay un bloque en memoria a la vez
+        self.assertLess(large_peak, small_peak * 1.5)
+
+
+class BulkWriteTests(TestCase):
+    """POST /bulk/ validates every item first and applies them together"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=3, houses_per_owner=20, images_per_house=0)
+
+    def setUp(self):
+        self.client = benchmark.authenticated_client()
+        self.owner_id = HouseForSale.objects.values_list('owner_id', flat=True).first()
+
+    def batch(self, items):
+        houses = list(HouseForSale.objects.order_by('pk')[:2 * items])
+        return {
+            'create': [{'title': f"Nueva {i}", 'owner': self.owner_id, 'selling_cost': 1_000_000 + i,
+                        'latitude': 25.4, 'longitude': -101.0} for i in range(items)],
+            'update': [{'id': house.pk, 'selling_cost': 5, 'estatus': 'VENDIDA'} for house in houses[:items]],
+            'delete': [house.pk for house in houses[items:]],
+        }
+
+    def post(self, body, url='/api/houses-for-sale/bulk/'):
+        return self.client.post(url, body, format='json')
+
+    def test_applies_every_action(self):
+        body = self.batch(3)
+        before = HouseForSale.objects.get(pk=body['update'][0]['id']).updated_at
+        response = self.post(body)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([(r['action'], r['index'], r['status']) for r in results],
+                         [('create', 0, 201), ('create', 1, 201), ('create', 2, 201),
+                          ('update', 0, 200), ('update', 1, 200), ('update', 2, 200),
+                          ('delete', 0, 204), ('delete', 1, 204), ('delete', 2, 204)])
+        created = HouseForSale.objects.get(pk=results[0]['id'])
+        self.assertEqual(created.title, "Nueva 0")
+        self.assertNotEqual(created.geocell, '')
+        updated = HouseForSale.objects.get(pk=body['update'][0]['id'])
+        self.assertEqual((updated.selling_cost, updated.estatus), (5, 'VENDIDA'))
+        self.assertGreater(updated.updated_at, before)
+        self.assertFalse(HouseForSale.objects.filter(pk__in=body['delete']).exists())
+
+    def test_queries_do_not_grow_with_items(self):
+        def queries(items):
+            body = self.batch(items)
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.post(body).status_code, 200)
+            return len(captured)
+
+        self.assertEqual(queries(2), queries(10))
+
+    def test_invalid_item_rejects_the_whole_batch(self):
+        body = self.batch(2)
+        body['create'][1]['owner'] = 0
+        body['update'][0]['selling_cost'] = 'caro'
+        body['delete'][1] = 0
+        count = HouseForSale.objects.count()
+        response = self.post(body)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(e['action'], e['index'], e['status']) for e in response.json()['errors']],
+                         [('create', 1, 400), ('update', 0, 400), ('delete', 1, 404)])
+        self.assertIn('owner', response.json()['errors'][0]['errors'])
+        self.assertEqual(HouseForSale.objects.count(), count)
+        self.assertNotEqual(HouseForSale.objects.get(pk=body['update'][1]['id']).selling_cost, 5)
+
+    def test_malformed_and_oversized_batches(self):
+        self.assertEqual(self.post([1, 2]).status_code, 400)
+        self.assertEqual(self.post({'upsert': []}).status_code, 400)
+        pk = HouseForSale.objects.values_list('pk', flat=True).first()
+        response = self.post({'update': [{'id': pk, 'title': 'a'}], 'delete': [pk]})
+        self.assertEqual(response.status_code, 400)
+        with self.settings(BULK_MAX_ITEMS=3):
+            response = self.post(self.batch(2))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('At most 3', response.json()['detail'])
+
+    def test_rent_viewset(self):
+        response = self.post({'create': [{'title': "Renta", 'owner': self.owner_id, 'rent_cost': 9000}]},
+                             url='/api/houses-for-rent/bulk/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['status'], 201)
+
+
+class GalleryTests(TestCase):
+    """PUT /gallery/ reorders, captions and picks the main image in one transaction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=1, houses_per_owner=2, images_per_house=4)
+
+    def setUp(self):
+        self.client = benchmark.authenticated_client()
+        storage = benchmark.fake_image_storage()
+        storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+        self.house = HouseForSale.objects.order_by('pk').first()
+        self.images = list(self.house.images.order_by('order'))
+        self.url = f'/api/houses-for-sale/{self.house.pk}/gallery/'
+
+    def put(self, items):
+        return self.client.put(self.url, {'images': items}, format='json')
+
+    def test_reorders_captions_and_moves_the_main_image(self):
+        first, second, third, fourth = self.images
+        with CaptureQueriesContext(connection) as captured:
+            response = self.put([{'id': fourth.pk, 'is_main': True, 'caption': 'Fachada'},
+                                 {'id': second.pk}, {'id': first.pk}, {'id': third.pk, 'caption': None}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([image['id'] for image in response.json()], [fourth.pk, second.pk, first.pk, third.pk])
+        gallery = list(self.house.images.order_by('order').values_list('id', 'order', 'caption', 'is_main'))
+        self.assertEqual(gallery, [(fourth.pk, 0, 'Fachada', True), (second.pk, 1, 'Foto 1', False),
+                                   (first.pk, 2, 'Foto 0', False), (third.pk, 3, None, False)])
+        writes = [query['sql'] for query in captured if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(writes), 2)
+
+    def test_main_image_is_kept_when_not_given(self):
+        response = self.put([{'id': image.pk} for image in reversed(self.images)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.house.images.filter(is_main=True).values_list('pk', flat=True)), [self.images[0].pk])
+
+    def test_list_must_be_exactly_the_gallery(self):
+        other = PropertyImage.objects.exclude(object_id=self.house.pk).first()
+        ids = [image.pk for image in self.images]
+        for items in ([{'id': pk} for pk in ids[:-1]],
+                      [{'id': pk} for pk in ids + [other.pk]],
+                      [{'id': pk} for pk in ids + ids[:1]],
+                      [{'id': pk, 'is_main': True} for pk in ids]):
+            with self.subTest(items=items):
+                self.assertEqual(self.put(items).status_code, 400)
+        response = self.put([{'id': pk} for pk in ids[:-1]])
+        self.assertEqual(response.json()['images']['missing'], [str(ids[-1])])
+        self.assertEqual(list(self.house.images.order_by('order').values_list('pk', flat=True)), ids)
+
+    def test_one_main_image_per_property(self):
+        response = self.client.patch(f'/api/property-images/{self.images[2].pk}/set_as_main/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.house.images.filter(is_main=True).values_list('pk', flat=True)), [self.images[2].pk])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.house.images.update(is_main=True)
+
+
+@override_settings(JWT_CLAIMS_AUTH=True)
+class SecureUrlsTests(TestCase):
+    """GET /property-images/secure_urls/ signs a whole gallery in one request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=1, houses_per_owner=3, images_per_house=5)
+
+    def setUp(self):
+        self.client = benchmark.authenticated_client()
+        storage = benchmark.fake_image_storage()
+        storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+        self.url = '/api/property-images/secure_urls/'
+
+    def test_signs_every_id_in_one_query(self):
+        images = list(PropertyImage.objects.order_by('pk')[:12])
+        ids = ','.join(str(image.pk) for image in images) + ',999999'
+        with self.assertNumQueries(1):
+            response = self.client.get(f'{self.url}?ids={ids}&expiration=600')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['expires_in'], 600)
+        self.assertEqual(data['missing'], [999999])
+        self.assertEqual(data['urls'], {str(image.pk): f"/media/{image.image.name}?expires=600" for image in images})
+
+    def test_reported_expiration_is_not_shortened_by_the_cache(self):
+        image = PropertyImage.objects.order_by('pk').first()
+        client = mock.Mock()
+        client.generate_presigned_url.side_effect = (f'signed-{i}' for i in range(100))
+        storage_backends.presigned_url_cache.clear()
+        self.addCleanup(storage_backends.presigned_url_cache.clear)
+        with mock.patch('backend.storage_backends.S3ImageService', S3ImageService), \
+                mock.patch('backend.storage_backends.get_s3_client', return_value=client):
+            # Un listado deja la URL en caché; los endpoints que informan expires_in firman otra
+            S3ImageService().generate_presigned_url(image.image.name, 600)
+            batch = self.client.get(f'{self.url}?ids={image.pk}&expiration=600').json()
+            single = self.client.get(f'/api/property-images/{image.pk}/secure_url/?expiration=600').json()
+        self.assertEqual(batch['urls'], {str(image.pk): 'signed-1'})
+        self.assertEqual(single['secure_url'], 'signed-2')
+        self.assertEqual((batch['expires_in'], single['expires_in']), (600, 600))
+
+    def test_gallery_of_a_property(self):
+        house = HouseForSale.objects.order_by('pk').first()
+        response = self.client.get(f'{self.url}?content_type=house_for_sale&object_id={house.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(map(int, response.json()['urls'])), sorted(image.pk for image in house.images))
+
+    def test_nothing_requested_and_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url).json()['urls'], {})
+        for query in ('ids=1,a', 'ids=1&expiration=10', 'ids=1&expiration=soon',
+                      'content_type=owner&object_id=1', 'content_type=house_for_sale&object_id=x',
+                      'ids=' + ','.join(map(str, range(1, 202)))):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'{self.url}?{query}').status_code, 400)
+
+
+@override_settings(JWT_CLAIMS_AUTH=True)
+class PropertySearchTests(TestCase):
+    """GET /properties/search/ merges both house models with cursor pagination"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=3, houses_per_owner=5, images_per_house=2)
+
+    def setUp(self):
+        self.client = benchmark.authenticated_client()
+        storage = benchmark.fake_image_storage()
+        storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+        self.url = '/api/properties/search/'
+
+    def walk(self, query):
+        keys = []
+        url = f'{self.url}?{query}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            keys.extend((item['type'], item['id']) for item in data['results'])
+            url = data['next']
+        return keys
+
+    def test_pages_follow_the_merged_order(self):
+        sales = [(house.selling_cost, 0, house.pk) for house in HouseForSale.objects.all()]
+        rents = [(house.rent_cost, 1, house.pk) for house in HouseForRent.objects.all()]
+        expected = [('sale' if rank == 0 else 'rent', pk) for _, rank, pk in sorted(sales + rents)]
+        self.assertEqual(self.walk('ordering=price&page_size=7'), expected)
+        self.assertEqual(self.walk('ordering=-price&page_size=4'), expected[::-1])
+
+    def test_created_at_pages_have_no_gaps_or_repeats(self):
+        keys = self.walk('page_size=6')
+        self.assertEqual(len(keys), HouseForSale.objects.count() + HouseForRent.objects.count())
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_images_are_loaded_once_per_model(self):
+        self.client.get(self.url)
+        # casas en venta, casas en renta y las imágenes de cada modelo
+        with self.assertNumQueries(4):
+            response = self.client.get(f'{self.url}?page_size=30')
+        self.assertEqual(len(response.json()['results']), 30)
+        self.assertTrue(all(len(item['images']) == 2 for item in response.json()['results']))
+
+    def test_city_exact_does_not_match_partial_names(self):
+        house = HouseForSale.objects.order_by('pk').first()
+        HouseForSale.objects.filter(pk=house.pk).update(city='Ciudad Centro')
+        HouseForSale.objects.exclude(pk=house.pk).update(city='Centro')
+        for url in (self.url + '?type=sale&', '/api/houses-for-sale/?'):
+            with self.subTest(url=url):
+                partial = self.client.get(url + 'city=centro&page_size=100').json()['results']
+                exact = self.client.get(url + 'city_exact=CENTRO&page_size=100').json()['results']
+                self.assertEqual(len(partial), HouseForSale.objects.count())
+                self.assertNotIn(house.pk, [item['id'] for item in exact])
+                self.assertEqual(len(exact), HouseForSale.objects.count() - 1)
+
+    def test_tampered_cursors_are_rejected(self):
+        def cursor(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+        cursors = [
+            ('price', 'not-a-cursor'),
+            ('price', cursor(['price', 1])),
+            ('price', cursor({'o': 'price', 'v': 'abc', 'k': 0, 'id': 1})),
+            ('price', cursor({'o': 'price', 'v': [1], 'k': 0, 'id': 1})),
+            ('price', cursor({'o': 'price', 'v': True, 'k': 0, 'id': 1})),
+            ('price', cursor({'o': 'price', 'v': 100, 'k': 'x', 'id': 1})),
+            ('price', cursor({'o': 'price', 'v': 100, 'k': 0})),
+            ('price', cursor({'o': '-price', 'v': 100, 'k': 0, 'id': 1})),
+            ('-created_at', cursor({'o': '-created_at', 'v': 'abc', 'k': 0, 'id': 1})),
+            ('-created_at', cursor({'o': '-created_at', 'v': 1, 'k': 0, 'id': 1})),
+            ('-created_at', cursor({'o': '-created_at', 'v': '2024-01-01T00:00:00', 'k': 0, 'id': 1})),
+        ]
+        for ordering, value in cursors:
+            with self.subTest(ordering=ordering, cursor=value):
+                response = self.client.get(self.url, {'ordering': ordering, 'cursor': value})
+                self.assertEqual(response.status_code, 400)
+
+
+class ImageProxyTests(TestCase):
+    """Signed /api/images/ URLs served from the disk cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(owners=1, houses_per_owner=1, images_per_house=2)
+
+    def setUp(self):
+        self.client = benchmark.authenticated_client()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = self.settings(IMAGE_PROXY_ENABLED=True, IMAGE_PROXY_CACHE_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        storage = benchmark.fake_image_storage(real_signing=True)
+        self.storage = storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
+        self.image = PropertyImage.objects.order_by('pk').first()
+        self.content = bytes(range(256)) * 40
+        self.storage.save(self.image.image.name, ContentFile(self.content))
+
+    def proxy_url(self):
+        response = self.client.get(f'/api/property-images/{self.image.pk}/secure_url/')
+        url = response.json()['secure_url']
+        self.assertTrue(url.startswith('/api/images/'))
+        return url
+
+    def test_serves_bytes_and_caches_them_on_disk(self):
+        url = self.proxy_url()
+        with mock.patch.object(self.storage, 'open', wraps=self.storage.open) as opened:
+            first = image_proxy_client().get(url)
+            second = image_proxy_client().get(url)
+        self.assertEqual(opened.call_count, 1)
+        for response in (first, second):
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(first['Content-Type'], 'image/jpeg')
+        self.assertEqual(first['Content-Length'], str(len(self.content)))
+        self.assertIn('immutable', first['Cache-Control'])
+        self.assertEqual(first['ETag'], second['ETag'])
+        # La URL se repite mientras no cambie el vencimiento redondeado: el navegador la reutiliza
+        self.assertEqual(self.proxy_url(), url)
+
+    def test_ranges_and_conditional_requests(self):
+        url = self.proxy_url()
+        client = image_proxy_client()
+        etag = client.get(url)['ETag']
+        cases = [
+            ({'HTTP_RANGE': 'bytes=10-19'}, 206, self.content[10:20]),
+            ({'HTTP_RANGE': 'bytes=-5'}, 206, self.content[-5:]),
+            ({'HTTP_RANGE': f'bytes={len(self.content) - 3}-'}, 206, self.content[-3:]),
+            ({'HTTP_RANGE': 'bytes=0-1,5-6'}, 200, self.content),
+            ({'HTTP_RANGE': 'bytes=10-19', 'HTTP_IF_RANGE': '"other"'}, 200, self.content),
+            ({'HTTP_RANGE': 'bytes=10-19', 'HTTP_IF_RANGE': etag}, 206, self.content[10:20]),
+        ]
+        for headers, code, body in cases:
+            with self.subTest(headers=headers):
+                response = client.get(url, **headers)
+                self.assertEqual(response.status_code, code)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                if code == 206:
+                    self.assertEqual(response['Content-Length'], str(len(body)))
+        response = client.get(url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{len(self.content)}'))
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Sin Last-Modified (la copia del caché cambia de fecha al volver a llenarse): sólo cuenta el ETag
+        self.assertFalse(client.get(url).has_header('Last-Modified'))
+        response = client.get(url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='Wed, 21 Oct 2015 07:28:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_ranges_can_use_sendfile(self):
+        url = self.proxy_url()
+        # Sin el cliente de pruebas, que envuelve el contenido: el objeto que recibe wsgi.file_wrapper
+        response = image_proxy.serve_image(RequestFactory().get(url, HTTP_RANGE='bytes=10-19'), url.split('/')[-2])
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 206)
+        # Lo que gunicorn pasa a os.sendfile: el descriptor en su posición actual y Content-Length bytes
+        body = response.file_to_stream
+        offset = os.lseek(body.fileno(), 0, os.SEEK_CUR)
+        self.assertEqual(os.pread(body.fileno(), int(response['Content-Length']), offset), self.content[10:20])
+
+    def test_tokens_honor_the_requested_expiration(self):
+        response = self.client.get(f'/api/property-images/secure_urls/?ids={self.image.pk}&expiration=600')
+        self.assertEqual(response.json()['expires_in'], 600)
+        token = response.json()['urls'][str(self.image.pk)].split('/')[-2]
+        now = time.time()
+        _, expires = image_proxy.unsign(token)
+        self.assertTrue(now + 600 - 5 <= expires <= now + 1200)
+
+        name = self.image.image.name
+        self.assertEqual(image_proxy.sign(name, 600, now=1000), image_proxy.sign(name, 600, now=1199))
+        self.assertEqual(image_proxy.unsign(image_proxy.sign(name, 600, now=1000), now=1000)[1], 1800)
+        self.assertEqual(image_proxy.unsign(image_proxy.sign(name, 7 * 86400, now=0), now=0)[1], 8 * 86400)
+        with self.assertRaises(signing.BadSignature):
+            image_proxy.unsign(image_proxy.sign(name, 600, now=1000), now=1800)
+
+    def test_rejects_bad_tokens_and_missing_files(self):
+        client = image_proxy_client()
+        url = self.proxy_url()
+        self.assertEqual(client.get(url[:-3] + 'abc/').status_code, 403)
+        expired = image_proxy.sign(self.image.image.name, now=time.time() - 40 * 24 * 3600)
+        self.assertEqual(client.get(f'/api/images/{expired}/').status_code, 403)
+        missing = image_proxy.sign('properties/no-existe.jpg')
+        self.assertEqual(client.get(f'/api/images/{missing}/').status_code, 404)
+        self.assertEqual(client.post(url).status_code, 405)
+        with self.settings(IMAGE_PROXY_ENABLED=False):
+            self.assertEqual(client.get(url).status_code, 404)
+
+    def test_concurrent_misses_read_the_storage_once(self):
+        cache = image_proxy.disk_cache()
+        release = threading.Event()
+        opened = []
+
+        def slow_open(name, mode='rb'):
+            opened.append(name)
+            release.wait(5)
+            return ContentFile(self.content)
+
+        storage = mock.Mock(open=slow_open)
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            futures = [pool.submit(cache.fill, 'galeria/foto.jpg', storage) for _ in range(8)]
+            time.sleep(0.2)
+            release.set()
+            paths = {future.result() for future in futures}
+        self.assertEqual(opened, ['galeria/foto.jpg'])
+        self.assertEqual(len(paths), 1)
+
+    def test_waiters_get_the_storage_error_of_the_copy(self):
+        cache = image_proxy.disk_cache()
+        release = threading.Event()
+
+        def failing_open(name, mode='rb'):
+            release.wait(5)
+            raise OSError("storage unavailable")
+
+        storage = mock.Mock(open=failing_open)
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(cache.fill, 'galeria/rota.jpg', storage) for _ in range(4)]
+            time.sleep(0.2)
+            release.set()
+            for future in futures:
+                with self.assertRaisesMessage(OSError, "storage unavailable"):
+                    future.result()
+        with mock.patch.object(self.storage, 'open', side_effect=OSError("storage unavailable")), \
+                self.assertLogs('property.image_proxy', 'ERROR'):
+            self.assertEqual(image_proxy_client().get(self.proxy_url()).status_code, 502)
+
+    def test_file_evicted_after_lookup_is_copied_again(self):
+        url = self.proxy_url()
+        client = image_proxy_client()
+        client.get(url)
+        cache = image_proxy.disk_cache()
+        path = cache.path(self.image.image.name)
+
+        def evicted(name):
+            found = image_proxy.DiskLRUCache.get(cache, name)
+            os.unlink(path)  # otro proceso lo borra al hacer espacio
+            return found
+
+        with mock.patch.object(cache, 'get', evicted):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertTrue(os.path.exists(path))
+
+    def test_least_recently_used_files_are_evicted(self):
+        cache = image_proxy.DiskLRUCache(image_proxy.disk_cache().directory, max_bytes=25)
+        storage = mock.Mock(open=lambda name, mode='rb': ContentFile(b'x' * 10))
+        for name in ('a.jpg', 'b.jpg'):
+            cache.fill(name, storage)
+        old = time.time() - 3600
+        os.utime(cache.path('a.jpg'), (old, old))
+        cache.fill('c.jpg', storage)
+        self.assertIsNone(cache.get('a.jpg'))
+        self.assertIsNotNone(cache.get('b.jpg'))
+        self.assertIsNotNone(cache.get('c.jpg'))
+
+
+def image_proxy_client():
+    """Browser-like client: proxy URLs need no credentials"""
+    return APIClient()
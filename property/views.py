@@ -1,19 +1,65 @@
-from rest_framework import status, viewsets, filters
+
+from rest_framework import status, viewsets, filters, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 from django.contrib.contenttypes.models import ContentType
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as django_filters
 from django.db.models import Q
 from django.http import HttpResponseRedirect, Http404
 
+from backend.db_routers import ReplicaReadMixin
+from backend.throttling import CostThrottleMixin
+
 from .models import HouseForSale, HouseForRent, PropertyImage
+from . import geo
+from .bulk import BulkWriteMixin
+from .fast_serializers import FastListMixin, STREAMING_RENDERERS
+from .gallery import GalleryMixin
+from .search import search, InvalidSearch
 from .serializers import PropertyImageUploadSerializer, PropertyImageSerializer, HouseForSaleSerializer, HouseForRentSerializer
 
 
-class HouseForSaleFilter(django_filters.FilterSet):
+class GeoFilterSet(django_filters.FilterSet):
+    """
+    Map-view filters shared by the house filters.
+
+    - ``bbox=min_lat,min_lng,max_lat,max_lng``: houses inside the visible map
+    - ``near=lat,lng&radius_km=2``: houses within a radius (default 1 km)
+    """
+    bbox = django_filters.CharFilter(method='filter_bbox')
+    near = django_filters.CharFilter(method='filter_near')
+    radius_km = django_filters.NumberFilter(method='filter_radius_km', min_value=0)
+
+    def filter_bbox(self, queryset, name, value):
+        try:
+            bbox = geo.parse_bbox(value)
+        except ValueError as e:
+            raise serializers.ValidationError({'bbox': str(e)})
+        return geo.filter_bbox(queryset, *bbox)
+
+    def filter_near(self, queryset, name, value):
+        try:
+            lat, lng = geo.parse_point(value)
+        except ValueError as e:
+            raise serializers.ValidationError({'near': str(e)})
+        try:
+            radius_km = geo.parse_radius(self.form.cleaned_data.get('radius_km'))
+        except ValueError as e:
+            raise serializers.ValidationError({'radius_km': str(e)})
+        return geo.filter_radius(queryset, lat, lng, radius_km)
+
+    def filter_radius_km(self, queryset, name, value):
+        # Se aplica junto con `near`
+        return queryset
+
+
+class HouseForSaleFilter(GeoFilterSet):
     """Custom filter for HouseForSale model"""
     
     # Price range filters
@@ -22,6 +68,7 @@ class HouseForSaleFilter(django_filters.FilterSet):
     
     # Location filters
     city = django_filters.CharFilter(field_name="city", lookup_expr='icontains')
+    city_exact = django_filters.CharFilter(field_name="city", lookup_expr='iexact')
     nghood = django_filters.CharFilter(field_name="nghood", lookup_expr='icontains')
     postal_code = django_filters.NumberFilter(field_name="postal_code")
     
@@ -52,6 +99,7 @@ class HouseForSaleFilter(django_filters.FilterSet):
     
     # Status filter
     estatus = django_filters.CharFilter(field_name="estatus", lookup_expr='icontains')
+    disponible = django_filters.BooleanFilter(method='filter_disponible')
     
     # Payment method filter
     metodo_de_pago = django_filters.CharFilter(field_name="metodo_de_pago", lookup_expr='icontains')
@@ -76,8 +124,14 @@ class HouseForSaleFilter(django_filters.FilterSet):
             'updated_at': ['date', 'date__gte', 'date__lte'],
         }
 
+    def filter_disponible(self, queryset, name, value):
+        # Igualdad exacta para aprovechar el índice parcial sale_available_price_idx
+        if value:
+            return queryset.filter(estatus='DISPONIBLE')
+        return queryset.exclude(estatus='DISPONIBLE')
 
-class HouseForRentFilter(django_filters.FilterSet):
+
+class HouseForRentFilter(GeoFilterSet):
     """Custom filter for HouseForRent model"""
     
     # Price range filters
@@ -86,6 +140,7 @@ class HouseForRentFilter(django_filters.FilterSet):
     
     # Location filters
     city = django_filters.CharFilter(field_name="city", lookup_expr='icontains')
+    city_exact = django_filters.CharFilter(field_name="city", lookup_expr='iexact')
     nghood = django_filters.CharFilter(field_name="nghood", lookup_expr='icontains')
     postal_code = django_filters.NumberFilter(field_name="postal_code")
     
@@ -122,7 +177,38 @@ class HouseForRentFilter(django_filters.FilterSet):
         }
 
 
-class HouseForSaleViewSet(viewsets.ModelViewSet):
+class CoordinateSearchMixin:
+    """
+    Radius search for the search_by_location actions.
+
+    ``near=lat,lng`` is applied by GeoFilterSet as in the list; the older
+    ``lat=...&lng=...`` pair goes through the same ``geo.parse_point`` and
+    ``geo.parse_radius`` checks. Either way the nearest houses come first
+    unless ``ordering`` is given. ``bbox`` is in the filterset.
+    """
+
+    def filter_by_coordinates(self, request, queryset):
+        params = request.query_params
+        if not params.get('near'):
+            if not (params.get('lat') and params.get('lng')):
+                return queryset
+            try:
+                lat, lng = geo.parse_point(f"{params['lat']},{params['lng']}")
+            except ValueError as e:
+                raise serializers.ValidationError({'near': str(e)})
+            try:
+                radius_km = geo.parse_radius(params.get('radius_km'))
+            except ValueError as e:
+                raise serializers.ValidationError({'radius_km': str(e)})
+            queryset = geo.filter_radius(queryset, lat, lng, radius_km)
+        # Más cercanas primero, salvo que el cliente pida otro orden
+        if not params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('distance_sq', 'pk')
+        return queryset
+
+
+class HouseForSaleViewSet(CostThrottleMixin, ReplicaReadMixin, FastListMixin, CoordinateSearchMixin, BulkWriteMixin,
+                          GalleryMixin, viewsets.ModelViewSet):
     queryset = HouseForSale.objects.all()
     serializer_class = HouseForSaleSerializer
     parser_classes = [JSONParser, MultiPartParser, FormParser]
@@ -193,49 +279,34 @@ class HouseForSaleViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=STREAMING_RENDERERS)
     def search_by_location(self, request):
         """
         Custom search endpoint for location-based filtering
         Endpoint: GET /houses-for-sale/search_by_location/?city=...&nghood=...
+        Also accepts bbox=min_lat,min_lng,max_lat,max_lng or near=lat,lng&radius_km=...
+        (lat=...&lng=... still works)
+
+        Same filters, ordering and pagination as the list; ?format=ndjson
+        streams every match (up to STREAM_MAX_ROWS), one house per line.
         """
-        city = request.query_params.get('city', None)
-        nghood = request.query_params.get('nghood', None)
-        postal_code = request.query_params.get('postal_code', None)
-        
-        queryset = self.get_queryset()
-        
-        if city:
-            queryset = queryset.filter(city__icontains=city)
-        if nghood:
-            queryset = queryset.filter(nghood__icontains=nghood)
-        if postal_code:
-            queryset = queryset.filter(postal_code=postal_code)
-            
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.filter_by_coordinates(request, self.filter_queryset(self.get_queryset()))
+        return self.plan_response(queryset)
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=STREAMING_RENDERERS)
     def price_range(self, request):
         """
         Get houses within a specific price range
         Endpoint: GET /houses-for-sale/price_range/?min_price=...&max_price=...
+
+        Same filters, ordering and pagination as the list; ?format=ndjson
+        streams every match (up to STREAM_MAX_ROWS), one house per line.
         """
-        min_price = request.query_params.get('min_price', None)
-        max_price = request.query_params.get('max_price', None)
-        
-        queryset = self.get_queryset()
-        
-        if min_price:
-            queryset = queryset.filter(selling_cost__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(selling_cost__lte=max_price)
-            
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.plan_response(self.filter_queryset(self.get_queryset()))
 
 
-class HouseForRentViewSet(viewsets.ModelViewSet):
+class HouseForRentViewSet(CostThrottleMixin, ReplicaReadMixin, FastListMixin, CoordinateSearchMixin, BulkWriteMixin,
+                          GalleryMixin, viewsets.ModelViewSet):
     queryset = HouseForRent.objects.all()
     serializer_class = HouseForRentSerializer
     parser_classes = [JSONParser, MultiPartParser, FormParser]
@@ -306,30 +377,33 @@ class HouseForRentViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=STREAMING_RENDERERS)
     def search_by_location(self, request):
         """
         Custom search endpoint for location-based filtering
         Endpoint: GET /houses-for-rent/search_by_location/?city=...&nghood=...
+        Also accepts bbox=min_lat,min_lng,max_lat,max_lng or near=lat,lng&radius_km=...
+        (lat=...&lng=... still works)
+
+        Same filters, ordering and pagination as the list; ?format=ndjson
+        streams every match (up to STREAM_MAX_ROWS), one house per line.
         """
-        city = request.query_params.get('city', None)
-        nghood = request.query_params.get('nghood', None)
-        postal_code = request.query_params.get('postal_code', None)
-        
-        queryset = self.get_queryset()
-        
-        if city:
-            queryset = queryset.filter(city__icontains=city)
-        if nghood:
-            queryset = queryset.filter(nghood__icontains=nghood)
-        if postal_code:
-            queryset = queryset.filter(postal_code=postal_code)
-            
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.filter_by_coordinates(request, self.filter_queryset(self.get_queryset()))
+        return self.plan_response(queryset)
+
+    @action(detail=False, methods=['get'], renderer_classes=STREAMING_RENDERERS)
+    def rent_range(self, request):
+        """
+        Get houses within a specific rent range
+        Endpoint: GET /houses-for-rent/rent_range/?min_rent=...&max_rent=...
+
+        Same filters, ordering and pagination as the list; ?format=ndjson
+        streams every match (up to STREAM_MAX_ROWS), one house per line.
+        """
+        return self.plan_response(self.filter_queryset(self.get_queryset()))
 
 
-class PropertyImageViewSet(viewsets.ModelViewSet):
+class PropertyImageViewSet(CostThrottleMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing PropertyImage objects with secure access
     """
@@ -337,6 +411,14 @@ class PropertyImageViewSet(viewsets.ModelViewSet):
     serializer_class = PropertyImageSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    content_type_models = {
+        'house_for_sale': HouseForSale,
+        'house_for_rent': HouseForRent,
+    }
+    secure_urls_max_ids = 200
+    # Las URLs prefirmadas de S3 valen como máximo 7 días
+    secure_urls_min_expiration = 60
+    secure_urls_max_expiration = 7 * 24 * 3600
 
     def get_queryset(self):
         """
@@ -348,11 +430,8 @@ class PropertyImageViewSet(viewsets.ModelViewSet):
         
         if content_type and object_id:
             # Map content type strings to models
-            model_mapping = {
-                'house_for_sale': HouseForSale,
-                'house_for_rent': HouseForRent,
-            }
-            
+            model_mapping = self.content_type_models
+
             if content_type in model_mapping:
                 model_class = model_mapping[content_type]
                 ct = ContentType.objects.get_for_model(model_class)
@@ -370,7 +449,8 @@ class PropertyImageViewSet(viewsets.ModelViewSet):
             image = self.get_object()
             expiration = int(request.query_params.get('expiration', 3600))  # Default 1 hour
             
-            secure_url = image.get_secure_url(expiration)
+            # Sin caché: una URL reutilizada vencería antes de expires_in
+            secure_url = image.get_secure_url(expiration, cache=False)
             if secure_url:
                 return Response({
                     'secure_url': secure_url,
@@ -406,6 +486,63 @@ class PropertyImageViewSet(viewsets.ModelViewSet):
         except PropertyImage.DoesNotExist:
             raise Http404("Image not found")
 
+    @action(detail=False, methods=['get'])
+    def secure_urls(self, request):
+        """
+        Presigned URLs for many images in one request (a whole gallery)
+        Endpoint: GET /property-images/secure_urls/?ids=1,2,3&expiration=3600
+        Endpoint: GET /property-images/secure_urls/?content_type=house_for_sale&object_id=5
+
+        Loads the images in one query and signs every URL in one pass. The
+        URLs are always freshly signed, so every one is valid for ``expires_in``.
+        Returns ``{"expires_in": ..., "urls": {id: url}, "missing": [ids]}``;
+        without ``ids`` nor a ``content_type``/``object_id`` pair the map is empty.
+        """
+        try:
+            expiration = int(request.query_params.get('expiration', 3600))
+        except ValueError:
+            raise serializers.ValidationError({'expiration': "Must be a number"})
+        if not self.secure_urls_min_expiration <= expiration <= self.secure_urls_max_expiration:
+            raise serializers.ValidationError({'expiration': f"Must be between {self.secure_urls_min_expiration} "
+                                                             f"and {self.secure_urls_max_expiration} seconds"})
+
+        ids = None
+        if request.query_params.get('ids'):
+            try:
+                ids = list(dict.fromkeys(int(pk) for pk in request.query_params['ids'].split(',') if pk.strip()))
+            except ValueError:
+                raise serializers.ValidationError({'ids': "Expected comma separated image ids"})
+            if len(ids) > self.secure_urls_max_ids:
+                raise serializers.ValidationError({'ids': f"At most {self.secure_urls_max_ids} ids per request"})
+
+        content_type = request.query_params.get('content_type')
+        object_id = request.query_params.get('object_id')
+        if ids is None and content_type and object_id:
+            if content_type not in self.content_type_models:
+                raise serializers.ValidationError({'content_type': f"Expected one of {', '.join(self.content_type_models)}"})
+            if not object_id.isdigit():
+                raise serializers.ValidationError({'object_id': "Must be a number"})
+
+        queryset = self.get_queryset()
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        elif not (content_type and object_id):
+            queryset = queryset.none()
+        images = list(queryset.only('pk', 'image')[:self.secure_urls_max_ids])
+
+        from backend.storage_backends import S3ImageService
+        signed = S3ImageService().generate_presigned_urls(
+            [image.image.name for image in images if image.image], expiration, cache=False
+        )
+        urls = {image.pk: signed.get(image.image.name) if image.image else None for image in images}
+        response = Response({
+            'expires_in': expiration,
+            'urls': urls,
+            'missing': [pk for pk in ids if pk not in urls] if ids is not None else [],
+        })
+        response.row_count = len(urls)
+        return response
+
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def bulk_upload(self, request):
         """
@@ -454,35 +591,46 @@ class PropertyImageViewSet(viewsets.ModelViewSet):
         Endpoint: PATCH /property-images/{id}/set_as_main/
         """
         image = self.get_object()
-        
-        # Remove main flag from other images of the same property
-        PropertyImage.objects.filter(
-            content_type=image.content_type,
-            object_id=image.object_id
-        ).update(is_main=False)
-        
-        # Set this image as main
+
+        # save() quita la marca de principal a las demás imágenes de la propiedad
         image.is_main = True
-        image.save()
+        image.save(update_fields=['is_main', 'updated_at'])
         
         serializer = self.get_serializer(image)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['get'])
-    def rent_range(self, request):
-        """
-        Get houses within a specific rent range
-        Endpoint: GET /houses-for-rent/rent_range/?min_rent=...&max_rent=...
-        """
-        min_rent = request.query_params.get('min_rent', None)
-        max_rent = request.query_params.get('max_rent', None)
-        
-        queryset = self.get_queryset()
-        
-        if min_rent:
-            queryset = queryset.filter(rent_cost__gte=min_rent)
-        if max_rent:
-            queryset = queryset.filter(rent_cost__lte=max_rent)
-            
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+
+
+class PropertySearchView(CostThrottleMixin, APIView):
+    """
+    Combined search over houses for sale and for rent
+    Endpoint: GET /api/properties/search/?city=...&max_price=...&ordering=price
+
+    Shared filters: type (sale|rent), city, nghood, postal_code, owner_id,
+    min_price, max_price, min_beds, min_baths, patio, bbox.
+    Ordering: -created_at (default), created_at, price, -price.
+    Results are cursor paginated: follow `next` for the following page.
+    """
+    permission_classes = [IsAuthenticated]
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get('page_size', api_settings.PAGE_SIZE))
+        except ValueError:
+            page_size = api_settings.PAGE_SIZE
+        return max(1, min(page_size, self.max_page_size))
+
+    def get(self, request):
+        page_size = self.get_page_size(request)
+        try:
+            results, next_cursor = search(
+                request.query_params, page_size, context={'request': request}
+            )
+        except InvalidSearch as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'next': next_url, 'results': results})